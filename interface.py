@@ -1,8 +1,21 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-from main import Sistema
+from src.agendador_llm import Cancelada
+from src.prefetch import PrefetchBusca
+from collections import deque
+import os
+import queue
 import threading
 import time
+import getpass
+
+AUTOMATICO = "automático"
+
+# Intervalo entre atualizações da tela (~30 quadros por segundo)
+INTERVALO_QUADRO_MS = 33
+# Mensagens mantidas em memória e linhas mantidas no widget de histórico
+MAX_HISTORICO = 200
+MAX_LINHAS_HISTORICO = 2000
 
 class InterfaceTk:
     def __init__(self, root):
@@ -10,34 +23,70 @@ class InterfaceTk:
         self.root.title("+A Educação - Tutor Adaptativo")
         
         self.sistema = None
-        self.historico = []
+        self.historico = deque(maxlen=MAX_HISTORICO)
         self.processando = False
-        self.formato = "texto"
-        self.nivel = "iniciante"
+        # Atualizações de widgets pedidas pelas threads de trabalho; só a
+        # thread do Tk as aplica, uma vez por quadro
+        self._eventos = queue.Queue()
+        self._resposta_exibida = None
+        # Cada pergunta enviada inicia uma nova geração; eventos de gerações
+        # anteriores (respostas abandonadas) são descartados
+        self._geracao = 0
+        self.prefetch = None
+        self._inicializacao = None
+        self.formato = AUTOMATICO
+        self.nivel = AUTOMATICO
+        self.aprendiz_id = getpass.getuser()
         self.sistema_config = {
             "ollama_model": "llama2",
             "whisper_model": "small",
             "pasta_dados": "dados",
+            # Só valem com o divisor 'caracteres' (o padrão mede os chunks em tokens)
             "chunk_size": 1000,
             "chunk_overlap": 200,
-            "modo_quieto": True
+            "modo_quieto": True,
+            "observar_dados": True,
+            "caminho_indice": "indice_salvo",
+            "modelo_rapido": None,
+            "slo_espera_llm": 15,
+            "similaridade_minima_imagens": 0.25
         }
         
       
         self._construir_interface()
+        self.root.after(INTERVALO_QUADRO_MS, self._drenar_eventos)
         self._inicializar_sistema()
         
     def _inicializar_sistema(self):
+        # A janela aparece antes dos modelos e do índice serem carregados
+        if self._inicializacao is not None and self._inicializacao.is_alive():
+            return
+        self._inicializacao = threading.Thread(target=self._carregar_sistema, name="inicializacao", daemon=True)
+        self._inicializacao.start()
+
+    def _carregar_sistema(self):
         try:
             self._atualizar_status("Inicializando sistema tutor adaptativo...")
-            self.sistema = Sistema(config=self.sistema_config)
-            documentos = self.sistema.processar_dados()
-            if documentos:
-                self.sistema.indexador.criar_indice(documentos)
+            # Importado aqui: main traz torch e os modelos de embeddings
+            from main import Sistema
+
+            if self.sistema is not None:
+                self.sistema.parar_observador()
+            sistema = Sistema(config=self.sistema_config)
+            sistema.processar_dados()
+            if self.prefetch is not None:
+                self.prefetch.parar()
+            self.prefetch = PrefetchBusca(
+                lambda texto: sistema.tutor.buscar_documentos(texto, self.aprendiz_id),
+                versao=lambda: sistema.indexador.versao_indice
+            )
+            # Materiais novos em dados/ passam a ser indexados sem reiniciar
+            sistema.iniciar_observador()
+            self.sistema = sistema
             self._atualizar_status("✅ Sistema pronto para uso!")
         except Exception as e:
             self._atualizar_status(f"❌ Falha ao iniciar sistema: {str(e)}")
-            messagebox.showerror("Erro", f"Falha ao iniciar sistema: {str(e)}")
+            self._agendar(messagebox.showerror, "Erro", f"Falha ao iniciar sistema: {str(e)}")
             
     def _construir_interface(self):
         # Configurações
@@ -47,13 +96,13 @@ class InterfaceTk:
         ttk.Label(config_frame, text="Formato:").pack(side="left")
         self.formato_var = tk.StringVar(value=self.formato)
         formato_menu = ttk.Combobox(config_frame, textvariable=self.formato_var, state="readonly")
-        formato_menu['values'] = ["texto", "vídeo", "áudio"]
+        formato_menu['values'] = [AUTOMATICO, "texto", "vídeo", "áudio", "imagem"]
         formato_menu.pack(side="left", padx=5)
         
         ttk.Label(config_frame, text="Nível:").pack(side="left")
         self.nivel_var = tk.StringVar(value=self.nivel)
         nivel_menu = ttk.Combobox(config_frame, textvariable=self.nivel_var, state="readonly")
-        nivel_menu['values'] = ["iniciante", "intermediário", "avançado"]
+        nivel_menu['values'] = [AUTOMATICO, "iniciante", "intermediário", "avançado"]
         nivel_menu.pack(side="left", padx=5)
         
         reiniciar_btn = ttk.Button(config_frame, text="Reiniciar Sistema", command=self._reiniciar_sistema)
@@ -73,6 +122,9 @@ class InterfaceTk:
         self.pergunta_var = tk.StringVar()
         pergunta_entry = ttk.Entry(entrada_frame, textvariable=self.pergunta_var)
         pergunta_entry.pack(side="left", fill="x", expand=True, padx=5)
+        # A busca começa enquanto o aprendiz ainda digita
+        pergunta_entry.bind("<KeyRelease>", self._ao_digitar)
+        pergunta_entry.bind("<Return>", lambda _evento: self._enviar_pergunta())
         
         enviar_btn = ttk.Button(entrada_frame, text="Enviar", command=self._enviar_pergunta)
         enviar_btn.pack(side="right")
@@ -82,7 +134,45 @@ class InterfaceTk:
         status_label = ttk.Label(self.root, textvariable=self.status_var)
         status_label.pack(fill="x", padx=10, pady=5)
         
+    def _agendar(self, funcao, *args, geracao=None):
+        """Pede que `funcao` seja executada na thread do Tk (seguro em qualquer thread)
+
+        Com `geracao`, o evento é descartado se outra pergunta tiver sido enviada depois.
+        """
+        self._eventos.put((funcao, args, geracao))
+
+    def _drenar_eventos(self):
+        """Aplica as atualizações pendentes e reagenda a si mesmo para o próximo quadro"""
+        eventos = []
+        try:
+            while True:
+                eventos.append(self._eventos.get_nowait())
+        except queue.Empty:
+            pass
+
+        alterado = False
+        for i, (funcao, args, geracao) in enumerate(eventos):
+            if geracao is not None and geracao != self._geracao:
+                continue
+            # Várias atualizações parciais no mesmo quadro: só a última é desenhada
+            proximo = eventos[i + 1][0] if i + 1 < len(eventos) else None
+            if funcao == self._exibir_resposta_parcial and proximo == self._exibir_resposta_parcial:
+                continue
+            try:
+                funcao(*args)
+            except Exception as e:
+                self.status_var.set(f"❌ Erro na interface: {str(e)}")
+            alterado = True
+
+        if alterado:
+            self._limitar_historico_widget()
+            self.historico_text.see(tk.END)
+        self.root.after(INTERVALO_QUADRO_MS, self._drenar_eventos)
+
     def _atualizar_status(self, mensagem):
+        if threading.current_thread() is not threading.main_thread():
+            self._agendar(self.status_var.set, mensagem)
+            return
         self.status_var.set(mensagem)
         self.root.update_idletasks()
 
@@ -92,59 +182,158 @@ class InterfaceTk:
         self.historico_text.insert(tk.END, f"{role.capitalize()}: {content}\n")
         if metadata:
             self.historico_text.insert(tk.END, f"  Detalhes: {metadata}\n")
-        self.historico_text.see(tk.END)
         self.historico_text.config(state='disabled')
 
+    def _limitar_historico_widget(self):
+        """Descarta as linhas mais antigas do widget além de MAX_LINHAS_HISTORICO"""
+        linhas = int(self.historico_text.index("end-1c").split(".")[0])
+        excesso = linhas - MAX_LINHAS_HISTORICO
+        if excesso > 0:
+            self.historico_text.config(state='normal')
+            self.historico_text.delete("1.0", f"{excesso + 1}.0")
+            self.historico_text.config(state='disabled')
+
+    def _ao_digitar(self, _evento=None):
+        if self.prefetch is not None:
+            self.prefetch.digitado(self.pergunta_var.get())
+
     def _enviar_pergunta(self):
-        if self.processando:
-            return
-        
         pergunta = self.pergunta_var.get().strip()
         if not pergunta:
             return
         
-        self.pergunta_var.set("")
-        threading.Thread(target=self._processar_resposta, args=(pergunta,)).start()
+        if self.processando:
+            # Pergunta reformulada: a geração anterior é abortada e a nova segue
+            if self.sistema is not None and self.sistema.tutor is not None:
+                self.sistema.tutor.cancelar(self.aprendiz_id)
+            self._interromper_resposta()
 
-    def _processar_resposta(self, pergunta):
+        self.pergunta_var.set("")
         self.processando = True
-        self._atualizar_historico("Usuário", pergunta)
+        self._geracao += 1
+        # As variáveis do Tk são lidas aqui, na thread principal
+        formato, nivel = self.formato_var.get(), self.nivel_var.get()
+        threading.Thread(
+            target=self._processar_resposta, args=(pergunta, formato, nivel, self._geracao), daemon=True
+        ).start()
+
+    def _processar_resposta(self, pergunta, formato, nivel, geracao):
+        """Roda fora da thread do Tk: toda alteração de widget passa por _agendar"""
+        self._agendar(self._atualizar_historico, "Usuário", pergunta, geracao=geracao)
+        self._agendar(self._iniciar_resposta, geracao=geracao)
+
+        # Resposta completa que chega depois de uma resposta rápida (LLM sobrecarregado);
+        # só substitui a mensagem depois que ela terminou de ser exibida
+        melhoria = {"exibida": False, "texto": None}
+        trava = threading.Lock()
+
+        def ao_atualizar(texto):
+            with trava:
+                if not melhoria["exibida"]:
+                    melhoria["texto"] = texto
+                    return
+            self._agendar(self._substituir_resposta, texto, geracao=geracao)
 
         resposta_completa = ""
         try:
-            for chunk in self._gerar_resposta(pergunta):
+            for chunk in self._gerar_resposta(pergunta, formato, nivel, ao_atualizar):
+                if geracao != self._geracao:
+                    return
                 resposta_completa += chunk
-                self._atualizar_resposta_parcial(resposta_completa + "▌")
+                self._agendar(self._exibir_resposta_parcial, resposta_completa + "▌", geracao=geracao)
                 time.sleep(0.02)
-                
-            self._atualizar_resposta_parcial(resposta_completa)
-            self._atualizar_historico("Assistente", resposta_completa, {
-                "formato": self.formato_var.get(),
-                "nivel": self.nivel_var.get()
-            })
+
+            self._agendar(self._finalizar_resposta, resposta_completa, {
+                "formato": formato,
+                "nivel": nivel
+            }, geracao=geracao)
+            with trava:
+                melhoria["exibida"] = True
+            if melhoria["texto"] is not None:
+                self._agendar(self._substituir_resposta, melhoria["texto"], geracao=geracao)
         except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao processar pergunta: {str(e)}")
+            self._agendar(self._finalizar_resposta, resposta_completa, None, geracao=geracao)
+            self._agendar(messagebox.showerror, "Erro", f"Erro ao processar pergunta: {str(e)}", geracao=geracao)
         finally:
-            self.processando = False
+            self._agendar(setattr, self, "processando", False, geracao=geracao)
 
-    def _atualizar_resposta_parcial(self, resposta):
+    def _interromper_resposta(self):
+        """Fecha a mensagem do assistente ainda aberta, marcando-a como interrompida"""
+        if self._resposta_exibida is not None:
+            self._finalizar_resposta(self._resposta_exibida.rstrip("▌") + " [interrompida]")
+
+    def _iniciar_resposta(self):
+        """Abre a mensagem do assistente, que será atualizada no lugar"""
         self.historico_text.config(state='normal')
-        self.historico_text.insert(tk.END, f"Assistente: {resposta}\n")
-        self.historico_text.see(tk.END)
+        self.historico_text.insert(tk.END, "Assistente: ")
+        self.historico_text.mark_set("resposta", "end-1c")
+        self.historico_text.mark_gravity("resposta", tk.LEFT)
         self.historico_text.config(state='disabled')
+        self._resposta_exibida = ""
 
-    def _gerar_resposta(self, pergunta):
+    def _exibir_resposta_parcial(self, resposta):
+        """Reescreve só o trecho da mensagem atual que mudou desde o último quadro"""
+        if self._resposta_exibida is None:
+            self._iniciar_resposta()
+        comum = len(os.path.commonprefix((self._resposta_exibida, resposta)))
+        self.historico_text.config(state='normal')
+        self.historico_text.delete(f"resposta+{comum}c", "end-1c")
+        self.historico_text.insert(tk.END, resposta[comum:])
+        self.historico_text.config(state='disabled')
+        self._resposta_exibida = resposta
+
+    def _finalizar_resposta(self, resposta, metadata=None):
+        self._exibir_resposta_parcial(resposta)
+        self.historico.append({"role": "Assistente", "content": resposta, "metadata": metadata})
+        # Guarda onde a mensagem está, para _substituir_resposta
+        self.historico_text.mark_set("ultima_resposta", "resposta")
+        self.historico_text.mark_gravity("ultima_resposta", tk.LEFT)
+        self.historico_text.mark_set("ultima_resposta_fim", "end-1c")
+        self.historico_text.mark_gravity("ultima_resposta_fim", tk.LEFT)
+        self.historico_text.config(state='normal')
+        self.historico_text.insert(tk.END, "\n")
+        if metadata:
+            self.historico_text.insert(tk.END, f"  Detalhes: {metadata}\n")
+        self.historico_text.mark_unset("resposta")
+        self.historico_text.config(state='disabled')
+        self._resposta_exibida = None
+
+    def _substituir_resposta(self, resposta):
+        """Troca, no lugar, a última mensagem do assistente pela resposta completa"""
+        if "ultima_resposta" not in self.historico_text.mark_names():
+            return
+        self.historico_text.config(state='normal')
+        self.historico_text.delete("ultima_resposta", "ultima_resposta_fim")
+        self.historico_text.insert("ultima_resposta", resposta)
+        self.historico_text.mark_set("ultima_resposta_fim", f"ultima_resposta+{len(resposta)}c")
+        self.historico_text.config(state='disabled')
+        for mensagem in reversed(self.historico):
+            if mensagem["role"] == "Assistente":
+                mensagem["content"] = resposta
+                break
+
+    def _gerar_resposta(self, pergunta, formato, nivel, ao_atualizar=None):
         if not self.sistema or not hasattr(self.sistema, 'tutor'):
             yield "Sistema não está pronto para responder."
             return
         
         try:
+            antecipada = self.prefetch.obter(pergunta) if self.prefetch is not None else None
+            vetor, docs = antecipada or (None, None)
+            # "automático" deixa o tutor usar o perfil do aprendiz
             resposta = self.sistema.tutor.responder(
                 pergunta=pergunta,
-                formato=self.formato_var.get()
+                formato=None if formato == AUTOMATICO else formato,
+                nivel=None if nivel == AUTOMATICO else nivel,
+                aprendiz_id=self.aprendiz_id,
+                docs=docs,
+                vetor=vetor,
+                ao_atualizar=ao_atualizar
             )
             for i in range(0, len(resposta), 10):
                 yield resposta[i:i+10]
+        except Cancelada:
+            return
         except Exception as e:
             yield f"Erro ao gerar resposta: {str(e)}"
 
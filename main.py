@@ -1,30 +1,42 @@
 import os
 os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
 
+import importlib.util
+import json
 import logging
 import sys
 from typing import List, Dict
 from src.indexador import Indexador
-from src.audio_processor import AudioProcessor
-from src.pdf_processor import PDFProcessor
-from src.text_processor import TextProcessor
-from src.video_processor import VideoProcessor
-from src.image_processor import ImageProcessor
 from src.tutor_adaptativo import TutorAdaptativo
-from langchain_community.llms import Ollama
-from langchain_ollama import ChatOllama 
+from src.perfil_aprendiz import PerfilAprendizStore
+from src.respostas_pregeradas import RespostasPregeradas
+from src.roteador_modelos import RoteadorModelos
+from src.observador import ObservadorPasta
 
 class Sistema:
     def __init__(self, config: Dict = None):
         self.tutor = None
+        self.observador = None
         self.logger = logging.getLogger(__name__)
         self.config = config or {
             "ollama_model": "llama2",
             "pasta_dados": "dados",
             "whisper_model": "base",
+            # Só valem com o divisor 'caracteres'; o padrão ('tokens') usa o limite do modelo de embeddings
             "chunk_size": 1000,
             "chunk_overlap": 200,
-            "modo_quieto": False 
+            "modo_quieto": False,
+            "banco_perfis": "perfis.db",
+            "banco_respostas": "respostas_pregeradas.db",
+            "observar_dados": True,
+            # Índice salvo entre execuções; só os arquivos alterados desde então são reindexados
+            "caminho_indice": "indice_salvo",
+            # Modelo pequeno para perguntas simples (ex.: "llama3.2:1b"); None usa só ollama_model
+            "modelo_rapido": None,
+            # Espera máxima na fila do LLM (s); acima dela a resposta sai só com os trechos dos materiais
+            "slo_espera_llm": 15,
+            # Similaridade mínima (CLIP) para uma imagem acompanhar as respostas em formato visual
+            "similaridade_minima_imagens": 0.25
         }
         self._inicializar_componentes()
 
@@ -34,33 +46,41 @@ class Sistema:
             # Configuração do Indexador
             self.indexador = Indexador(config={
                 "audio_model": self.config["whisper_model"],
+                # Ignorados pelo divisor padrão ('tokens'), que mede os chunks em tokens do modelo
                 "chunk_size": self.config["chunk_size"],
                 "chunk_overlap": self.config["chunk_overlap"]
             })
             
+            # Perfis persistentes dos aprendizes (formato preferido, domínio, nível)
+            self.perfis = PerfilAprendizStore(self.config.get("banco_perfis", "perfis.db"))
+
+            # Respostas geradas em lote (python -m src.respostas_pregeradas)
+            self.respostas_pregeradas = RespostasPregeradas(
+                self.config.get("banco_respostas", "respostas_pregeradas.db")
+            )
+
+            # Roteamento entre o modelo rápido e o principal, por pergunta
+            self.roteador = None
+            if self.config.get("modelo_rapido"):
+                self.roteador = RoteadorModelos({
+                    "pequeno": {"model": self.config["modelo_rapido"]},
+                    "grande": {"model": self.config["ollama_model"]}
+                })
 
             self.tutor = TutorAdaptativo( 
                 indexador=self.indexador,
-                model=self.config["ollama_model"]
+                model=self.config["ollama_model"],
+                perfis=self.perfis,
+                respostas_pregeradas=self.respostas_pregeradas,
+                roteador=self.roteador,
+                slo_espera=self.config.get("slo_espera_llm"),
+                similaridade_imagens=self.config.get("similaridade_minima_imagens", 0.25)
             )
             self.logger.info("Tutor inicializado com sucesso")
 
-            # Configuração do LLM local com Ollama
-            self.llm = Ollama(
-                base_url="http://localhost:11434",
-                model=self.config["ollama_model"],
-                temperature=0.7,
-                timeout=600    
-            )
-            
-            # Processadores
-            self.processadores = {
-                "pdf": PDFProcessor(self.indexador),
-                "texto": TextProcessor(self.indexador),
-                "video": VideoProcessor(self.indexador),
-                "imagem": ImageProcessor(),
-                "audio": AudioProcessor(model_size=self.config["whisper_model"])
-            }
+            # O mesmo ChatOllama do tutor (o Ollama de langchain_community
+            # importava todo o pacote só para esta verificação)
+            self.llm = self.tutor.llm
             
             self.logger.info("Componentes inicializados com sucesso")
             
@@ -71,10 +91,10 @@ class Sistema:
     def _verificar_ambiente(self):
         """Verifica requisitos e estrutura de pastas"""
         try:
-            # Verifica dependências
-            import torch
-            import whisper
-            from PIL import Image
+            # Verifica dependências sem importá-las (são carregadas só quando usadas)
+            for modulo in ("torch", "whisper", "PIL"):
+                if importlib.util.find_spec(modulo) is None:
+                    raise ImportError(f"No module named '{modulo}'")
             
            # Verifica se a pasta de dados foi especificada
             if "pasta_dados" not in self.config:
@@ -96,21 +116,65 @@ class Sistema:
             self.logger.error(f"Erro na verificação do ambiente: {str(e)}")
             return False
 
-    def processar_dados(self):
-        """Processa todos os tipos de dados"""
-        documentos = []
-        
-        for tipo, processor in self.processadores.items():
-            try:
-                docs = processor.processar()
-                if docs:
-                    documentos.extend(docs)
-                    self.logger.info(f"Processado {len(docs)} documentos {tipo}")
-            except Exception as e:
-                self.logger.error(f"Erro no {tipo}_processor: {str(e)}")
-                continue
-                
-        return documentos
+    def processar_dados(self) -> bool:
+        """Processa e indexa todos os tipos de dados pelo pipeline do indexador
+
+        Com 'caminho_indice' configurado, o índice salvo é carregado e só os
+        arquivos alterados, novos ou removidos desde o salvamento são
+        reindexados; sem índice salvo, tudo é processado e o resultado salvo.
+        """
+        caminho = self.config.get("caminho_indice")
+        # Estado anterior ao processamento: um arquivo alterado durante a
+        # indexação fica registrado com a data antiga e é refeito na próxima vez
+        estado = self._estado_arquivos()
+        if caminho and os.path.isdir(caminho) and self.indexador.carregar_indice(caminho):
+            alterados = self._arquivos_alterados(caminho, estado)
+            if alterados:
+                self.logger.info(f"{len(alterados)} arquivo(s) alterado(s) desde o último índice salvo")
+                resultado = self.indexador.atualizar_arquivos(alterados)
+                if resultado["falha"] is None:
+                    self._salvar_indice(caminho, estado, resultado["arquivos_com_erro"])
+            return True
+
+        if not self.indexador.processar_e_indexar(self.config["pasta_dados"]):
+            return False
+        if caminho:
+            self._salvar_indice(caminho, estado, self.indexador.ultima_ingestao["arquivos_com_erro"])
+        return True
+
+    def _estado_arquivos(self) -> Dict[str, List[int]]:
+        estado = {}
+        for arquivo in self.indexador.pipeline.descobrir(self.config["pasta_dados"]):
+            info = os.stat(arquivo)
+            estado[arquivo] = [info.st_mtime_ns, info.st_size]
+        return estado
+
+    def _salvar_indice(self, caminho: str, estado: Dict[str, List[int]], com_erro: List[str]):
+        """Salva o índice e o estado dos arquivos indexados; os que falharam ficam de fora e são refeitos"""
+        if self.indexador.salvar_indice(caminho):
+            com_erro = set(com_erro)
+            with open(os.path.join(caminho, "arquivos.json"), "w", encoding="utf-8") as f:
+                json.dump({c: e for c, e in estado.items() if c not in com_erro}, f)
+
+    def _arquivos_alterados(self, caminho: str, atual: Dict[str, List[int]]) -> List[str]:
+        """Arquivos cuja data ou tamanho difere do registrado junto ao índice salvo"""
+        try:
+            with open(os.path.join(caminho, "arquivos.json"), encoding="utf-8") as f:
+                salvo = json.load(f)
+        except (OSError, ValueError):
+            salvo = {}
+        alterados = [c for c, estado in atual.items() if salvo.get(c) != estado]
+        return alterados + [c for c in salvo if c not in atual]
+
+    def iniciar_observador(self):
+        """Reindexa em segundo plano os arquivos adicionados/alterados na pasta de dados"""
+        if self.observador is None and self.config.get("observar_dados"):
+            self.observador = ObservadorPasta(self.indexador, self.config["pasta_dados"]).iniciar()
+
+    def parar_observador(self):
+        if self.observador is not None:
+            self.observador.parar()
+            self.observador = None
 
     def executar(self):
         """Fluxo principal atualizado"""
@@ -119,17 +183,11 @@ class Sistema:
             
         self.logger.info("=== INICIANDO SISTEMA ===")
         
-        # Processamento dos dados
-        documentos = self.processar_dados()
-        if not documentos:
-            self.logger.error("Nenhum documento válido encontrado")
-            return
-            
-        # Criação do índice
+        # Processamento dos dados e criação do índice
         try:
-            if not self.indexador.criar_indice(documentos):
-                raise RuntimeError("Falha na criação do índice")
-            self.logger.info(f"Índice criado com {len(documentos)} documentos")
+            if not self.processar_dados():
+                raise RuntimeError("Nenhum documento válido indexado")
+            self.iniciar_observador()
         except Exception as e:
             self.logger.critical(f"Erro no índice: {str(e)}")
             return
@@ -138,20 +196,38 @@ class Sistema:
         try:
             self.tutor = TutorAdaptativo(
             indexador=self.indexador,
-            model=self.config["ollama_model"])
+            model=self.config["ollama_model"],
+            perfis=self.perfis,
+            agendador=self.tutor.agendador if self.tutor else None,
+            respostas_pregeradas=self.respostas_pregeradas,
+            roteador=self.roteador,
+            slo_espera=self.config.get("slo_espera_llm"),
+            similaridade_imagens=self.config.get("similaridade_minima_imagens", 0.25))
             self._iniciar_interacao()
 
         except Exception as e:
             self.logger.critical(f"Falha no tutor: {str(e)}")
 
 
-    def _detectar_formato_preferido(self, historico: List[str]) -> str:
-        """Analisa o histórico para inferir o formato preferido (texto/vídeo/áudio)."""
-        formatos = {
-            "texto": sum(1 for msg in historico if "[VIDEO]" not in msg and "[AUDIO]" not in msg),
-            "video": sum(1 for msg in historico if "[VIDEO]" in msg),
-            "audio": sum(1 for msg in historico if "[AUDIO]" in msg)
-        }
+    def _detectar_formato_preferido(self, historico: List[str], aprendiz_id: str = None) -> str:
+        """Infere o formato preferido (texto/vídeo/áudio).
+
+        Usa os contadores do perfil do aprendiz quando disponível; o
+        histórico só é percorrido (uma vez) para sessões sem perfil.
+        """
+        if aprendiz_id:
+            preferido = self.perfis.formato_preferido(aprendiz_id)
+            if preferido:
+                return preferido
+
+        formatos = {"texto": 0, "video": 0, "audio": 0}
+        for msg in historico:
+            if "[VIDEO]" in msg:
+                formatos["video"] += 1
+            elif "[AUDIO]" in msg:
+                formatos["audio"] += 1
+            else:
+                formatos["texto"] += 1
         return max(formatos.items(), key=lambda x: x[1])[0]
     
     def _iniciar_interacao(self):
@@ -163,7 +239,8 @@ class Sistema:
         print("Sistema de Aprendizado Adaptativo (+A Educação)")
         print("="*50)
     
-        formato_atual = "texto"
+        formato_atual = None
+        aprendiz_id = self.config.get("aprendiz_id", "console")
     
         while True:
             try:
@@ -189,8 +266,9 @@ class Sistema:
                         continue
             
                 # Processa perguntas normais
-                resposta = self.tutor.responder(entrada, formato=formato_atual)
-                self._exibir_resposta(resposta, formato_atual)
+                resposta = self.tutor.responder(entrada, formato=formato_atual, aprendiz_id=aprendiz_id,
+                                                colecao=self.config.get("colecao"))
+                self._exibir_resposta(resposta, formato_atual or self.perfis.formato_preferido(aprendiz_id) or "texto")
             
             except Exception as e:
                 self.logger.error(f"Erro na interação: {str(e)}")
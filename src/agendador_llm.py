@@ -0,0 +1,343 @@
+import itertools
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional
+
+PRIORIDADE_INTERATIVA = 0
+PRIORIDADE_LOTE = 1
+
+
+# Tarefa sendo gerada em cada vaga, para associar a conexão HTTP aberta à tarefa
+_execucao = threading.local()
+
+
+class Cancelada(Exception):
+    """A geração foi cancelada (ex.: o aprendiz reformulou a pergunta)"""
+
+
+class TempoEsgotado(TimeoutError):
+    """A geração não terminou dentro do prazo"""
+
+
+class Tarefa:
+    """Uma chamada ao LLM enviada ao agendador"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, mensagens, aprendiz_id: str, prioridade: int, timeout: float,
+                 ao_gerar: Optional[Callable[[str], None]], llm=None):
+        self.id = next(self._ids)
+        self.mensagens = mensagens
+        self.llm = llm
+        self.aprendiz_id = aprendiz_id
+        self.prioridade = prioridade
+        self.criada_em = time.monotonic()
+        self.prazo = self.criada_em + timeout
+        self.ao_gerar = ao_gerar
+        self.iniciada_em: Optional[float] = None
+        self._cancelada = threading.Event()
+        self._concluida = threading.Event()
+        self._mensagem = None
+        self._erro: Optional[BaseException] = None
+        # Socket da conexão com o Ollama enquanto a tarefa gera (ver opcoes_http)
+        self._socket: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+    @property
+    def cancelada(self) -> bool:
+        return self._cancelada.is_set()
+
+    @property
+    def concluida(self) -> bool:
+        return self._concluida.is_set()
+
+    def cancelar(self):
+        """Cancela a tarefa; se já estiver gerando, a conexão com o Ollama é derrubada na hora"""
+        self._interromper(Cancelada(f"Tarefa {self.id} cancelada"))
+
+    def resultado(self):
+        """Aguarda e devolve a mensagem gerada (AIMessageChunk), ou levanta o erro da tarefa"""
+        if not self._concluida.wait(max(0.0, self.prazo - time.monotonic())):
+            self._expirar()
+        if self._erro is not None:
+            raise self._erro
+        return self._mensagem
+
+    def _expirar(self):
+        self._interromper(TempoEsgotado(f"Tarefa {self.id} excedeu o prazo"))
+
+    def _interromper(self, erro: BaseException):
+        self._cancelada.set()
+        self._concluir(erro=erro)
+        with self._lock:
+            conexao = self._socket
+        if conexao is not None:
+            _derrubar(conexao)
+
+    def _conectar(self, conexao: socket.socket):
+        """Registra o socket aberto para a geração (chamado pelo rastreio do httpx)"""
+        with self._lock:
+            self._socket = conexao
+        # Cancelada entre o início da geração e a conexão
+        if self.cancelada:
+            _derrubar(conexao)
+
+    def _concluir(self, mensagem=None, erro: Optional[BaseException] = None):
+        # Só o primeiro desfecho vale (cancelamento e conclusão podem disputar)
+        if self._concluida.is_set():
+            return
+        self._mensagem, self._erro = mensagem, erro
+        self._concluida.set()
+
+
+def _derrubar(conexao: socket.socket):
+    # shutdown (e não close) desbloqueia na hora a leitura feita pela vaga em outra thread
+    try:
+        conexao.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def _rastrear(evento: str, info: Dict):
+    if evento == "connection.connect_tcp.complete":
+        tarefa = getattr(_execucao, "tarefa", None)
+        if tarefa is not None:
+            tarefa._conectar(info["return_value"].get_extra_info("socket"))
+
+
+def _ao_requisitar(requisicao):
+    requisicao.extensions["trace"] = _rastrear
+
+
+def opcoes_http() -> Dict:
+    """`client_kwargs` do ChatOllama que permitem ao agendador abortar a geração
+
+    Cada geração abre a própria conexão (sem keep-alive) e o rastreio do
+    httpx entrega o socket à tarefa em execução na vaga. Cancelar a tarefa
+    ou estourar o prazo derruba a conexão, mesmo durante a avaliação do
+    prompt (quando ainda não chegou nenhum token); o Ollama para de gerar
+    ao perceber a desconexão e a vaga é liberada na hora. Com modelos sem
+    essas opções, a geração só é interrompida no token seguinte.
+    """
+    import httpx
+
+    return {
+        "limits": httpx.Limits(max_keepalive_connections=0),
+        "event_hooks": {"request": [_ao_requisitar]}
+    }
+
+
+class _ClienteAgendado:
+    """Adaptador com `invoke`, para componentes que esperam um modelo de chat"""
+
+    def __init__(self, agendador: "AgendadorLLM", aprendiz_id: str, prioridade: int):
+        self.agendador = agendador
+        self.aprendiz_id = aprendiz_id
+        self.prioridade = prioridade
+
+    def invoke(self, entrada):
+        return self.agendador.executar(entrada, aprendiz_id=self.aprendiz_id, prioridade=self.prioridade)
+
+
+class AgendadorLLM:
+    """Fila única na frente das chamadas ao Ollama.
+
+    Um número fixo de vagas (threads) executa as gerações; as tarefas
+    esperam em filas por prioridade (interativas antes das de lote) e,
+    dentro de cada prioridade, os aprendizes são atendidos em rodízio,
+    para que quem envia muitas perguntas não bloqueie os demais. Cada
+    tarefa tem um prazo de ponta a ponta (fila + geração). A geração é
+    feita por streaming: ao cancelar ou estourar o prazo, a conexão HTTP
+    é derrubada (modelos criados com `opcoes_http()`), o que faz o Ollama
+    parar de gerar e libera a vaga.
+    """
+
+    def __init__(self, llm, vagas: int = 1, timeout: float = 300.0):
+        """
+        Args:
+            llm: Modelo de chat (ChatOllama)
+            vagas: Gerações simultâneas (use o mesmo valor de OLLAMA_NUM_PARALLEL)
+            timeout: Prazo padrão de cada tarefa, em segundos
+        """
+        self.logger = logging.getLogger(__name__)
+        self.llm = llm
+        self.vagas = max(1, vagas)
+        self.timeout = timeout
+        self._filas: Dict[int, "OrderedDict[str, deque]"] = {}
+        self._em_execucao: Dict[int, Tarefa] = {}
+        # Média móvel da duração das gerações, para prever a espera na fila
+        self._duracao_media: Optional[float] = None
+        self._condicao = threading.Condition()
+        self._encerrado = False
+        self._threads = [
+            threading.Thread(target=self._trabalhar, name=f"agendador-llm-{i}", daemon=True)
+            for i in range(self.vagas)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def enviar(self, mensagens, aprendiz_id: str = "", prioridade: int = PRIORIDADE_INTERATIVA,
+               timeout: Optional[float] = None, ao_gerar: Optional[Callable[[str], None]] = None,
+               llm=None) -> Tarefa:
+        """Coloca uma geração na fila e devolve a tarefa (não bloqueia)
+
+        Args:
+            mensagens: Entrada do modelo (texto ou lista de mensagens)
+            aprendiz_id: Dono da tarefa, para o rodízio e o cancelamento
+            prioridade: PRIORIDADE_INTERATIVA ou PRIORIDADE_LOTE
+            timeout: Prazo em segundos (padrão do agendador se None)
+            ao_gerar: Chamado com cada trecho de texto gerado
+            llm: Modelo desta tarefa (ex.: escolhido pelo roteador); None usa o do agendador
+        """
+        tarefa = Tarefa(mensagens, aprendiz_id, prioridade, timeout or self.timeout, ao_gerar, llm)
+        with self._condicao:
+            if self._encerrado:
+                raise RuntimeError("Agendador encerrado")
+            fila = self._filas.setdefault(prioridade, OrderedDict())
+            fila.setdefault(aprendiz_id, deque()).append(tarefa)
+            self._condicao.notify()
+        return tarefa
+
+    def executar(self, mensagens, **kwargs):
+        """Envia e aguarda o resultado (mesmos argumentos de `enviar`)"""
+        return self.enviar(mensagens, **kwargs).resultado()
+
+    def cancelar(self, aprendiz_id: str, prioridade: Optional[int] = None) -> int:
+        """Cancela as tarefas de um aprendiz, na fila ou em execução; retorna quantas"""
+        with self._condicao:
+            tarefas = [t for t in self._em_execucao.values() if t.aprendiz_id == aprendiz_id]
+            for fila in self._filas.values():
+                tarefas.extend(fila.get(aprendiz_id, ()))
+        tarefas = [t for t in tarefas if not t.concluida and (prioridade is None or t.prioridade == prioridade)]
+        for tarefa in tarefas:
+            tarefa.cancelar()
+        if tarefas:
+            self.logger.info(f"{len(tarefas)} geração(ões) de {aprendiz_id or 'anônimo'} cancelada(s)")
+        return len(tarefas)
+
+    def cliente(self, aprendiz_id: str = "", prioridade: int = PRIORIDADE_LOTE) -> _ClienteAgendado:
+        """Objeto com `invoke` que passa pelo agendador (para memória, resumos etc.)"""
+        return _ClienteAgendado(self, aprendiz_id, prioridade)
+
+    def estado(self) -> Dict:
+        """Tarefas na fila por prioridade e em execução"""
+        with self._condicao:
+            return {
+                "fila": {p: sum(len(d) for d in fila.values()) for p, fila in self._filas.items()},
+                "em_execucao": len(self._em_execucao),
+                "vagas": self.vagas,
+                "duracao_media": self._duracao_media
+            }
+
+    def espera_prevista(self, prioridade: int = PRIORIDADE_INTERATIVA) -> float:
+        """Segundos que uma tarefa enviada agora deve esperar na fila
+
+        É a maior entre a espera estimada (tarefas à frente divididas pelas
+        vagas, vezes a duração média das gerações) e a espera já observada
+        da tarefa mais antiga ainda na fila, que denuncia a sobrecarga
+        mesmo antes de haver uma média.
+        """
+        agora = time.monotonic()
+        with self._condicao:
+            na_frente = [t for p, fila in self._filas.items() if p <= prioridade
+                         for tarefas in fila.values() for t in tarefas if not t.concluida]
+            ocupadas = len(self._em_execucao)
+            media = self._duracao_media
+        observada = max((agora - t.criada_em for t in na_frente), default=0.0)
+        excedentes = len(na_frente) + ocupadas - self.vagas + 1
+        estimada = excedentes / self.vagas * media if media is not None and excedentes > 0 else 0.0
+        return max(estimada, observada)
+
+    def encerrar(self):
+        with self._condicao:
+            self._encerrado = True
+            pendentes = [t for fila in self._filas.values() for d in fila.values() for t in d]
+            self._filas.clear()
+            self._condicao.notify_all()
+        for tarefa in pendentes + list(self._em_execucao.values()):
+            tarefa.cancelar()
+        for thread in self._threads:
+            thread.join()
+
+    def _proxima(self) -> Optional[Tarefa]:
+        """Próxima tarefa válida: menor prioridade primeiro, aprendizes em rodízio"""
+        for prioridade in sorted(self._filas):
+            fila = self._filas[prioridade]
+            while fila:
+                aprendiz_id, tarefas = next(iter(fila.items()))
+                tarefa = tarefas.popleft()
+                if tarefas:
+                    fila.move_to_end(aprendiz_id)
+                else:
+                    del fila[aprendiz_id]
+                if tarefa.concluida:
+                    continue
+                if time.monotonic() >= tarefa.prazo:
+                    tarefa._concluir(erro=TempoEsgotado(f"Tarefa {tarefa.id} expirou na fila"))
+                    continue
+                return tarefa
+        return None
+
+    def _trabalhar(self):
+        while True:
+            with self._condicao:
+                tarefa = self._proxima()
+                while tarefa is None:
+                    if self._encerrado:
+                        return
+                    self._condicao.wait()
+                    tarefa = self._proxima()
+                self._em_execucao[tarefa.id] = tarefa
+            try:
+                self._gerar(tarefa)
+            finally:
+                with self._condicao:
+                    self._em_execucao.pop(tarefa.id, None)
+
+    def _gerar(self, tarefa: Tarefa):
+        tarefa.iniciada_em = time.monotonic()
+        espera = tarefa.iniciada_em - tarefa.criada_em
+        mensagem = None
+        fluxo = None
+        # O prazo vale também durante a avaliação do prompt, antes do primeiro token
+        limite = threading.Timer(max(0.0, tarefa.prazo - time.monotonic()), tarefa._expirar)
+        limite.daemon = True
+        limite.start()
+        _execucao.tarefa = tarefa
+        try:
+            fluxo = (tarefa.llm or self.llm).stream(tarefa.mensagens)
+            for trecho in fluxo:
+                if tarefa.cancelada:
+                    self.logger.info(f"Geração {tarefa.id} interrompida")
+                    return
+                if time.monotonic() >= tarefa.prazo:
+                    tarefa._concluir(erro=TempoEsgotado(f"Tarefa {tarefa.id} excedeu o prazo"))
+                    self.logger.warning(f"Geração {tarefa.id} interrompida por tempo")
+                    return
+                mensagem = trecho if mensagem is None else mensagem + trecho
+                if tarefa.ao_gerar is not None and trecho.content:
+                    tarefa.ao_gerar(trecho.content)
+            tarefa._concluir(mensagem=mensagem)
+            duracao = time.monotonic() - tarefa.iniciada_em
+            with self._condicao:
+                media = self._duracao_media
+                self._duracao_media = duracao if media is None else 0.8 * media + 0.2 * duracao
+            self.logger.debug(
+                f"Geração {tarefa.id} concluída (fila: {espera:.1f}s, "
+                f"geração: {time.monotonic() - tarefa.iniciada_em:.1f}s)"
+            )
+        except Exception as e:
+            if tarefa.cancelada:
+                self.logger.info(f"Geração {tarefa.id} interrompida")
+            else:
+                self.logger.error(f"Erro na geração {tarefa.id}: {str(e)}")
+            tarefa._concluir(erro=e)
+        finally:
+            limite.cancel()
+            _execucao.tarefa = None
+            # Fechar o gerador encerra a resposta HTTP em streaming
+            if fluxo is not None:
+                fluxo.close()
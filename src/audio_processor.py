@@ -1,53 +1,66 @@
-import whisper
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 import logging
-from pydub import AudioSegment  # Corrigido o import
 import os
 import json
 from langchain_core.documents import Document
 
+def documentos_de_segmentos(segmentos: List[Dict], metadados: Dict, texto: str = "") -> Iterator[Document]:
+    """Um Document por segmento da transcrição, com 'inicio' e 'fim' em segundos
+
+    Os segmentos são divididos depois, em janelas de tokens que respeitam
+    suas fronteiras, para que a busca devolva o trecho exato da gravação.
+    Sem segmentos, a transcrição inteira vira um único Document.
+    """
+    if not segmentos:
+        if texto.strip():
+            yield Document(page_content=texto.strip(), metadata=dict(metadados))
+        return
+    for segmento in segmentos:
+        conteudo = segmento["text"].strip()
+        if conteudo:
+            yield Document(
+                page_content=conteudo,
+                metadata={**metadados, "inicio": round(segmento["start"], 2), "fim": round(segmento["end"], 2)}
+            )
+
+
 class AudioProcessor:
 
     def __init__(self, model_size: str = "base"):
+        # Importado aqui para que o módulo (e documentos_de_segmentos) não carregue torch
+        import whisper
+
         self.logger = logging.getLogger(__name__)  # Adicione esta linha
         self.model = whisper.load_model(model_size)
         self.logger.info(f"Modelo Whisper {model_size} carregado")
 
     
-    def processar(self, caminho_pasta: str = None) -> List[Document]:
-        documentos = []
-        if not caminho_pasta:
-            caminho_pasta = os.path.join("dados", "audios")
-        
-        if not os.path.exists(caminho_pasta):
-            self.logger.warning(f"Pasta não encontrada: {caminho_pasta}")
-            os.makedirs(caminho_pasta, exist_ok=True)
-            return []
-            
-
-        for arquivo in os.listdir(caminho_pasta):
-            if arquivo.endswith(('.mp3', '.wav')):
-                try:
-                    caminho = os.path.join(caminho_pasta, arquivo)
-                    resultado = self.transcrever_audio(caminho)
-                    if resultado:
-                        doc = Document(
-                            page_content=resultado["texto"],
-                            metadata={"tipo": "audio", "fonte": arquivo}
-                        )
-                        documentos.append(doc)
-                except Exception as e:
-                    self.logger.error(f"Erro no arquivo {arquivo}: {str(e)}")
-        return documentos
-
-def transcrever_audio(self, caminho_audio: str) -> Optional[Dict]:
+    def extrair(self, caminho: str) -> Iterator[Document]:
+        """Transcreve um arquivo de áudio, um Document por segmento"""
+        resultado = self.transcrever_audio(caminho)
+        if resultado:
+            yield from documentos_de_segmentos(
+                resultado["segmentos"],
+                {
+                    "tipo": "audio",
+                    "fonte": os.path.basename(caminho),
+                    "caminho": caminho,
+                    "duracao": resultado["duracao"]
+                },
+                resultado["texto"]
+            )
+
+    def transcrever_audio(self, caminho_audio: str) -> Optional[Dict]:
         try:
+            from pydub import AudioSegment
+
             audio = AudioSegment.from_file(caminho_audio)
             resultado = self.model.transcribe(caminho_audio)
             return {
                 "texto": resultado["text"],
+                "segmentos": resultado["segments"],
                 "duracao": len(audio)/1000
             }
         except Exception as e:
             self.logger.error(f"Falha na transcrição: {str(e)}")
-            return None
\ No newline at end of file
+            return None
@@ -0,0 +1,276 @@
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from langchain_ollama import ChatOllama
+
+from .config import Config
+from .perfil_aprendiz import NIVEIS, PerfilAprendizStore
+
+PROMPT_AVALIACAO = """Analise esta resposta de um aluno sobre {tema}:
+{resposta}
+
+Classifique:
+1. Nível (iniciante/intermediário/avançado)
+2. Principais lacunas (lista)
+3. Sugestão de tópicos para reforço
+4. Pontuação de domínio do tema, de 0 a 1
+
+Retorne apenas JSON no formato:
+{{"nivel": "...", "lacunas": ["..."], "topicos_reforco": ["..."], "pontuacao": 0.0}}"""
+
+PROMPT_REPARO = """O texto abaixo deveria ser um JSON com as chaves "nivel", "lacunas",
+"topicos_reforco" e "pontuacao". Reescreva-o como JSON válido, sem comentários:
+{texto}"""
+
+# Pontuação usada quando o modelo informa o nível mas não a pontuação
+_PONTUACAO_POR_NIVEL = {"iniciante": 0.3, "intermediário": 0.6, "avançado": 0.9}
+
+
+class RespostaInvalida(ValueError):
+    """O modelo não devolveu uma avaliação interpretável"""
+
+
+def _sem_acentos(texto: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", texto) if unicodedata.category(c) != "Mn")
+
+
+def interpretar_avaliacao(texto: str) -> Dict:
+    """Valida a saída do modelo, reparando erros comuns de JSON"""
+    dados = None
+    candidatos = [texto]
+    inicio, fim = texto.find("{"), texto.rfind("}")
+    if inicio != -1 and fim > inicio:
+        trecho = texto[inicio:fim + 1]
+        candidatos.append(trecho)
+        # Vírgulas sobrando e aspas simples são os erros mais frequentes
+        trecho = re.sub(r",\s*([}\]])", r"\1", trecho)
+        candidatos.append(trecho)
+        candidatos.append(re.sub(r"'([^']*)'", r'"\1"', trecho))
+
+    for candidato in candidatos:
+        try:
+            dados = json.loads(candidato)
+            break
+        except json.JSONDecodeError:
+            continue
+    if not isinstance(dados, dict):
+        raise RespostaInvalida(f"JSON inválido: {texto[:200]}")
+
+    nivel = _sem_acentos(str(dados.get("nivel", dados.get("nível", ""))).strip().lower())
+    nivel = next((n for n in NIVEIS if _sem_acentos(n) == nivel or _sem_acentos(n) in nivel), None)
+
+    def lista(valor) -> list:
+        if isinstance(valor, str):
+            valor = re.split(r"[;\n]", valor)
+        return [str(v).strip() for v in (valor or []) if str(v).strip()]
+
+    try:
+        pontuacao = float(dados.get("pontuacao", dados.get("pontuação")))
+        # Aceita também escalas de 0 a 10 e de 0 a 100
+        if pontuacao > 10:
+            pontuacao /= 100
+        elif pontuacao > 1:
+            pontuacao /= 10
+        pontuacao = min(max(pontuacao, 0.0), 1.0)
+    except (TypeError, ValueError):
+        pontuacao = _PONTUACAO_POR_NIVEL.get(nivel)
+
+    if nivel is None and pontuacao is None:
+        raise RespostaInvalida(f"Avaliação sem nível nem pontuação: {texto[:200]}")
+
+    return {
+        "nivel": nivel,
+        "lacunas": lista(dados.get("lacunas")),
+        "topicos_reforco": lista(dados.get("topicos_reforco", dados.get("tópicos_reforço"))),
+        "pontuacao": pontuacao
+    }
+
+
+class MotorAvaliacao:
+    """Avalia respostas de alunos com o LLM, em lote e com cache.
+
+    As avaliações de um lote JSONL são enviadas ao Ollama por um pool de
+    threads limitado (para o Ollama processar várias ao mesmo tempo,
+    configure OLLAMA_NUM_PARALLEL). Resultados são gravados à medida que
+    ficam prontos, de modo que um lote interrompido pode ser retomado,
+    e ficam em cache pelo hash de (modelo, tema, resposta).
+    """
+
+    def __init__(self, model: str = Config.LLM_MODEL, base_url: str = Config.OLLAMA_URL,
+                 workers: int = 4, caminho_cache: str = "avaliacoes_cache.db",
+                 perfis: Optional[PerfilAprendizStore] = None):
+        """
+        Args:
+            model: Modelo do Ollama usado na avaliação
+            base_url: Endereço do Ollama
+            workers: Avaliações simultâneas
+            caminho_cache: Arquivo SQLite do cache de avaliações
+            perfis: Se informado, cada avaliação atualiza o domínio do aprendiz no tema
+        """
+        self.logger = logging.getLogger(__name__)
+        self.model = model
+        self.workers = max(1, workers)
+        self.perfis = perfis
+        self.llm = ChatOllama(model=model, base_url=base_url, temperature=0, format="json")
+
+        self._lock_cache = threading.Lock()
+        self._em_andamento: Dict[str, threading.Event] = {}
+        self._cache = sqlite3.connect(caminho_cache, check_same_thread=False)
+        self._cache.execute("PRAGMA journal_mode=WAL")
+        self._cache.execute("CREATE TABLE IF NOT EXISTS avaliacoes (hash TEXT PRIMARY KEY, resultado TEXT NOT NULL)")
+
+    def _hash(self, tema: str, resposta: str) -> str:
+        normalizada = " ".join(resposta.split()).lower()
+        return hashlib.sha256(f"{self.model}\x00{tema.strip().lower()}\x00{normalizada}".encode("utf-8")).hexdigest()
+
+    def avaliar(self, tema: str, resposta: str) -> Tuple[Dict, bool]:
+        """Avalia uma resposta.
+
+        Returns:
+            (avaliação, veio_do_cache)
+        """
+        chave = self._hash(tema, resposta)
+        with self._lock_cache:
+            linha = self._cache.execute("SELECT resultado FROM avaliacoes WHERE hash = ?", (chave,)).fetchone()
+            if linha:
+                return json.loads(linha[0]), True
+            # Respostas idênticas no mesmo lote esperam a primeira avaliação em vez de repeti-la
+            andamento = self._em_andamento.get(chave)
+            if andamento is None:
+                self._em_andamento[chave] = threading.Event()
+
+        if andamento is not None:
+            andamento.wait()
+            return self.avaliar(tema, resposta)
+
+        try:
+            saida = self.llm.invoke(PROMPT_AVALIACAO.format(tema=tema, resposta=resposta)).content
+            try:
+                resultado = interpretar_avaliacao(saida)
+            except RespostaInvalida:
+                # Uma tentativa de reparo pelo próprio modelo antes de desistir
+                self.logger.warning("Avaliação inválida, solicitando reparo ao modelo")
+                resultado = interpretar_avaliacao(self.llm.invoke(PROMPT_REPARO.format(texto=saida)).content)
+
+            with self._lock_cache:
+                self._cache.execute(
+                    "INSERT OR REPLACE INTO avaliacoes (hash, resultado) VALUES (?, ?)",
+                    (chave, json.dumps(resultado, ensure_ascii=False))
+                )
+                self._cache.commit()
+            return resultado, False
+        finally:
+            with self._lock_cache:
+                self._em_andamento.pop(chave).set()
+
+    def avaliar_lote(self, entrada: str, saida: str) -> Dict:
+        """Avalia um arquivo JSONL com linhas {"aprendiz", "tema", "resposta"[, "id"]}
+
+        As linhas já presentes em `saida` (pelo id) são puladas, o que
+        permite retomar um lote interrompido.
+        """
+        concluidos = self._ids_concluidos(saida)
+        estatisticas = {"avaliadas": 0, "cache": 0, "erros": 0, "puladas": 0}
+
+        def processar(item: Dict) -> Dict:
+            try:
+                resultado, do_cache = self.avaliar(item["tema"], item["resposta"])
+                if self.perfis is not None and item.get("aprendiz"):
+                    self.perfis.registrar_interacao(
+                        item["aprendiz"], topicos=[item["tema"]], pontuacao=resultado["pontuacao"]
+                    )
+                return {**item, "resultado": resultado, "cache": do_cache}
+            except Exception as e:
+                return {**item, "erro": str(e)}
+
+        with open(saida, "a", encoding="utf-8") as arquivo_saida, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pendentes = set()
+            for item in self._ler_entrada(entrada):
+                if item["id"] in concluidos:
+                    estatisticas["puladas"] += 1
+                    continue
+                pendentes.add(executor.submit(processar, item))
+                # Mantém poucas avaliações na fila para não ler o lote inteiro em memória
+                if len(pendentes) >= self.workers * 2:
+                    prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                    self._gravar(prontos, arquivo_saida, estatisticas)
+            prontos, _ = wait(pendentes)
+            self._gravar(prontos, arquivo_saida, estatisticas)
+
+        self.logger.info(
+            f"Lote avaliado: {estatisticas['avaliadas']} avaliações ({estatisticas['cache']} do cache), "
+            f"{estatisticas['erros']} erros, {estatisticas['puladas']} já concluídas"
+        )
+        return estatisticas
+
+    def _gravar(self, futuros, arquivo, estatisticas: Dict):
+        """Grava os resultados prontos; erros não são gravados e serão refeitos ao retomar"""
+        for futuro in futuros:
+            registro = futuro.result()
+            if "erro" in registro:
+                estatisticas["erros"] += 1
+                self.logger.error(f"Erro ao avaliar {registro['id']}: {registro['erro']}")
+                continue
+            estatisticas["avaliadas"] += 1
+            estatisticas["cache"] += int(registro["cache"])
+            arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        arquivo.flush()
+
+    def _ler_entrada(self, entrada: str) -> Iterator[Dict]:
+        with open(entrada, "r", encoding="utf-8") as f:
+            for numero, linha in enumerate(f, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    item = json.loads(linha)
+                    item.setdefault("id", str(numero))
+                    item["id"] = str(item["id"])
+                    if not item.get("tema") or not item.get("resposta"):
+                        raise ValueError("campos 'tema' e 'resposta' são obrigatórios")
+                    yield item
+                except (json.JSONDecodeError, ValueError) as e:
+                    self.logger.error(f"Linha {numero} ignorada: {str(e)}")
+
+    @staticmethod
+    def _ids_concluidos(saida: str) -> Set[str]:
+        concluidos = set()
+        try:
+            with open(saida, "r", encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        concluidos.add(str(json.loads(linha)["id"]))
+                    except (json.JSONDecodeError, KeyError):
+                        # Última linha truncada por uma interrupção
+                        continue
+        except FileNotFoundError:
+            pass
+        return concluidos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Avaliação em lote de respostas de alunos")
+    parser.add_argument("entrada", help="JSONL com aprendiz, tema e resposta")
+    parser.add_argument("saida", help="JSONL de resultados (retomado se já existir)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modelo", default=Config.LLM_MODEL)
+    parser.add_argument("--cache", default="avaliacoes_cache.db")
+    parser.add_argument("--perfis", help="Banco de perfis a atualizar com as avaliações")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)-8s | %(message)s')
+    motor = MotorAvaliacao(
+        model=args.modelo,
+        workers=args.workers,
+        caminho_cache=args.cache,
+        perfis=PerfilAprendizStore(args.perfis) if args.perfis else None
+    )
+    motor.avaliar_lote(args.entrada, args.saida)
@@ -1,17 +1,25 @@
 from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 import logging
-from typing import Optional
+from typing import List, Optional
+from langchain_core.documents import Document
+from .agendador_llm import AgendadorLLM, opcoes_http
+from .roteador_modelos import RoteadorModelos
+from .tutor_adaptativo import estatisticas_geracao
 
 class Chatbot:
-    def __init__(self, banco_vetorial):
+    def __init__(self, banco_vetorial, agendador: Optional[AgendadorLLM] = None,
+                 roteador: Optional[RoteadorModelos] = None):
         self.logger = logging.getLogger(__name__)
         self.banco_dados = banco_vetorial
+        self.agendador = agendador
+        self.roteador = roteador
         try:
             self.llm = ChatOllama(
                 base_url="http://localhost:11434",
                 model="dolphin-mistral",
-                temperature=0.7
+                temperature=0.7,
+                client_kwargs=opcoes_http()
             )
             self._configurar_prompts()
             self.logger.info("Chatbot inicializado com sucesso")
@@ -21,24 +29,26 @@ class Chatbot:
 
     def _configurar_prompts(self):
         """Configura todos os templates de prompt"""
-        self.prompt_base = ChatPromptTemplate.from_template("""
-        Você é um tutor de programação adaptativo. 
-        Contexto: {contexto}
-        
-        Responda considerando:
-        - Nível: {nivel}
-        - Formato preferido: {formato}
-        
-        Sua resposta deve incluir:
-        1. Explicação clara
-        2. Exemplo prático
-        3. Recurso recomendado
-        
-        Formato de saída:
-        - Explicação: [texto]
-        - Exemplo: [código/conceito]
-        - Recurso: [tipo: nome]
-        """)
+        # Instruções fixas primeiro, para o Ollama reaproveitar o prefixo em cache
+        self.prompt_base = ChatPromptTemplate.from_messages([
+            ("system", """Você é um tutor de programação adaptativo.
+
+Sua resposta deve incluir:
+1. Explicação clara
+2. Exemplo prático
+3. Recurso recomendado
+
+Formato de saída:
+- Explicação: [texto]
+- Exemplo: [código/conceito]
+- Recurso: [tipo: nome]
+
+Nível do aluno: {nivel}"""),
+            ("human", """Contexto: {contexto}
+
+Formato preferido: {formato}
+Pergunta: {pergunta}""")
+        ])
 
     def responder(self, pergunta: str, nivel: str = "intermediário", formato: str = "texto") -> Optional[str]:
         """Gera resposta adaptativa"""
@@ -46,25 +56,42 @@ class Chatbot:
             if not self.banco_dados:
                 return "Sistema não está pronto para responder"
                 
-            contexto = self._buscar_contexto(pergunta)
-            chain = self.prompt_base | self.llm
-            resposta = chain.invoke({
-                "contexto": contexto,
+            docs = self._buscar_contexto(pergunta)
+            entrada = {
+                "contexto": "\n".join(d.page_content for d in docs) if docs else "Sem contexto disponível",
                 "nivel": nivel,
                 "formato": formato,
                 "pergunta": pergunta
-            })
+            }
+            llm = None
+            if self.roteador is not None:
+                estado = self.agendador.estado() if self.agendador is not None else None
+                llm = self.roteador.llm(self.roteador.escolher(pergunta, nivel, docs, estado))
+            if self.agendador is not None:
+                resposta = self.agendador.executar(self.prompt_base.format_messages(**entrada), llm=llm)
+            else:
+                resposta = (self.prompt_base | (llm or self.llm)).invoke(entrada)
+            estatisticas = estatisticas_geracao(resposta)
+            self.logger.info(
+                f"Prompt: {estatisticas['tokens_prompt_avaliados']} tokens avaliados, "
+                f"{estatisticas['tokens_gerados']} tokens gerados"
+            )
             return resposta.content
             
         except Exception as e:
             self.logger.error(f"Erro ao gerar resposta: {str(e)}")
             return "Desculpe, ocorreu um erro ao processar sua pergunta"
 
-    def _buscar_contexto(self, pergunta: str, k: int = 3) -> str:
-        """Busca documentos relevantes"""
+    def _buscar_contexto(self, pergunta: str, k: int = 3) -> List[Document]:
+        """Busca documentos relevantes, com a similaridade em metadata['similaridade']"""
         try:
-            docs = self.banco_dados.similarity_search(pergunta, k=k)
-            return "\n".join([d.page_content for d in docs])
+            resultados = self.banco_dados.similarity_search_with_score(pergunta, k=k)
+            # Vetores normalizados: distância L2² = 2 - 2·cosseno
+            return [
+                Document(page_content=doc.page_content,
+                         metadata={**doc.metadata, "similaridade": round(1 - float(distancia) / 2, 4)})
+                for doc, distancia in resultados
+            ]
         except Exception as e:
             self.logger.error(f"Erro na busca de contexto: {str(e)}")
-            return "Sem contexto disponível"
\ No newline at end of file
+            return []
\ No newline at end of file
@@ -0,0 +1,192 @@
+import argparse
+import logging
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Union
+
+from langchain_core.documents import Document
+
+_NOME_VALIDO = re.compile(r"^[\w.-]+$")
+
+
+class ColecoesIndice:
+    """Índices vetoriais separados por coleção (curso, módulo), carregados sob demanda.
+
+    Cada coleção é um índice FAISS salvo em `<pasta>/<colecao_id>/`. Na
+    primeira busca o índice é lido do disco e passa a ocupar uma entrada
+    de um cache LRU limitado por memória (estimada pelo tamanho dos
+    arquivos do índice); quando o orçamento é excedido, as coleções usadas
+    há mais tempo são descarregadas. Buscas em andamento continuam com a
+    referência que já obtiveram, então descarregar nunca interrompe uma
+    consulta.
+    """
+
+    def __init__(self, indexador, pasta: str = "colecoes", orcamento_mb: int = 2048):
+        """
+        Args:
+            indexador: Indexador que fornece o pipeline de ingestão e os embeddings
+            pasta: Pasta com um subdiretório por coleção
+            orcamento_mb: Memória máxima ocupada pelas coleções carregadas
+        """
+        self.logger = logging.getLogger(__name__)
+        self.indexador = indexador
+        self.pasta = pasta
+        self.orcamento = orcamento_mb * 1024 * 1024
+        self._carregadas: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (índice, bytes)
+        self._lock = threading.Lock()
+        self._carregando: Dict[str, threading.Lock] = {}
+
+    def caminho(self, colecao_id: str) -> str:
+        if not _NOME_VALIDO.match(colecao_id):
+            raise ValueError(f"Nome de coleção inválido: {colecao_id!r}")
+        return os.path.join(self.pasta, colecao_id)
+
+    def listar(self) -> List[str]:
+        if not os.path.isdir(self.pasta):
+            return []
+        return sorted(nome for nome in os.listdir(self.pasta)
+                      if os.path.isfile(os.path.join(self.pasta, nome, "index.faiss")))
+
+    def existe(self, colecao_id: str) -> bool:
+        return os.path.isfile(os.path.join(self.caminho(colecao_id), "index.faiss"))
+
+    def indexar(self, colecao_id: str, fontes: Union[str, List[str]]) -> Dict:
+        """(Re)cria o índice da coleção a partir das pastas/arquivos e o salva em disco
+
+        A deduplicação não é aplicada: o deduplicador do indexador guarda o
+        estado do índice principal e não deve misturar coleções.
+        """
+        from langchain_community.vectorstores import FAISS
+
+        caminho = self.caminho(colecao_id)
+        novo = None
+
+        def escrever(documentos: List[Document], vetores: List[List[float]]):
+            nonlocal novo
+            pares = list(zip([d.page_content for d in documentos], vetores))
+            metadados = [{**d.metadata, "colecao": colecao_id} for d in documentos]
+            if novo is None:
+                novo = FAISS.from_embeddings(text_embeddings=pares, embedding=self.indexador.embeddings,
+                                             metadatas=metadados)
+            else:
+                novo.add_embeddings(text_embeddings=pares, metadatas=metadados)
+
+        with self.indexador.embedding_em_lote():
+            resultado = self.indexador.pipeline.processar(fontes, deduplicar=False, escrever=escrever)
+        if resultado["falha"] is not None or novo is None:
+            self.logger.error(f"Coleção {colecao_id} não indexada: {resultado['falha'] or 'nenhum chunk'}")
+            return resultado
+
+        # Grava ao lado e troca o diretório, para que um processo lendo a
+        # coleção nunca encontre um índice pela metade
+        temporario = caminho + ".tmp"
+        shutil.rmtree(temporario, ignore_errors=True)
+        novo.save_local(temporario)
+        antigo = caminho + ".antigo"
+        if os.path.isdir(caminho):
+            os.replace(caminho, antigo)
+        os.replace(temporario, caminho)
+        shutil.rmtree(antigo, ignore_errors=True)
+        self.descarregar(colecao_id)
+        self.logger.info(f"Coleção {colecao_id} indexada ({resultado['chunks']} chunks)")
+        return resultado
+
+    def remover(self, colecao_id: str):
+        self.descarregar(colecao_id)
+        shutil.rmtree(self.caminho(colecao_id), ignore_errors=True)
+
+    def obter(self, colecao_id: str):
+        """Índice FAISS da coleção, carregado do disco se necessário (None se não existir)"""
+        with self._lock:
+            if colecao_id in self._carregadas:
+                self._carregadas.move_to_end(colecao_id)
+                return self._carregadas[colecao_id][0]
+            carregando = self._carregando.setdefault(colecao_id, threading.Lock())
+
+        # Uma única thread lê cada coleção; as demais esperam o resultado
+        with carregando:
+            try:
+                with self._lock:
+                    if colecao_id in self._carregadas:
+                        self._carregadas.move_to_end(colecao_id)
+                        return self._carregadas[colecao_id][0]
+                if not self.existe(colecao_id):
+                    return None
+                from langchain_community.vectorstores import FAISS
+
+                caminho = self.caminho(colecao_id)
+                indice = FAISS.load_local(folder_path=caminho, embeddings=self.indexador.embeddings,
+                                          allow_dangerous_deserialization=True)
+                tamanho = sum(os.path.getsize(os.path.join(caminho, nome)) for nome in os.listdir(caminho))
+                with self._lock:
+                    self._carregadas[colecao_id] = (indice, tamanho)
+                    self._liberar(manter=colecao_id)
+            finally:
+                with self._lock:
+                    self._carregando.pop(colecao_id, None)
+            self.logger.info(f"Coleção {colecao_id} carregada ({tamanho / 1024 / 1024:.1f} MB)")
+            return indice
+
+    def buscar_por_vetor(self, colecao_id: str, vetor: List[float], k: int = 3,
+                         filtro: Dict = None) -> List[Document]:
+        indice = self.obter(colecao_id)
+        if indice is None:
+            self.logger.warning(f"Coleção não encontrada: {colecao_id}")
+            return []
+        return [
+            Document(page_content=doc.page_content,
+                     metadata={**doc.metadata, "similaridade": round(1 - float(distancia) / 2, 4)})
+            for doc, distancia in indice.similarity_search_with_score_by_vector(vetor, k=k, filter=filtro)
+        ]
+
+    def descarregar(self, colecao_id: str):
+        with self._lock:
+            self._carregadas.pop(colecao_id, None)
+
+    def estado(self) -> Dict:
+        """Coleções carregadas (da mais para a menos recente) e memória ocupada"""
+        with self._lock:
+            return {
+                "carregadas": list(reversed(self._carregadas)),
+                "memoria_mb": sum(t for _, t in self._carregadas.values()) / 1024 / 1024,
+                "orcamento_mb": self.orcamento / 1024 / 1024
+            }
+
+    def _liberar(self, manter: str):
+        """Descarrega as coleções menos usadas até caber no orçamento (chamar sob o lock)"""
+        ocupado = sum(t for _, t in self._carregadas.values())
+        for colecao_id in list(self._carregadas):
+            if ocupado <= self.orcamento:
+                break
+            if colecao_id == manter:
+                continue
+            ocupado -= self._carregadas.pop(colecao_id)[1]
+            self.logger.info(f"Coleção {colecao_id} descarregada (LRU)")
+
+
+if __name__ == "__main__":
+    from .indexador import Indexador
+
+    parser = argparse.ArgumentParser(description="Gerencia as coleções de índices por curso")
+    parser.add_argument("--pasta", default="colecoes")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    indexar = sub.add_parser("indexar", help="Cria ou recria uma coleção")
+    indexar.add_argument("colecao")
+    indexar.add_argument("fontes", nargs="+", help="Pastas/arquivos do curso")
+    sub.add_parser("listar")
+    remover = sub.add_parser("remover")
+    remover.add_argument("colecao")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(message)s")
+    if args.comando == "listar":
+        for nome in ColecoesIndice(None, pasta=args.pasta).listar():
+            print(nome)
+    elif args.comando == "remover":
+        ColecoesIndice(None, pasta=args.pasta).remover(args.colecao)
+    else:
+        colecoes = Indexador({"pasta_colecoes": args.pasta}).colecoes
+        colecoes.indexar(args.colecao, args.fontes)
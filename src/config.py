@@ -1,4 +1,5 @@
 import os
+from typing import Dict
 from dotenv import load_dotenv
 
 load_dotenv(override=True)  # Força recarregar as variáveis
@@ -11,15 +12,14 @@ class Config:
      DATA_PATH = os.getenv("DATA_PATH", "dados")  # Valor padrão caso não exista
 
 
-     def avaliar_resposta(self, resposta_usuario):
-        prompt = """Analise esta resposta sobre {tema}:
-        {resposta}
-    
-        Classifique:
-            1. Nível (Iniciante/Intermediário/Avançado)
-        2. Principais lacunas (lista)
-        3. Sugestão de tópicos para reforço
-    
-        Retorne JSON formatado."""
-    
-        return self.llm.invoke(prompt).content
\ No newline at end of file
+     def avaliar_resposta(self, resposta_usuario: str, tema: str = "fundamentos de programação") -> Dict:
+        """Avalia uma resposta do aluno (nível, lacunas, tópicos de reforço e pontuação)
+
+        Para avaliar muitas respostas de uma vez, use MotorAvaliacao.avaliar_lote.
+        """
+        from .avaliador import MotorAvaliacao
+
+        if not hasattr(self, "_motor_avaliacao"):
+            self._motor_avaliacao = MotorAvaliacao(model=self.LLM_MODEL, base_url=self.OLLAMA_URL)
+        resultado, _ = self._motor_avaliacao.avaliar(tema, resposta_usuario)
+        return resultado
@@ -1,150 +1,284 @@
-import os
-from langchain.document_loaders import PyPDFLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
-import whisper
-from typing import List
-from langchain.schema import Document
+from typing import Dict, List, Optional, Tuple, Union
+from langchain_core.documents import Document
+from .indexador import Indexador
+import argparse
+import json
 import logging
+import os
+import shutil
+import signal
+import threading
 
-# Configuração de logs
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ARQUIVO_CHECKPOINT = "checkpoint.json"
+
+
+def _gravar_json_atomico(caminho: str, dados: Dict):
+    """Grava em arquivo temporário, sincroniza e renomeia: o arquivo nunca fica pela metade"""
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
 class DataProcessor:
-    def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=Config.EMBEDDINGS_MODEL,
-            model_kwargs={'device': 'cpu'}
-        )
-        
-    def _load_whisper_model(self):
-        """Carrega o modelo Whisper (somente quando necessário para economizar memória)"""
-        if self.whisper_model is None:
-            logger.info("Carregando modelo Whisper...")
-            try:
-                self.whisper_model = whisper.load_model("base")
-            except Exception as e:
-                logger.error(f"Falha ao carregar modelo Whisper: {e}")
-                raise
-        return self.whisper_model
-    
-    def process_pdfs(self, pdf_folder: str) -> List[Document]:
-        """Processa todos os arquivos PDF em um diretório"""
-        if not os.path.exists(pdf_folder):
-            logger.warning(f"Pasta de PDFs não encontrada: {pdf_folder}")
-            return []
-            
-        # Filtra apenas arquivos PDF
-        pdf_files = [f for f in os.listdir(pdf_folder) if f.lower().endswith('.pdf')]
-        if not pdf_files:
-            logger.warning(f"Nenhum arquivo PDF encontrado em {pdf_folder}")
+    """Interface em lote sobre o pipeline de ingestão do Indexador"""
+
+    def __init__(self, indexador: Optional[Indexador] = None):
+        self.indexador = indexador or Indexador()
+        self._parar = threading.Event()
+
+    def _process_folder(self, folder: str, tipo: str) -> List[Document]:
+        """Extrai e divide os arquivos de um tipo de mídia usando os processadores registrados"""
+        pipeline = self.indexador.pipeline
+        files = [f for f in pipeline.descobrir(folder) if self.indexador.registro.tipo(f) == tipo]
+        if not files:
+            logger.warning(f"Nenhum arquivo do tipo {tipo} encontrado em {folder}")
             return []
-            
-        all_docs = []
-        for pdf_file in pdf_files:
-            try:
-                file_path = os.path.join(pdf_folder, pdf_file)
-                logger.info(f"Processando PDF: {file_path}")
-                
-                # Extrai texto e metadados do PDF
-                loader = PyPDFLoader(file_path)
-                pages = loader.load_and_split(self.text_splitter)
-                all_docs.extend(pages)
-                
-                logger.info(f"Processadas {len(pages)} páginas de {pdf_file}")
-            except Exception as e:
-                logger.error(f"Erro ao processar {pdf_file}: {e}")
-                continue
-                
+
+        all_docs = list(pipeline.documentos(files))
+        logger.info(f"Processados {len(all_docs)} trechos de {len(files)} arquivos do tipo {tipo}")
         return all_docs
-    
+
+    def process_pdfs(self, pdf_folder: str) -> List[Document]:
+        """Processa todos os arquivos PDF em um diretório"""
+        return self._process_folder(pdf_folder, "pdf")
+
     def process_texts(self, text_folder: str) -> List[Document]:
         """Processa todos os arquivos de texto em um diretório"""
-        if not os.path.exists(text_folder):
-            logger.warning(f"Pasta de textos não encontrada: {text_folder}")
-            return []
-            
-        # Filtra apenas arquivos TXT
-        text_files = [f for f in os.listdir(text_folder) if f.lower().endswith('.txt')]
-        if not text_files:
-            logger.warning(f"Nenhum arquivo de texto encontrado em {text_folder}")
-            return []
-            
-        all_docs = []
-        for text_file in text_files:
-            try:
-                file_path = os.path.join(text_folder, text_file)
-                logger.info(f"Processando arquivo de texto: {file_path}")
-                
-                # Lê e divide o conteúdo do arquivo
-                loader = TextLoader(file_path, encoding='utf-8')
-                documents = loader.load()
-                docs = self.text_splitter.split_documents(documents)
-                all_docs.extend(docs)
-                
-                logger.info(f"Processados {len(docs)} trechos de {text_file}")
-            except Exception as e:
-                logger.error(f"Erro ao processar {text_file}: {e}")
-                continue
-                
-        return all_docs
-    
+        return self._process_folder(text_folder, "texto")
+
     def process_videos(self, video_folder: str) -> List[Document]:
         """Processa todos os vídeos em um diretório (transcrição de áudio)"""
-        if not os.path.exists(video_folder):
-            logger.warning(f"Pasta de vídeos não encontrada: {video_folder}")
-            return []
-            
-        # Formatos de vídeo suportados
-        video_files = [f for f in os.listdir(video_folder) 
-                      if f.lower().endswith(('.mp4', '.avi', '.mov'))]
-        if not video_files:
-            logger.warning(f"Nenhum arquivo de vídeo encontrado em {video_folder}")
-            return []
-            
-        all_docs = []
-        model = self._load_whisper_model()  # Carrega o modelo se necessário
-        
-        for video_file in video_files:
-            try:
-                file_path = os.path.join(video_folder, video_file)
-                logger.info(f"Processando vídeo: {file_path}")
-                
-                # Transcreve o áudio do vídeo
-                result = model.transcribe(file_path)
-                transcript = result['text']
-                
-                # Cria documento com metadados
-                doc = Document(
-                    page_content=transcript,
-                    metadata={
-                        'source': file_path,
-                        'type': 'video',
-                        'segments': len(result['segments'])
-                    }
-                )
-                all_docs.append(doc)
-                
-                logger.info(f"Vídeo {video_file} processado com {len(transcript)} caracteres")
-            except Exception as e:
-                logger.error(f"Erro ao processar {video_file}: {e}")
-                continue
-                
-        return all_docs
-    
+        return self._process_folder(video_folder, "video")
+
     def create_vector_index(self, documents: List[Document]):
         """Cria índice vetorial FAISS a partir dos documentos"""
         if not documents:
             logger.warning("Nenhum documento fornecido para indexação")
             return None
-            
+
+        logger.info(f"Criando índice vetorial com {len(documents)} documentos")
+        if not self.indexador.criar_indice(documents):
+            raise RuntimeError("Erro ao criar índice vetorial")
+        logger.info("Índice vetorial criado com sucesso")
+        return self.indexador.banco_vetorial
+
+    # Ingestão retomável
+
+    def ingerir(self, fontes: Union[str, List[str]], pasta_saida: str, arquivos_por_lote: int = 10) -> Dict:
+        """Processa o corpus em lotes de arquivos, com checkpoint após cada lote
+
+        Cada lote vira um índice parcial em `<pasta_saida>/lotes/` e só
+        depois os arquivos do lote são marcados como concluídos no
+        checkpoint (gravado de forma atômica). Se o processo for
+        interrompido, a próxima execução pula os arquivos concluídos e
+        refaz apenas o lote em andamento; arquivos alterados desde o
+        checkpoint (data ou tamanho) são reprocessados. Arquivos cuja
+        extração falhou não são marcados (nem entram no índice parcial) e
+        são tentados de novo na próxima execução. A deduplicação fica
+        para `consolidar`: colapsar um chunk com o de um lote anterior
+        perderia o conteúdo quando o arquivo do lote anterior mudasse.
+
+        Returns:
+            Contadores: arquivos concluídos, pendentes e lotes gravados nesta execução,
+            e os arquivos com erro ('com_erro')
+        """
+        os.makedirs(os.path.join(pasta_saida, "lotes"), exist_ok=True)
+        checkpoint = self._ler_checkpoint(pasta_saida)
+        arquivos = list(self.indexador.pipeline.descobrir(fontes))
+        pendentes = [c for c in arquivos if checkpoint["concluidos"].get(c, {}).get("estado") != self._estado(c)]
+        # Arquivos que saíram do corpus deixam de entrar na consolidação
+        for caminho in set(checkpoint["concluidos"]) - set(arquivos):
+            del checkpoint["concluidos"][caminho]
+        logger.info(f"{len(arquivos) - len(pendentes)} arquivos já concluídos, {len(pendentes)} pendentes")
+
+        resultado = {"concluidos": len(arquivos) - len(pendentes), "pendentes": len(pendentes), "lotes": 0,
+                     "com_erro": []}
         try:
-            logger.info(f"Criando índice vetorial com {len(documents)} documentos")
-            vectorstore = FAISS.from_documents(documents, self.embeddings)
-            logger.info("Índice vetorial criado com sucesso")
-            return vectorstore
-        except Exception as e:
-            logger.error(f"Erro ao criar índice vetorial: {e}")
-            raise
\ No newline at end of file
+            for i in range(0, len(pendentes), arquivos_por_lote):
+                if self._parar.is_set():
+                    logger.warning("Ingestão interrompida; execute novamente para continuar")
+                    break
+                lote = pendentes[i:i + arquivos_por_lote]
+                nome = f"lote_{len(checkpoint['lotes']) + 1:05d}"
+                chunks, com_erro = self._processar_lote(lote, os.path.join(pasta_saida, "lotes", nome))
+
+                if chunks:
+                    checkpoint["lotes"].append(nome)
+                if com_erro:
+                    logger.warning(f"Arquivos com erro (tentados de novo na próxima execução): {', '.join(com_erro)}")
+                sem_chunks = [c for c in lote if c not in chunks and c not in com_erro]
+                if sem_chunks:
+                    logger.warning(f"Arquivos sem conteúdo indexável (não serão repetidos): {', '.join(sem_chunks)}")
+                concluidos = [c for c in lote if c not in com_erro]
+                for caminho in concluidos:
+                    checkpoint["concluidos"][caminho] = {
+                        "estado": self._estado(caminho),
+                        "lote": nome if caminho in chunks else None
+                    }
+                _gravar_json_atomico(os.path.join(pasta_saida, ARQUIVO_CHECKPOINT), checkpoint)
+                resultado["concluidos"] += len(concluidos)
+                resultado["pendentes"] -= len(lote)
+                resultado["com_erro"] += sorted(com_erro)
+                resultado["lotes"] += 1
+                logger.info(f"Checkpoint: {resultado['concluidos']}/{len(arquivos)} arquivos")
+        finally:
+            if self.indexador.ocr is not None:
+                self.indexador.ocr.encerrar()
+        return resultado
+
+    def consolidar(self, pasta_saida: str, destino: Optional[str] = None) -> bool:
+        """Junta os índices parciais em um índice único (formato de Indexador.salvar_indice)
+
+        De cada arquivo só entram os chunks do lote mais recente em que ele
+        foi processado. Com a deduplicação ativa, os chunks quase duplicados
+        são colapsados aqui, sobre o conjunto final, e o deduplicador do
+        indexador passa a refletir o índice consolidado.
+        """
+        checkpoint = self._ler_checkpoint(pasta_saida)
+        self.indexador._inicializar_deduplicador()
+        deduplicador = self.indexador.deduplicador
+        indice = None
+        for nome, parcial in self._lotes_validos(pasta_saida, checkpoint):
+            if deduplicador is not None:
+                repetidos = []
+                for id_, doc in parcial.docstore._dict.items():
+                    doc.metadata["id"] = id_
+                    if deduplicador.adicionar(doc) is not None:
+                        repetidos.append(id_)
+                if len(repetidos) == len(parcial.docstore._dict):
+                    continue
+                if repetidos:
+                    parcial.delete(repetidos)
+            if indice is None:
+                indice = parcial
+            else:
+                indice.merge_from(parcial)
+        if indice is None:
+            logger.warning("Nenhum lote para consolidar")
+            return False
+        if deduplicador is not None:
+            for id_ in set(deduplicador.alterados):
+                doc = indice.docstore.search(id_)
+                if isinstance(doc, Document):
+                    doc.metadata.update(deduplicador.metadados(id_))
+            logger.info(deduplicador.resumo())
+        with self.indexador._lock_indice:
+            self.indexador.banco_vetorial = indice
+            self.indexador.versao_indice += 1
+        return self.indexador.salvar_indice(destino or os.path.join(pasta_saida, "indice"))
+
+    def parar(self):
+        """Encerra a ingestão ao fim do lote em andamento"""
+        self._parar.set()
+
+    def _processar_lote(self, arquivos: List[str], pasta_lote: str) -> Tuple[set, set]:
+        """Processa os arquivos e grava o índice parcial
+
+        Returns:
+            Os caminhos que geraram chunks e os que falharam na extração
+            (cujos chunks já gerados ficam fora do índice parcial)
+        """
+        from langchain_community.vectorstores import FAISS
+
+        parcial = None
+
+        def escrever(documentos: List[Document], vetores: List[List[float]]):
+            nonlocal parcial
+            pares = list(zip([d.page_content for d in documentos], vetores))
+            metadados = [d.metadata for d in documentos]
+            ids = [d.metadata["id"] for d in documentos] if all("id" in d.metadata for d in documentos) else None
+            if parcial is None:
+                parcial = FAISS.from_embeddings(text_embeddings=pares, embedding=self.indexador.embeddings,
+                                                metadatas=metadados, ids=ids)
+            else:
+                parcial.add_embeddings(text_embeddings=pares, metadatas=metadados, ids=ids)
+
+        with self.indexador.embedding_em_lote():
+            resultado = self.indexador.pipeline.processar(arquivos, deduplicar=False, escrever=escrever)
+        if resultado["falha"] is not None:
+            raise RuntimeError(f"Lote não concluído: {resultado['falha']}")
+        com_erro = set(resultado["arquivos_com_erro"])
+        if parcial is not None and com_erro:
+            incompletos = [id_ for id_, doc in parcial.docstore._dict.items()
+                           if doc.metadata.get("caminho") in com_erro]
+            if len(incompletos) == len(parcial.docstore._dict):
+                parcial = None
+            elif incompletos:
+                parcial.delete(incompletos)
+        if parcial is None:
+            return set(), com_erro
+
+        temporario = pasta_lote + ".tmp"
+        shutil.rmtree(temporario, ignore_errors=True)
+        parcial.save_local(temporario)
+        shutil.rmtree(pasta_lote, ignore_errors=True)
+        os.replace(temporario, pasta_lote)
+        return {doc.metadata.get("caminho") for doc in parcial.docstore._dict.values()}, com_erro
+
+    def _lotes_validos(self, pasta_saida: str, checkpoint: Dict):
+        """(nome, índice parcial) sem os chunks de arquivos reprocessados em lotes posteriores"""
+        from langchain_community.vectorstores import FAISS
+
+        lote_de = {c: info["lote"] for c, info in checkpoint["concluidos"].items()}
+        for nome in checkpoint["lotes"]:
+            pasta = os.path.join(pasta_saida, "lotes", nome)
+            if not os.path.isdir(pasta):
+                continue
+            parcial = FAISS.load_local(folder_path=pasta, embeddings=self.indexador.embeddings,
+                                       allow_dangerous_deserialization=True)
+            obsoletos = [id_ for id_, doc in parcial.docstore._dict.items()
+                         if lote_de.get(doc.metadata.get("caminho")) != nome]
+            if len(obsoletos) == len(parcial.docstore._dict):
+                continue
+            if obsoletos:
+                parcial.delete(obsoletos)
+            yield nome, parcial
+
+    @staticmethod
+    def _estado(caminho: str) -> List[int]:
+        info = os.stat(caminho)
+        return [info.st_mtime_ns, info.st_size]
+
+    @staticmethod
+    def _ler_checkpoint(pasta_saida: str) -> Dict:
+        caminho = os.path.join(pasta_saida, ARQUIVO_CHECKPOINT)
+        if not os.path.isfile(caminho):
+            return {"concluidos": {}, "lotes": []}
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestão em lote retomável do corpus")
+    parser.add_argument("fontes", nargs="+", help="Pastas/arquivos do corpus")
+    parser.add_argument("--saida", default="ingestao", help="Pasta dos checkpoints e índices parciais")
+    parser.add_argument("--arquivos-por-lote", type=int, default=10)
+    parser.add_argument("--destino", help="Pasta do índice consolidado (padrão: <saida>/indice)")
+    parser.add_argument("--sem-consolidar", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s | %(levelname)-8s | %(message)s',
+        handlers=[logging.FileHandler(os.path.join(os.getcwd(), 'ingestao.log'), encoding='utf-8'),
+                  logging.StreamHandler()]
+    )
+    processador = DataProcessor()
+
+    def interromper(sinal, _):
+        # O primeiro sinal termina o lote atual; o segundo encerra imediatamente
+        logger.warning("Sinal recebido: encerrando após o lote em andamento")
+        processador.parar()
+        signal.signal(sinal, signal.SIG_DFL)
+
+    signal.signal(signal.SIGINT, interromper)
+    signal.signal(signal.SIGTERM, interromper)
+
+    resultado = processador.ingerir(args.fontes, args.saida, args.arquivos_por_lote)
+    if resultado["pendentes"] == 0 and not args.sem_consolidar:
+        processador.consolidar(args.saida, args.destino)
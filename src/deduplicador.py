@@ -0,0 +1,262 @@
+import os
+import re
+import threading
+import uuid
+import zlib
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+_PRIMO_MERSENNE = np.uint64((1 << 61) - 1)
+_MASCARA_32 = np.uint64(0xFFFFFFFF)
+_PALAVRA = re.compile(r"\w+", re.UNICODE)
+# Metadados guardados de cada representante (o texto fica só no índice)
+CHAVES_REPRESENTANTE = ("id", "fonte", "fontes", "caminho", "caminhos", "duplicatas")
+
+
+def metadados_representante(metadados: Dict) -> Dict:
+    """Só os metadados que a deduplicação acompanha, com listas próprias"""
+    return {chave: list(valor) if isinstance(valor, list) else valor
+            for chave, valor in metadados.items() if chave in CHAVES_REPRESENTANTE}
+
+
+class DeduplicadorMinHash:
+    """Detecta chunks quase duplicados com MinHash e LSH (locality-sensitive hashing).
+
+    Mantém o estado entre chamadas, de modo que chunks novos também são
+    comparados com os que já foram indexados. Cada grupo de duplicatas é
+    reduzido a um representante, cujo metadado 'fontes' lista todas as
+    fontes em que o conteúdo aparece ('caminhos', os arquivos). De cada
+    representante ficam só a assinatura e esses metadados; o texto está
+    no índice vetorial.
+    """
+
+    def __init__(self, limiar: float = 0.85, num_permutacoes: int = 128,
+                 tamanho_shingle: int = 5, semente: int = 1):
+        """
+        Args:
+            limiar: Similaridade de Jaccard estimada a partir da qual dois chunks são duplicatas
+            num_permutacoes: Tamanho da assinatura MinHash
+            tamanho_shingle: Quantidade de palavras por shingle
+            semente: Semente das permutações (mantém assinaturas estáveis entre execuções)
+        """
+        if not 0 < limiar <= 1:
+            raise ValueError("limiar deve estar em (0, 1]")
+        self.logger = logging.getLogger(__name__)
+        self.limiar = limiar
+        self.num_permutacoes = num_permutacoes
+        self.tamanho_shingle = tamanho_shingle
+        self.semente = semente
+
+        gerador = np.random.RandomState(semente)
+        # Coeficientes < 2^32 evitam overflow de a*h + b em uint64
+        self._a = gerador.randint(1, 1 << 32, size=num_permutacoes, dtype=np.uint64)
+        self._b = gerador.randint(0, 1 << 32, size=num_permutacoes, dtype=np.uint64)
+        # O LSH mira um pouco abaixo do limiar: candidatos extras são descartados
+        # pela comparação das assinaturas, mas duplicatas perdidas não voltam
+        self.bandas, self.linhas = self._escolher_bandas(max(limiar - 0.1, 0.05), num_permutacoes)
+
+        self._baldes: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(self.bandas)]
+        self._assinaturas: Dict[str, np.ndarray] = {}
+        self._representantes: Dict[str, Dict] = {}
+        self.alterados: List[str] = []
+        self.estatisticas = {"total": 0, "unicos": 0, "duplicatas": 0, "por_fonte": Counter()}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _escolher_bandas(limiar: float, num_permutacoes: int) -> Tuple[int, int]:
+        """Escolhe bandas x linhas cujo ponto de inflexão (1/b)^(1/r) fica mais próximo do limiar"""
+        melhor = (num_permutacoes, 1)
+        menor_erro = float("inf")
+        for linhas in range(1, num_permutacoes + 1):
+            bandas = num_permutacoes // linhas
+            if bandas == 0:
+                break
+            erro = abs((1 / bandas) ** (1 / linhas) - limiar)
+            if erro < menor_erro:
+                melhor, menor_erro = (bandas, linhas), erro
+        return melhor
+
+    def assinatura(self, texto: str) -> np.ndarray:
+        """Calcula a assinatura MinHash dos shingles de palavras do texto"""
+        palavras = _PALAVRA.findall(texto.lower())
+        k = self.tamanho_shingle
+        if len(palavras) <= k:
+            shingles = {" ".join(palavras)}
+        else:
+            shingles = {" ".join(palavras[i:i + k]) for i in range(len(palavras) - k + 1)}
+
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        permutados = (np.outer(hashes, self._a) + self._b) % _PRIMO_MERSENNE
+        return (permutados.min(axis=0) & _MASCARA_32).astype(np.uint32)
+
+    def adicionar(self, doc: Document) -> Optional[Dict]:
+        """Registra um chunk.
+
+        Returns:
+            Os metadados do representante já existente se o chunk for duplicata, ou None se for novo
+        """
+        assinatura = self.assinatura(doc.page_content)
+        chaves = self._chaves(assinatura)
+        with self._lock:
+            self.estatisticas["total"] += 1
+            candidatos = {id_ for banda, chave in zip(self._baldes, chaves) for id_ in banda.get(chave, ())}
+            for id_ in candidatos:
+                if np.mean(self._assinaturas[id_] == assinatura) >= self.limiar:
+                    return self._registrar_duplicata(id_, doc)
+
+            self._registrar(doc.metadata.get("id") or uuid.uuid4().hex, doc.metadata, assinatura, chaves)
+            self.estatisticas["unicos"] += 1
+            return None
+
+    def registrar_existente(self, id_: str, doc: Document):
+        """Registra um chunk já indexado (ex.: ao carregar um índice salvo)"""
+        self.registrar_assinatura(id_, self.assinatura(doc.page_content), doc.metadata)
+
+    def registrar_assinatura(self, id_: str, assinatura: np.ndarray, metadados: Dict):
+        """Registra um chunk já indexado cuja assinatura foi calculada em outro lugar
+
+        A assinatura precisa vir de um deduplicador com os mesmos `parametros()`.
+        """
+        with self._lock:
+            self._registrar(id_, metadados, assinatura, self._chaves(assinatura))
+
+    def parametros(self) -> Dict:
+        """Argumentos que reproduzem as assinaturas deste deduplicador (ex.: em outro processo)"""
+        return {"num_permutacoes": self.num_permutacoes, "tamanho_shingle": self.tamanho_shingle,
+                "semente": self.semente}
+
+    def remover(self, ids: Iterable[str]) -> List[Dict]:
+        """Esquece representantes que saíram do índice ou nunca chegaram a ser gravados
+
+        Sem isso, um chunk igual vindo de outro arquivo seria colapsado em
+        um representante sem vetor e não entraria no índice.
+
+        Returns:
+            Os metadados dos representantes removidos
+        """
+        removidos = []
+        with self._lock:
+            for id_ in ids:
+                representante = self._representantes.pop(id_, None)
+                if representante is None:
+                    continue
+                for banda, chave in zip(self._baldes, self._chaves(self._assinaturas.pop(id_))):
+                    balde = banda.get(chave)
+                    if balde and id_ in balde:
+                        balde.remove(id_)
+                        if not balde:
+                            del banda[chave]
+                removidos.append(representante)
+            if removidos:
+                ids_removidos = {metadados["id"] for metadados in removidos}
+                self.alterados = [id_ for id_ in self.alterados if id_ not in ids_removidos]
+        return removidos
+
+    def remover_caminhos(self, caminhos: Iterable[str]) -> List[Dict]:
+        """Esquece os representantes extraídos dos arquivos informados
+
+        Os arquivos também saem de 'caminhos' e 'fontes' dos representantes
+        de outros arquivos em que tinham duplicatas (listados em `alterados`).
+        """
+        caminhos = set(caminhos)
+        with self._lock:
+            removidos = self.remover([id_ for id_, metadados in self._representantes.items()
+                                      if metadados.get("caminho") in caminhos])
+            for id_, metadados in self._representantes.items():
+                if caminhos.isdisjoint(metadados.get("caminhos", ())):
+                    continue
+                restantes = [c for c in metadados["caminhos"] if c not in caminhos]
+                nomes = {metadados.get("fonte")} | {os.path.basename(c) for c in restantes}
+                metadados["caminhos"] = restantes
+                metadados["fontes"] = [f for f in metadados["fontes"] if f in nomes]
+                self.alterados.append(id_)
+        return removidos
+
+    def caminhos_dependentes(self, caminhos: Iterable[str]) -> set:
+        """Arquivos cujo conteúdo está no índice só como duplicata de chunks dos arquivos informados
+
+        Precisam ser reprocessados quando os chunks desses arquivos saem do
+        índice. A busca é transitiva: reprocessar um dependente também
+        remove os representantes dele.
+        """
+        dependencias: Dict[str, set] = defaultdict(set)
+        with self._lock:
+            for metadados in self._representantes.values():
+                proprio = metadados.get("caminho")
+                dependencias[proprio].update(c for c in metadados.get("caminhos", ()) if c != proprio)
+        pendentes = list(caminhos)
+        vistos = set(pendentes)
+        while pendentes:
+            for dependente in dependencias.get(pendentes.pop(), ()):
+                if dependente not in vistos:
+                    vistos.add(dependente)
+                    pendentes.append(dependente)
+        return vistos - set(caminhos)
+
+    def _chaves(self, assinatura: np.ndarray) -> List[bytes]:
+        """Chave de cada banda da assinatura no LSH"""
+        return [assinatura[i * self.linhas:(i + 1) * self.linhas].tobytes() for i in range(self.bandas)]
+
+    def _registrar(self, id_: str, metadados: Dict, assinatura: np.ndarray, chaves: List[bytes]):
+        # Os metadados do chunk recebem id/fontes/caminhos antes de ele ir para o índice
+        metadados["id"] = id_
+        metadados.setdefault("fontes", [metadados.get("fonte", "Desconhecido")])
+        if "caminho" in metadados:
+            metadados.setdefault("caminhos", [metadados["caminho"]])
+        self._assinaturas[id_] = assinatura
+        self._representantes[id_] = metadados_representante(metadados)
+        for banda, chave in zip(self._baldes, chaves):
+            banda[chave].append(id_)
+
+    def _registrar_duplicata(self, id_: str, doc: Document) -> Dict:
+        representante = self._representantes[id_]
+        fonte = doc.metadata.get("fonte", "Desconhecido")
+        fontes = representante["fontes"]
+        if fonte not in fontes:
+            fontes.append(fonte)
+        caminho = doc.metadata.get("caminho")
+        if caminho and caminho not in representante.setdefault("caminhos", []):
+            representante["caminhos"].append(caminho)
+        representante["duplicatas"] = representante.get("duplicatas", 0) + 1
+        self.alterados.append(id_)
+        self.estatisticas["duplicatas"] += 1
+        self.estatisticas["por_fonte"][fonte] += 1
+        return representante
+
+    def deduplicar(self, documentos: Iterable[Document]) -> List[Document]:
+        """Retorna apenas os chunks inéditos, com metadado 'id' atribuído.
+
+        Representantes de chamadas anteriores que receberam duplicatas
+        ficam listados em `alterados` até a próxima chamada.
+        """
+        self.alterados = []
+        unicos = [doc for doc in documentos if self.adicionar(doc) is None]
+        novos = {doc.metadata["id"]: doc for doc in unicos}
+        for id_ in set(self.alterados) & novos.keys():
+            # Inéditos que receberam duplicatas nesta mesma chamada ainda não foram gravados
+            novos[id_].metadata.update(self.metadados(id_))
+        self.alterados = [id_ for id_ in dict.fromkeys(self.alterados) if id_ not in novos]
+        return unicos
+
+    def metadados(self, id_: str) -> Dict:
+        """Metadados atuais do representante ('id', 'fontes', 'caminhos', 'duplicatas'...)"""
+        with self._lock:
+            return metadados_representante(self._representantes[id_])
+
+    def resumo(self) -> str:
+        """Resumo legível das estatísticas de deduplicação"""
+        total = self.estatisticas["total"]
+        duplicatas = self.estatisticas["duplicatas"]
+        taxa = 100 * duplicatas / total if total else 0.0
+        principais = ", ".join(f"{f} ({n})" for f, n in self.estatisticas["por_fonte"].most_common(5))
+        return (
+            f"{duplicatas} de {total} chunks eram duplicatas ({taxa:.1f}%)"
+            + (f"; principais fontes: {principais}" if principais else "")
+        )
@@ -0,0 +1,288 @@
+import argparse
+import re
+import logging
+import time
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from langchain_core.documents import Document
+
+# Abreviações comuns em português que não encerram frases
+ABREVIACOES = {
+    "sr", "sra", "srta", "dr", "dra", "prof", "profa", "etc", "ex", "exs",
+    "p", "pp", "pág", "pag", "cap", "fig", "vol", "nº", "n", "obs", "art",
+    "av", "tel", "aprox", "séc", "ed", "org", "coord", "op", "cit", "cf",
+    "i.e", "e.g", "a.c", "d.c", "min", "max", "jan", "fev", "mar", "abr",
+    "mai", "jun", "jul", "ago", "set", "out", "nov", "dez"
+}
+
+# Fim de frase seguido de espaço e de um início plausível de nova frase
+_FIM_FRASE = re.compile(r'([.!?…]+["»”\')\]]*)(\s+)(?=[A-ZÀ-ÖØ-Þ0-9"“«(\-–—•])')
+_FIM_PARAGRAFO = re.compile(r'\n[ \t]*\n\s*')
+
+
+class DivisorTokens:
+    """Divide texto em chunks medidos em tokens do modelo de embeddings.
+
+    Consome o texto incrementalmente (qualquer iterável de strings, como um
+    arquivo aberto ou um gerador de páginas), segmenta em frases e parágrafos
+    e agrupa as frases até o limite de tokens do modelo. Frases maiores que o
+    limite são cortadas nas fronteiras de token.
+    """
+
+    def __init__(self, tokenizer, max_tokens: int, sobreposicao: int = 0,
+                 tamanho_lote: int = 64, max_buffer: int = 20000):
+        """
+        Args:
+            tokenizer: Tokenizer (HuggingFace) do modelo de embeddings
+            max_tokens: Máximo de tokens por chunk, sem tokens especiais
+            sobreposicao: Tokens de frases anteriores repetidos no chunk seguinte
+            tamanho_lote: Quantidade de frases tokenizadas por chamada
+            max_buffer: Caracteres acumulados sem fronteira antes de forçar corte
+        """
+        if max_tokens <= 0:
+            raise ValueError("max_tokens deve ser positivo")
+        self.logger = logging.getLogger(__name__)
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.sobreposicao = min(sobreposicao, max_tokens // 2)
+        self.tamanho_lote = tamanho_lote
+        self.max_buffer = max_buffer
+
+    @classmethod
+    def do_modelo(cls, modelo, sobreposicao: int = 0, max_tokens: int = None) -> "DivisorTokens":
+        """Cria o divisor a partir de um SentenceTransformer carregado"""
+        limite = max_tokens or modelo.max_seq_length
+        # Reserva espaço para os tokens especiais ([CLS]/[SEP], <s>/</s>)
+        especiais = modelo.tokenizer.num_special_tokens_to_add(pair=False)
+        return cls(modelo.tokenizer, min(limite, modelo.max_seq_length - especiais), sobreposicao)
+
+    def split_text(self, texto: str) -> List[str]:
+        """Compatível com os text splitters do LangChain"""
+        return list(self.dividir([texto]))
+
+    def contar_tokens(self, textos: List[str]) -> List[int]:
+        """Conta os tokens de vários textos em uma única chamada ao tokenizer"""
+        if not textos:
+            return []
+        ids = self.tokenizer(textos, add_special_tokens=False)["input_ids"]
+        return [len(i) for i in ids]
+
+    def dividir(self, partes: Iterable[str]) -> Iterator[str]:
+        """Gera os chunks à medida que o texto é consumido"""
+        for texto, _, _ in self._dividir_com_posicoes(partes):
+            yield texto
+
+    def dividir_documentos(self, unidades: Iterable[Document]) -> Iterator[Document]:
+        """Divide unidades consecutivas de um mesmo arquivo (páginas, blocos de linhas).
+
+        Os chunks podem atravessar unidades; cada chunk herda os metadados da
+        unidade em que começa, acrescidos do número do chunk. Se as unidades
+        forem trechos com tempo (segmentos de transcrição com 'inicio' e
+        'fim'), o 'fim' do chunk vem da unidade em que ele termina.
+        """
+        inicios: List[int] = []
+        metadados: List[Dict] = []
+
+        def textos() -> Iterator[str]:
+            posicao = 0
+            for unidade in unidades:
+                inicios.append(posicao)
+                metadados.append(unidade.metadata)
+                texto = unidade.page_content + "\n"
+                posicao += len(texto)
+                yield texto
+
+        for i, (texto, inicio, fim) in enumerate(self._dividir_com_posicoes(textos())):
+            origem = metadados[bisect_right(inicios, inicio) - 1]
+            metadata = {**origem, "chunk": i + 1}
+            if "fim" in origem:
+                metadata["fim"] = metadados[bisect_right(inicios, max(inicio, fim - 1)) - 1]["fim"]
+            yield Document(page_content=texto, metadata=metadata)
+
+    def _dividir_com_posicoes(self, partes: Iterable[str]) -> Iterator[Tuple[str, int, int]]:
+        """Gera (chunk, posição inicial, posição final) no texto de entrada"""
+        atual: List[Tuple[str, int, int]] = []
+        total = 0
+        novas = 0
+
+        for frase, tokens, posicao, fim_paragrafo in self._frases_com_tokens(partes):
+            if tokens > self.max_tokens:
+                if novas:
+                    yield self._juntar(atual)
+                atual, total, novas = [], 0, 0
+                yield from self._cortar_frase(frase, posicao)
+                continue
+
+            if novas and total + tokens > self.max_tokens:
+                yield self._juntar(atual)
+                atual = self._sobreposicao(atual, tokens)
+                total, novas = sum(t for _, t, _ in atual), 0
+
+            atual.append((frase if not fim_paragrafo else frase + "\n\n", tokens, posicao))
+            total += tokens
+            novas += 1
+
+            # Prefere fechar o chunk no fim de um parágrafo quando já está quase cheio
+            if fim_paragrafo and total >= self.max_tokens * 0.75:
+                yield self._juntar(atual)
+                atual = self._sobreposicao(atual, 0)
+                total, novas = sum(t for _, t, _ in atual), 0
+
+        if novas:
+            yield self._juntar(atual)
+
+    def _juntar(self, frases: List[Tuple[str, int, int]]) -> Tuple[str, int, int]:
+        texto = " ".join(f for f, _, _ in frases).replace("\n\n ", "\n\n").strip()
+        ultima = frases[-1]
+        return texto, frases[0][2], ultima[2] + len(ultima[0].rstrip())
+
+    def _sobreposicao(self, frases: List[Tuple[str, int, int]], proxima: int) -> List[Tuple[str, int, int]]:
+        """Frases finais do chunk anterior que cabem na sobreposição"""
+        if not self.sobreposicao:
+            return []
+        mantidas = []
+        total = 0
+        for frase in reversed(frases):
+            tokens = frase[1]
+            if total + tokens > self.sobreposicao or total + tokens + proxima > self.max_tokens:
+                break
+            mantidas.append(frase)
+            total += tokens
+        mantidas.reverse()
+        return mantidas
+
+    def _cortar_frase(self, frase: str, posicao: int) -> Iterator[Tuple[str, int, int]]:
+        """Corta uma frase longa demais nas fronteiras de token"""
+        try:
+            codificado = self.tokenizer(frase, add_special_tokens=False, return_offsets_mapping=True)
+            offsets = codificado["offset_mapping"]
+            for i in range(0, len(offsets), self.max_tokens):
+                janela = offsets[i:i + self.max_tokens]
+                pedaco = frase[janela[0][0]:janela[-1][1]].strip()
+                if pedaco:
+                    yield pedaco, posicao + janela[0][0], posicao + janela[-1][1]
+        except (NotImplementedError, KeyError, TypeError):
+            # Tokenizers sem suporte a offsets (versões "slow")
+            ids = self.tokenizer(frase, add_special_tokens=False)["input_ids"]
+            for i in range(0, len(ids), self.max_tokens):
+                yield self.tokenizer.decode(ids[i:i + self.max_tokens]).strip(), posicao, posicao
+
+    def _frases_com_tokens(self, partes: Iterable[str]) -> Iterator[Tuple[str, int, int, bool]]:
+        """Tokeniza as frases em lotes para amortizar o custo do tokenizer"""
+        lote = []
+        for frase in self._frases(partes):
+            lote.append(frase)
+            if len(lote) >= self.tamanho_lote:
+                yield from self._tokenizar_lote(lote)
+                lote = []
+        if lote:
+            yield from self._tokenizar_lote(lote)
+
+    def _tokenizar_lote(self, lote: List[Tuple[str, int, bool]]) -> Iterator[Tuple[str, int, int, bool]]:
+        contagens = self.contar_tokens([f for f, _, _ in lote])
+        for (frase, posicao, fim_paragrafo), tokens in zip(lote, contagens):
+            yield frase, tokens, posicao, fim_paragrafo
+
+    def _frases(self, partes: Iterable[str]) -> Iterator[Tuple[str, int, bool]]:
+        """Segmenta o fluxo em frases: (frase, posição no fluxo, fim de parágrafo)"""
+        buffer = ""
+        base = 0
+        for parte in partes:
+            if not parte:
+                continue
+            buffer += parte
+            frases, consumido = self._segmentar(buffer)
+            for frase, posicao, fim_paragrafo in frases:
+                yield frase, base + posicao, fim_paragrafo
+            buffer = buffer[consumido:]
+            base += consumido
+
+            if len(buffer) > self.max_buffer:
+                # Texto longo sem pontuação: corta no último espaço disponível
+                corte = buffer.rfind(" ", 0, self.max_buffer)
+                corte = corte if corte > 0 else self.max_buffer
+                yield " ".join(buffer[:corte].split()), base, False
+                buffer = buffer[corte:]
+                base += corte
+
+        resto = " ".join(buffer.split())
+        if resto:
+            yield resto, base + len(buffer) - len(buffer.lstrip()), True
+
+    def _segmentar(self, texto: str) -> Tuple[List[Tuple[str, int, bool]], int]:
+        """Frases com fronteira confirmada (há texto depois delas) no buffer"""
+        frases = []
+        inicio = 0
+        for paragrafo in _FIM_PARAGRAFO.finditer(texto):
+            if paragrafo.end() >= len(texto):
+                # A quebra pode continuar na próxima parte do fluxo
+                break
+            bloco = texto[inicio:paragrafo.start()]
+            completas, fim = self._frases_do_bloco(bloco)
+            resto = " ".join(bloco[fim:].split())
+            if resto:
+                completas.append((resto, fim + len(bloco[fim:]) - len(bloco[fim:].lstrip())))
+            frases.extend(
+                (f, inicio + pos, i == len(completas) - 1) for i, (f, pos) in enumerate(completas)
+            )
+            inicio = paragrafo.end()
+
+        completas, fim = self._frases_do_bloco(texto[inicio:])
+        frases.extend((f, inicio + pos, False) for f, pos in completas)
+        return frases, inicio + fim
+
+    def _frases_do_bloco(self, bloco: str) -> Tuple[List[Tuple[str, int]], int]:
+        """Frases terminadas por pontuação em um bloco sem quebra de parágrafo"""
+        frases = []
+        inicio = 0
+        for corte in _FIM_FRASE.finditer(bloco):
+            palavras = bloco[max(inicio, corte.start() - 12):corte.start()].split()
+            anterior = palavras[-1].lower().lstrip("(\"“«") if palavras else ""
+            if corte.group(1).startswith(".") and (anterior in ABREVIACOES or len(anterior) == 1):
+                continue
+            frases.append((" ".join(bloco[inicio:corte.end(1)].split()), inicio))
+            inicio = corte.end()
+        return frases, inicio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara o DivisorTokens com o RecursiveCharacterTextSplitter")
+    parser.add_argument("arquivos", nargs="+", help="Arquivos de texto usados como entrada")
+    parser.add_argument("--modelo", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+                        help="Tokenizer (nome no HuggingFace ou pasta local)")
+    parser.add_argument("--max-tokens", type=int, default=128, help="max_seq_length do modelo")
+    parser.add_argument("--sobreposicao", type=int, default=32)
+    parser.add_argument("--repetir", type=int, default=1, help="Concatena a entrada N vezes")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções de cada divisor (vale a melhor)")
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    tokenizer = AutoTokenizer.from_pretrained(args.modelo)
+    limite = args.max_tokens - tokenizer.num_special_tokens_to_add(pair=False)
+    texto = "\n\n".join(open(a, encoding="utf-8").read() for a in args.arquivos)
+    texto = "\n\n".join([texto] * args.repetir)
+
+    divisor = DivisorTokens(tokenizer, limite, args.sobreposicao)
+    divisores = {
+        # Linha a linha, como um arquivo aberto
+        "DivisorTokens": lambda t: list(divisor.dividir(t.splitlines(keepends=True))),
+        "recursivo (tokens)": RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+            tokenizer, chunk_size=limite, chunk_overlap=args.sobreposicao).split_text,
+        "recursivo (caracteres)": RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_text
+    }
+
+    print(f"{len(texto) / 1e6:.1f} MB, limite de {limite} tokens por chunk")
+    print(f"{'divisor':<24}{'tempo (s)':>10}{'MB/s':>8}{'chunks':>8}{'tokens/chunk':>14}{'acima do limite':>17}")
+    for nome, dividir in divisores.items():
+        tempos = []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            chunks = dividir(texto)
+            tempos.append(time.perf_counter() - inicio)
+        tokens = divisor.contar_tokens(chunks)
+        acima = sum(t > limite for t in tokens)
+        print(f"{nome:<24}{min(tempos):>10.2f}{len(texto) / 1e6 / min(tempos):>8.1f}{len(chunks):>8}"
+              f"{sum(tokens) / len(tokens):>14.1f}{acima:>17}")
@@ -0,0 +1,124 @@
+import os
+import logging
+import multiprocessing as mp
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Modelo carregado em cada processo do pool
+_modelo = None
+
+
+def _inicializar_worker(model_name: str, device: str, threads: int):
+    """Carrega uma cópia do modelo no processo, com número fixo de threads"""
+    global _modelo
+    for variavel in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variavel] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _modelo = SentenceTransformer(model_name, device=device)
+
+
+def _codificar(tarefa: Tuple[List[int], List[str], bool]):
+    indices, textos, normalizar = tarefa
+    vetores = _modelo.encode(
+        textos,
+        batch_size=len(textos),
+        normalize_embeddings=normalizar,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return indices, vetores.astype("float32")
+
+
+class EmbeddingParalelo:
+    """Calcula embeddings em um pool de processos para indexação em massa.
+
+    Os textos são lidos em janelas; dentro de cada janela são ordenados
+    por tamanho e cortados em lotes, para que cada lote tenha textos de
+    comprimento parecido e pouco padding. Os lotes são distribuídos entre
+    os processos e os vetores voltam na ordem original, janela a janela,
+    para que possam ser gravados no índice enquanto a janela seguinte é
+    calculada.
+    """
+
+    def __init__(self, model_name: str, workers: Optional[int] = None, threads_por_worker: int = 1,
+                 device: str = "cpu", tamanho_lote: int = 32, tamanho_janela: int = 4096,
+                 normalizar: bool = True):
+        """
+        Args:
+            model_name: Modelo SentenceTransformer (o mesmo do Indexador)
+            workers: Processos no pool (padrão: núcleos / threads_por_worker)
+            threads_por_worker: Threads de torch/BLAS fixadas em cada processo
+            device: Dispositivo de cada processo
+            tamanho_lote: Textos por lote enviado a um processo
+            tamanho_janela: Textos ordenados por tamanho de cada vez
+            normalizar: Normaliza os vetores (como o HuggingFaceEmbeddings do Indexador)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.model_name = model_name
+        self.threads_por_worker = max(1, threads_por_worker)
+        self.workers = workers or max(1, (os.cpu_count() or 1) // self.threads_por_worker)
+        self.device = device
+        self.tamanho_lote = tamanho_lote
+        self.tamanho_janela = max(tamanho_janela, tamanho_lote)
+        self.normalizar = normalizar
+        self._pool = None
+
+    def iniciar(self):
+        if self._pool is None:
+            contexto = mp.get_context("spawn")
+            self._pool = contexto.Pool(
+                self.workers,
+                initializer=_inicializar_worker,
+                initargs=(self.model_name, self.device, self.threads_por_worker)
+            )
+            self.logger.info(
+                f"Pool de embeddings iniciado: {self.workers} processos x {self.threads_por_worker} threads"
+            )
+        return self
+
+    def encerrar(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self.logger.info("Pool de embeddings encerrado")
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *args):
+        self.encerrar()
+
+    def embed_documents(self, textos: List[str]) -> List[List[float]]:
+        """Mesma interface do Embeddings do LangChain"""
+        return list(self.gerar(textos))
+
+    def gerar(self, textos: Iterable[str]) -> Iterator[List[float]]:
+        """Gera os vetores na ordem dos textos, janela a janela"""
+        self.iniciar()
+        janela = []
+        for texto in textos:
+            janela.append(texto)
+            if len(janela) >= self.tamanho_janela:
+                yield from self._processar_janela(janela)
+                janela = []
+        if janela:
+            yield from self._processar_janela(janela)
+
+    def _processar_janela(self, textos: List[str]) -> Iterator[List[float]]:
+        # Ordena por tamanho para minimizar padding dentro de cada lote
+        ordem = sorted(range(len(textos)), key=lambda i: len(textos[i]))
+        tarefas = [
+            (lote, [textos[i] for i in lote], self.normalizar)
+            for lote in (ordem[i:i + self.tamanho_lote] for i in range(0, len(ordem), self.tamanho_lote))
+        ]
+
+        vetores: List[Optional[List[float]]] = [None] * len(textos)
+        for indices, resultado in self._pool.imap_unordered(_codificar, tarefas):
+            for indice, vetor in zip(indices, resultado):
+                vetores[indice] = vetor.tolist()
+        return iter(vetores)
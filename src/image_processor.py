@@ -1,15 +1,22 @@
-from PIL import Image
-from transformers import pipeline
-import magic
 import os
 import logging
-from typing import List
-from langchain.schema import Document
+import threading
+from typing import Iterator, List
+from langchain_core.documents import Document
 
 class ImageProcessor:
-    def __init__(self):
+    def __init__(self, ocr=None):
+        """
+        Args:
+            ocr: MotorOCR para extrair o texto de imagens como infográficos e slides
+        """
         self.logger = logging.getLogger(__name__)
+        self.ocr = ocr
+        # O mesmo modelo atende imagens e quadros de vídeo, de threads diferentes
+        self._lock = threading.Lock()
         try:
+            from transformers import pipeline
+
             # Modelo leve para testes (substitua por BLIP se tiver recursos)
             self.image_analyzer = pipeline("image-to-text", 
                                          model="Salesforce/blip-image-captioning-base")
@@ -17,56 +24,52 @@ class ImageProcessor:
             self.logger.error(f"Erro ao carregar modelo de imagens: {e}")
             self.image_analyzer = None
 
-    def processar(self, pasta="dados/imagens") -> List[Document]:
-        """Processa imagens e gera descrições como objetos Document"""
-        documentos = []
-        try:
-            arquivos = [f for f in os.listdir(pasta) 
-                      if magic.from_file(os.path.join(pasta, f), mime=True).startswith('image/')]
-            
-            if not arquivos:
-                self.logger.warning(f"Nenhuma imagem encontrada em {pasta}")
-                return documentos
+    def extrair(self, caminho: str) -> Iterator[Document]:
+        """Gera a descrição de uma imagem, acrescida do texto reconhecido por OCR"""
+        from PIL import Image
 
-            for arquivo in arquivos:
-                try:
-                    path = os.path.join(pasta, arquivo)
-                    img = Image.open(path)
-                    
-                    # Gera descrição ou usa fallback
-                    descricao = self._gerar_descricao(path) if self.image_analyzer else f"Imagem: {arquivo}"
-                    
-                    # Cria objeto Document do LangChain
-                    documento = Document(
-                        page_content=descricao,
-                        metadata={
-                            "tipo": "imagem",
-                            "fonte": arquivo,
-                            "dimensoes": f"{img.width}x{img.height}",
-                            "formato": img.format,
-                            "tags": self._extrair_tags(descricao)
-                        }
-                    )
-                    documentos.append(documento)
-                    self.logger.info(f"Imagem processada: {arquivo}")
+        arquivo = os.path.basename(caminho)
+        with Image.open(caminho) as img:
+            # Gera descrição ou usa fallback
+            descricao = self._gerar_descricao(caminho) if self.image_analyzer else f"Imagem: {arquivo}"
+            texto_ocr = self.ocr.ocr_imagem(caminho) if self.ocr is not None else ""
 
-                except Exception as e:
-                    self.logger.error(f"Erro ao processar {arquivo}: {e}")
-
-        except Exception as e:
-            self.logger.error(f"Erro ao acessar imagens: {e}")
-        
-        return documentos
+            yield Document(
+                page_content=descricao + (f"\n\nTexto na imagem:\n{texto_ocr}" if texto_ocr else ""),
+                metadata={
+                    "tipo": "imagem",
+                    "fonte": arquivo,
+                    "caminho": caminho,
+                    "dimensoes": f"{img.width}x{img.height}",
+                    "formato": img.format,
+                    "tags": self._extrair_tags(descricao),
+                    "ocr": bool(texto_ocr)
+                }
+            )
+        self.logger.info(f"Imagem processada: {arquivo}")
 
     def _gerar_descricao(self, image_path: str) -> str:
         """Gera descrição usando modelo de IA"""
         try:
-            result = self.image_analyzer(image_path)
+            with self._lock:
+                result = self.image_analyzer(image_path)
             return result[0]['generated_text']
         except Exception as e:
             self.logger.error(f"Erro na análise da imagem: {e}")
             return "Descrição não disponível"
 
+    def descrever_lote(self, imagens: List) -> List[str]:
+        """Descrições de várias imagens PIL em uma única chamada ao modelo"""
+        if self.image_analyzer is None or not imagens:
+            return [""] * len(imagens)
+        try:
+            with self._lock:
+                resultados = self.image_analyzer(imagens, batch_size=len(imagens))
+            return [r[0]['generated_text'] for r in resultados]
+        except Exception as e:
+            self.logger.error(f"Erro na análise das imagens: {e}")
+            return [""] * len(imagens)
+
     def _extrair_tags(self, descricao: str) -> List[str]:
         """Extrai tags relevantes da descrição"""
         tags = []
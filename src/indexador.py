@@ -1,18 +1,59 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
-from .audio_processor import AudioProcessor
-from typing import List, Dict, Union, Optional
+from .divisor_texto import DivisorTokens
+from .colecoes import ColecoesIndice
+from .deduplicador import DeduplicadorMinHash
+from .pipeline import PipelineIngestao, RegistroProcessadores
+from .embedding_paralelo import EmbeddingParalelo
+from .indice_imagens import IndiceImagens
+from .indice_particionado import ARQUIVO_PARTICOES, IndiceParticionado
+from .ocr import MotorOCR
+from .pdf_processor import PDFProcessor
+from .perfilador import perfilado
+from .respostas_pregeradas import hash_conteudo
+from .text_processor import TextProcessor
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Dict, Union, Optional
+import hashlib
+import itertools
 import logging
 import os
+import threading
 
 DEFAULT_CONFIG = {
+    "divisor": "tokens",
     "chunk_size": 1000,
     "chunk_overlap": 200,
+    "max_tokens_chunk": None,
+    "sobreposicao_tokens": 32,
     "model_name": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
     "audio_model": "base",
-    "device": "cpu"
+    "device": "cpu",
+    "deduplicar": True,
+    "limiar_duplicata": 0.85,
+    "workers_extracao": 2,
+    "tamanho_fila": 256,
+    "lote_embeddings": 64,
+    "workers_embedding": 0,
+    "threads_por_worker_embedding": 1,
+    "janela_embedding": 4096,
+    "indice_imagens": True,
+    "modelo_clip_imagem": "clip-ViT-B-32",
+    "modelo_clip_texto": "sentence-transformers/clip-ViT-B-32-multilingual-v1",
+    "lote_imagens": 16,
+    "ocr": True,
+    "ocr_idioma": "por",
+    "ocr_dpi": 300,
+    "ocr_workers": 0,
+    "ocr_cache": "ocr_cache.db",
+    "quadros_chave": True,
+    "intervalo_quadros": 0.5,
+    "limiar_cena": 0.12,
+    "max_quadros_video": 200,
+    "lote_quadros": 8,
+    "pasta_colecoes": "colecoes",
+    "orcamento_colecoes_mb": 2048,
+    "particoes": 1,
+    "workers_particoes": 0
 }
 
 class Indexador:
@@ -20,11 +61,40 @@ class Indexador:
         """
         Args:
             config (Dict): Configurações opcionais:
-                - chunk_size: Tamanho dos chunks de texto
-                - chunk_overlap: Sobreposição entre chunks
+                - divisor: 'tokens' (tokens do modelo de embeddings) ou 'caracteres'
+                - chunk_size: Tamanho dos chunks de texto (divisor 'caracteres')
+                - chunk_overlap: Sobreposição entre chunks (divisor 'caracteres')
+                - max_tokens_chunk: Limite de tokens por chunk (padrão: limite do modelo)
+                - sobreposicao_tokens: Sobreposição entre chunks em tokens
                 - model_name: Nome do modelo de embeddings
                 - audio_model: Tamanho do modelo Whisper
                 - device: Dispositivo para processamento ('cpu' ou 'cuda')
+                - deduplicar: Colapsa chunks quase duplicados antes de gerar embeddings
+                - limiar_duplicata: Similaridade (Jaccard) mínima para considerar duplicata
+                - workers_extracao: Threads de extração/divisão no pipeline de ingestão
+                - tamanho_fila: Capacidade das filas entre as etapas do pipeline
+                - lote_embeddings: Chunks por chamada ao modelo de embeddings
+                - workers_embedding: Processos para embeddings em massa (0 ou 1 desativa)
+                - threads_por_worker_embedding: Threads de torch em cada processo
+                - janela_embedding: Chunks ordenados por tamanho e distribuídos de cada vez
+                - indice_imagens: Mantém um índice CLIP das imagens para busca por texto
+                - modelo_clip_imagem: Modelo CLIP para as imagens
+                - modelo_clip_texto: Codificador de texto multilíngue alinhado ao modelo CLIP
+                - lote_imagens: Imagens por passada do codificador CLIP
+                - ocr: OCR de páginas de PDF sem texto e de imagens com texto
+                - ocr_idioma: Idioma do Tesseract
+                - ocr_dpi: Resolução de renderização das páginas para OCR
+                - ocr_workers: Processos de OCR (0: número de núcleos)
+                - ocr_cache: Arquivo SQLite do cache de OCR
+                - quadros_chave: Indexa a descrição e o texto na tela dos quadros em que a cena do vídeo muda
+                - intervalo_quadros: Segundos entre os quadros comparados na detecção de cenas
+                - limiar_cena: Fração de pixels alterados que caracteriza uma nova cena
+                - max_quadros_video: Limite de quadros-chave por vídeo
+                - lote_quadros: Quadros-chave por chamada ao modelo de descrição e ao OCR
+                - pasta_colecoes: Pasta dos índices por coleção (curso/módulo)
+                - orcamento_colecoes_mb: Memória máxima das coleções carregadas ao mesmo tempo
+                - particoes: Divide o índice principal em N partições buscadas em paralelo (1 desativa)
+                - workers_particoes: Processos que mantêm as partições (0: um por partição)
         """
         self.logger = logging.getLogger(__name__)
         self.config = {**DEFAULT_CONFIG, **(config or {})}
@@ -33,10 +103,27 @@ class Indexador:
     def _inicializar_componentes(self):
         """Inicializa todos os componentes do indexador"""
         try:
-            self._inicializar_text_splitter()
             self._inicializar_embeddings()
+            self._inicializar_text_splitter()
             self._inicializar_processadores()
+            self._inicializar_deduplicador()
+            self._inicializar_indice_imagens()
             self.banco_vetorial = None
+            self.embedding_paralelo = None
+            self.particionado = None
+            if self.config["particoes"] > 1:
+                self.particionado = IndiceParticionado(self.config["particoes"], self.config["workers_particoes"])
+            self.colecoes = ColecoesIndice(
+                self,
+                pasta=self.config["pasta_colecoes"],
+                orcamento_mb=self.config["orcamento_colecoes_mb"]
+            )
+            self._lock_indice = threading.RLock()
+            # Incrementada a cada alteração do índice, para invalidar resultados guardados
+            self.versao_indice = 0
+            self._hashes_conteudo = (None, frozenset())
+            # Estatísticas do último processar_e_indexar (inclui 'arquivos_com_erro')
+            self.ultima_ingestao = PipelineIngestao._estatisticas_iniciais()
             self.logger.info("Componentes do indexador inicializados com sucesso")
         except Exception as e:
             self.logger.critical(f"Falha na inicialização: {str(e)}")
@@ -44,6 +131,17 @@ class Indexador:
 
     def _inicializar_text_splitter(self):
         """Configura o divisor de texto"""
+        if self.config["divisor"] == "tokens":
+            self.text_splitter = DivisorTokens.do_modelo(
+                self.embeddings.client,
+                sobreposicao=self.config["sobreposicao_tokens"],
+                max_tokens=self.config["max_tokens_chunk"]
+            )
+            self.logger.info(f"Divisor por tokens configurado ({self.text_splitter.max_tokens} tokens por chunk)")
+            return
+
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.config["chunk_size"],
             chunk_overlap=self.config["chunk_overlap"],
@@ -54,6 +152,8 @@ class Indexador:
     def _inicializar_embeddings(self):
         """Carrega o modelo de embeddings"""
         try:
+            from langchain_huggingface import HuggingFaceEmbeddings
+
             self.embeddings = HuggingFaceEmbeddings(
                 model_name=self.config["model_name"],
                 model_kwargs={'device': self.config["device"]},
@@ -67,129 +167,243 @@ class Indexador:
             self.logger.error(f"Falha ao carregar embeddings: {str(e)}")
             raise
 
+    def _inicializar_deduplicador(self):
+        """Configura a detecção de chunks quase duplicados"""
+        self.deduplicador = None
+        if self.config["deduplicar"]:
+            self.deduplicador = DeduplicadorMinHash(limiar=self.config["limiar_duplicata"])
+            self.logger.info(f"Deduplicação ativada (limiar: {self.config['limiar_duplicata']})")
+
+    def _inicializar_indice_imagens(self):
+        """Configura o índice CLIP de imagens (modelos carregados sob demanda)"""
+        self.indice_imagens = None
+        if self.config["indice_imagens"]:
+            self.indice_imagens = IndiceImagens(
+                modelo_imagem=self.config["modelo_clip_imagem"],
+                modelo_texto=self.config["modelo_clip_texto"],
+                device=self.config["device"],
+                tamanho_lote=self.config["lote_imagens"]
+            )
+
     def _inicializar_processadores(self):
-        """Inicializa todos os processadores de mídia"""
-        self.audio_processor = AudioProcessor(model_size=self.config["audio_model"])
-        self.logger.info(f"Processador de áudio inicializado (modelo: {self.config['audio_model']})")
+        """Registra os processadores de mídia por extensão e monta o pipeline de ingestão"""
+        self._processador_imagem = None
+        self._lock_processador_imagem = threading.Lock()
+        self.ocr = None
+        if self.config["ocr"]:
+            self.ocr = MotorOCR(
+                idioma=self.config["ocr_idioma"],
+                dpi=self.config["ocr_dpi"],
+                workers=self.config["ocr_workers"],
+                caminho_cache=self.config["ocr_cache"]
+            )
+
+        self.registro = RegistroProcessadores()
+        self.registro.registrar(('.txt', '.md'), TextProcessor, "texto", concorrente=True)
+        self.registro.registrar(('.pdf',), lambda: PDFProcessor(self, ocr=self.ocr), "pdf", concorrente=True)
+        self.registro.registrar(('.mp3', '.wav'), self._criar_processador_audio, "audio")
+        self.registro.registrar(('.mp4', '.avi', '.mov'), self._criar_processador_video, "video")
+        self.registro.registrar(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'),
+                                self._criar_processador_imagem, "imagem")
+
+        self.pipeline = PipelineIngestao(
+            self,
+            self.registro,
+            workers_extracao=self.config["workers_extracao"],
+            tamanho_fila=self.config["tamanho_fila"],
+            tamanho_lote=self.config["lote_embeddings"]
+        )
+
+    def _criar_processador_audio(self):
+        from .audio_processor import AudioProcessor
+        return AudioProcessor(model_size=self.config["audio_model"])
+
+    def _criar_processador_video(self):
+        from .video_processor import VideoProcessor
+        return VideoProcessor(self)
 
-    def processar_e_indexar(self, caminho_pasta: str) -> bool:
+    def _criar_processador_imagem(self):
+        return self.processador_imagem()
+
+    def processador_imagem(self):
+        """ImageProcessor compartilhado (o BLIP é carregado uma vez para imagens e quadros de vídeo)"""
+        with self._lock_processador_imagem:
+            if self._processador_imagem is None:
+                from .image_processor import ImageProcessor
+                self._processador_imagem = ImageProcessor(ocr=self.ocr)
+            return self._processador_imagem
+
+    @perfilado("indexador.processar_e_indexar", todas_threads=True)
+    def processar_e_indexar(self, caminho_pasta: Union[str, List[str]]) -> bool:
         """
         Processa e indexa todos os documentos na pasta especificada
         
         Args:
-            caminho_pasta: Caminho para a pasta contendo subpastas por tipo de mídia
+            caminho_pasta: Pasta (percorrida recursivamente) ou lista de pastas/arquivos
             
         Returns:
-            bool: True se a indexação foi bem-sucedida
+            bool: True se a indexação foi bem-sucedida (estatísticas em `ultima_ingestao`)
         """
         try:
-            documentos = self._coletar_documentos(caminho_pasta)
-            if documentos:
-                return self.criar_indice(documentos)
-            return False
+            with self.embedding_em_lote():
+                resultado = self.pipeline.processar(caminho_pasta)
+            self.ultima_ingestao = resultado
+            self._indexar_imagens(caminho_pasta)
+            return resultado["falha"] is None and resultado["chunks"] > 0
         except Exception as e:
             self.logger.error(f"Erro no processamento: {str(e)}")
             return False
+        finally:
+            # O pool de OCR só existe enquanto há arquivos sendo processados
+            if self.ocr is not None:
+                self.ocr.encerrar()
 
-    def _coletar_documentos(self, caminho_pasta: str) -> List[Document]:
-        """Coleta documentos de todas as subpastas"""
-        documentos = []
-        
-        # Mapeamento de tipos de mídia para funções de processamento
-        processadores = {
-            'textos': self._processar_textos,
-            'pdfs': self._processar_pdfs,
-            'audios': self._processar_audios,
-            'videos': lambda x: [],  # Placeholder - implementar se necessário
-            'imagens': lambda x: []   # Placeholder - implementar se necessário
-        }
-        
-        for tipo, processador in processadores.items():
-            try:
-                caminho_completo = os.path.join(caminho_pasta, tipo)
-                if os.path.exists(caminho_completo):
-                    docs = processador(caminho_completo)
-                    documentos.extend(docs)
-                    self.logger.info(f"Processados {len(docs)} documentos do tipo {tipo}")
-            except Exception as e:
-                self.logger.error(f"Erro ao processar {tipo}: {str(e)}")
-                continue
-                
-        return documentos
+    def atualizar_arquivos(self, caminhos: Iterable[str]) -> Dict:
+        """Reindexa arquivos novos, alterados ou removidos sem interromper as buscas
 
-    def _processar_audios(self, pasta_audios: str) -> List[Document]:
-        """Processa arquivos de áudio e retorna documentos"""
-        if not hasattr(self, 'audio_processor'):
-            self.logger.warning("Processador de áudio não disponível")
-            return []
-            
-        return self.audio_processor.processar(pasta_audios)
+        Os novos chunks e embeddings são calculados fora do lock; a troca
+        (remoção dos chunks antigos de cada arquivo e inclusão dos novos)
+        acontece de uma vez sob o lock do índice, então uma busca nunca vê
+        um arquivo pela metade (no índice particionado as buscas não usam o
+        lock, e uma busca durante a troca pode não encontrar o arquivo). Arquivos cuja extração falhar mantêm os
+        chunks antigos. A deduplicação não é aplicada nessas atualizações,
+        para que um arquivo editado não seja colapsado com a própria versão
+        anterior. Arquivos com duplicatas colapsadas em chunks dos arquivos
+        alterados são reprocessados junto, já que esses chunks saem do índice.
+        """
+        caminhos = list(dict.fromkeys(caminhos))
+        if self.deduplicador is not None:
+            dependentes = sorted(self.deduplicador.caminhos_dependentes(caminhos))
+            if dependentes:
+                self.logger.info(f"Reprocessando {len(dependentes)} arquivos com duplicatas nos alterados")
+                caminhos += dependentes
+        existentes = [c for c in caminhos if os.path.isfile(c)]
+        removidos = {c for c in caminhos if not os.path.exists(c)}
 
-    def _processar_textos(self, pasta_textos: str) -> List[Document]:
-        """Processa arquivos de texto (.txt, .md)"""
-        documentos = []
-        if not os.path.exists(pasta_textos):
-            return documentos
-
-        for arquivo in os.listdir(pasta_textos):
-            if arquivo.endswith(('.txt', '.md')):
-                try:
-                    caminho = os.path.join(pasta_textos, arquivo)
-                    with open(caminho, 'r', encoding='utf-8') as f:
-                        conteudo = f.read()
-                    
-                    # Divide o texto em chunks
-                    textos = self.text_splitter.split_text(conteudo)
-                    for i, texto in enumerate(textos):
-                        doc = Document(
-                            page_content=texto,
-                            metadata={
-                                "tipo": "texto",
-                                "fonte": arquivo,
-                                "chunk": i+1
-                            }
-                        )
-                        documentos.append(doc)
-                        
-                except Exception as e:
-                    self.logger.error(f"Erro no arquivo {arquivo}: {str(e)}")
-        
-        return documentos
+        lotes = []
+        resultado = self.pipeline._estatisticas_iniciais()
+        try:
+            if existentes:
+                resultado = self.pipeline.processar(
+                    existentes, deduplicar=False,
+                    escrever=lambda documentos, vetores: lotes.append((documentos, vetores))
+                )
+        finally:
+            if self.ocr is not None:
+                self.ocr.encerrar()
+        if resultado["falha"] is not None:
+            self.logger.error(f"Atualização descartada: {resultado['falha']}")
+            return resultado
 
-    def _processar_pdfs(self, pasta_pdfs: str) -> List[Document]:
-        """Processa arquivos PDF usando PyPDF"""
-        documentos = []
+        # Arquivos que ficaram sem conteúdo também perdem os chunks antigos
+        com_erro = set(resultado["arquivos_com_erro"])
+        processados = set(existentes) - com_erro
+        with self._lock_indice:
+            resultado["removidos"] = self._remover_chunks(processados | removidos)
+            for documentos, vetores in lotes:
+                # Chunks já gerados de um arquivo que falhou no meio são descartados
+                validos = [i for i, doc in enumerate(documentos) if doc.metadata.get("caminho") not in com_erro]
+                if validos:
+                    self.escrever_lote([documentos[i] for i in validos], [vetores[i] for i in validos])
+
+        if self.indice_imagens is not None:
+            self.indice_imagens.remover(caminhos)
+            self._indexar_imagens(existentes)
+        self.logger.info(
+            f"Atualização incremental: {len(processados)} arquivos reindexados, "
+            f"{len(removidos)} removidos ({resultado['vetores']} vetores)"
+        )
+        return resultado
+
+    def _remover_chunks(self, caminhos: set) -> int:
+        """Remove do índice os chunks dos arquivos informados (chamar sob o lock)"""
+        if self.deduplicador is not None and caminhos:
+            self.deduplicador.remover_caminhos(caminhos)
+            self._sincronizar_duplicatas()
+        if self.particionado is not None:
+            removidos = self.particionado.remover(caminhos) if self.particionado.iniciado and caminhos else 0
+            if removidos:
+                self.versao_indice += 1
+            return removidos
+        if self.banco_vetorial is None or not caminhos:
+            return 0
+        ids = [id_ for id_, doc in self.banco_vetorial.docstore._dict.items()
+               if doc.metadata.get("caminho") in caminhos]
+        if ids:
+            self.banco_vetorial.delete(ids)
+            self.versao_indice += 1
+        return len(ids)
+
+    def _indexar_imagens(self, fontes: Union[str, List[str]]):
+        """Adiciona ao índice CLIP as imagens encontradas nas fontes"""
+        if self.indice_imagens is None:
+            return
         try:
-            from pypdf import PdfReader
-        except ImportError:
-            self.logger.error("PyPDF não instalado. Execute: pip install pypdf")
-            return documentos
-
-        for arquivo in os.listdir(pasta_pdfs):
-            if arquivo.endswith('.pdf'):
-                try:
-                    caminho = os.path.join(pasta_pdfs, arquivo)
-                    reader = PdfReader(caminho)
-                    texto_total = "\n".join([page.extract_text() or "" for page in reader.pages])
-                    
-                    # Divide o texto em chunks
-                    textos = self.text_splitter.split_text(texto_total)
-                    for i, texto in enumerate(textos):
-                        doc = Document(
-                            page_content=texto,
-                            metadata={
-                                "tipo": "pdf",
-                                "fonte": arquivo,
-                                "paginas": len(reader.pages),
-                                "chunk": i+1
-                            }
-                        )
-                        documentos.append(doc)
-                        
-                except Exception as e:
-                    self.logger.error(f"Erro no PDF {arquivo}: {str(e)}")
-        
-        return documentos
+            imagens = [c for c in self.pipeline.descobrir(fontes) if self.registro.tipo(c) == "imagem"]
+            if imagens:
+                self.indice_imagens.indexar(imagens)
+        except Exception as e:
+            self.logger.error(f"Erro ao indexar imagens: {str(e)}")
+
+    def dividir_documentos(self, unidades: Iterable[Document]) -> Iterator[Document]:
+        """Divide as unidades extraídas de um arquivo em chunks com metadados
+
+        Unidades com metadata['indivisivel'] (ex.: quadros-chave de vídeo) já
+        são chunks prontos: mantêm as quebras de linha e nunca são juntadas
+        ao texto vizinho. Só as que passam do limite do divisor são
+        cortadas, entre linhas, em vários chunks com os mesmos metadados.
+        """
+        for indivisivel, grupo in itertools.groupby(unidades, key=lambda u: bool(u.metadata.get("indivisivel"))):
+            if indivisivel:
+                for unidade in grupo:
+                    yield from self._dividir_indivisivel(unidade)
+            elif isinstance(self.text_splitter, DivisorTokens):
+                yield from self.text_splitter.dividir_documentos(grupo)
+            else:
+                yield from self._dividir_por_caracteres(grupo)
+
+    def _dividir_indivisivel(self, unidade: Document) -> Iterator[Document]:
+        """Corta uma unidade indivisível maior que o limite do divisor em blocos de linhas inteiras
+
+        Sem o corte, o modelo de embeddings truncaria o fim do texto (ex.: a
+        tela de um vídeo cheia de código) e ele ficaria fora do vetor.
+        """
+        if isinstance(self.text_splitter, DivisorTokens):
+            limite, medir = self.text_splitter.max_tokens, self.text_splitter.contar_tokens
+        else:
+            limite, medir = self.config["chunk_size"], lambda textos: [len(t) for t in textos]
+        texto = unidade.page_content
+        if medir([texto])[0] <= limite:
+            yield unidade
+            return
+
+        blocos, atual, tamanho = [], [], 0
+        linhas = texto.split("\n")
+        # A quebra de linha que junta as linhas de um bloco conta como um caractere/token
+        for linha, tamanho_linha in zip(linhas, medir(linhas)):
+            if tamanho_linha > limite:
+                # Linha sozinha acima do limite: só ela passa pelo divisor
+                if atual:
+                    blocos.append("\n".join(atual))
+                blocos.extend(self.text_splitter.split_text(linha))
+                atual, tamanho = [], 0
+                continue
+            if atual and tamanho + 1 + tamanho_linha > limite:
+                blocos.append("\n".join(atual))
+                atual, tamanho = [], 0
+            tamanho += tamanho_linha + (1 if atual else 0)
+            atual.append(linha)
+        if atual:
+            blocos.append("\n".join(atual))
+
+        blocos = [bloco for bloco in blocos if bloco.strip()]
+        for i, bloco in enumerate(blocos):
+            yield Document(page_content=bloco, metadata={**unidade.metadata, "chunk": i+1})
+
+    def _dividir_por_caracteres(self, unidades: Iterable[Document]) -> Iterator[Document]:
+        for unidade in unidades:
+            for i, texto in enumerate(self.text_splitter.split_text(unidade.page_content)):
+                yield Document(page_content=texto, metadata={**unidade.metadata, "chunk": i+1})
 
     def criar_indice(self, documentos: List[Document]) -> bool:
         """Cria ou atualiza o índice vetorial"""
@@ -198,43 +412,289 @@ class Indexador:
             return False
             
         try:
-            if self.banco_vetorial is None:
-                self.banco_vetorial = FAISS.from_documents(
-                    documentos, 
-                    self.embeddings
-                )
-                self.logger.info(f"Novo índice criado com {len(documentos)} documentos")
-            else:
-                self.banco_vetorial.add_documents(documentos)
-                self.logger.info(f"Índice atualizado com {len(documentos)} novos documentos")
-                
-            return True
-            
+            resultado = self.pipeline.indexar(documentos)
+            return resultado["falha"] is None
         except Exception as e:
             self.logger.error(f"Erro na indexação: {str(e)}")
             return False
 
-    def buscar_semelhantes(self, consulta: str, k: int = 3, filtro: Dict = None) -> List[Document]:
-        """Busca documentos similares com filtros opcionais"""
+    def gerar_embeddings(self, textos: List[str]) -> List[List[float]]:
+        """Embeddings de documentos, no pool de processos quando o modo em massa está ativo"""
+        if self.embedding_paralelo is not None:
+            return self.embedding_paralelo.embed_documents(textos)
+        return self.embeddings.embed_documents(textos)
+
+    @contextmanager
+    def embedding_em_lote(self, workers: Optional[int] = None):
+        """Ativa o cálculo de embeddings em vários processos durante o bloco
+
+        Args:
+            workers: Número de processos (padrão: config 'workers_embedding')
+        """
+        workers = workers if workers is not None else self.config["workers_embedding"]
+        if workers <= 1 or self.embedding_paralelo is not None:
+            yield
+            return
+
+        lote_original = self.pipeline.tamanho_lote
+        self.embedding_paralelo = EmbeddingParalelo(
+            self.config["model_name"],
+            workers=workers,
+            threads_por_worker=self.config["threads_por_worker_embedding"],
+            device=self.config["device"],
+            tamanho_lote=32,
+            tamanho_janela=self.config["janela_embedding"]
+        )
+        # Cada lote do pipeline vira uma janela inteira distribuída entre os processos
+        self.pipeline.tamanho_lote = self.config["janela_embedding"]
+        try:
+            with self.embedding_paralelo:
+                yield
+        finally:
+            self.pipeline.tamanho_lote = lote_original
+            self.embedding_paralelo = None
+
+    def reconstruir_indice(self, workers: Optional[int] = None) -> bool:
+        """Recalcula todos os embeddings do índice atual (ex.: após trocar de modelo)
+
+        O índice fica indisponível para buscas durante a reconstrução. No
+        índice particionado as buscas continuam nas partições atuais até a
+        troca pelas novas, e as alterações esperam o fim da reconstrução.
+        """
+        if self._particionado_ativo():
+            return self._reconstruir_particionado(workers)
         if self.banco_vetorial is None:
+            self.logger.warning("Índice não inicializado")
+            return False
+
+        with self._lock_indice:
+            itens = list(self.banco_vetorial.docstore._dict.items())
+        documentos = []
+        for id_, doc in itens:
+            doc.metadata.setdefault("id", id_)
+            documentos.append(doc)
+
+        antigo = self.banco_vetorial
+        self.banco_vetorial = None
+        try:
+            with self.embedding_em_lote(workers):
+                resultado = self.pipeline.indexar(documentos, deduplicar=False)
+            if resultado["falha"] is not None:
+                raise RuntimeError(resultado["falha"])
+            self.logger.info(f"Índice reconstruído com {resultado['vetores']} vetores")
+            return True
+        except Exception as e:
+            self.logger.error(f"Erro ao reconstruir índice: {str(e)}")
+            self.banco_vetorial = antigo
+            return False
+
+    def _reconstruir_particionado(self, workers: Optional[int] = None) -> bool:
+        """Recalcula os embeddings em novas partições, lendo os chunks das atuais em blocos"""
+        antigo = self.particionado
+        novo = IndiceParticionado(antigo.num_particoes, antigo.workers, antigo.timeout)
+        # Cada arquivo continua na mesma partição
+        novo.atribuicao = dict(antigo.atribuicao)
+
+        def chunks():
+            ids = antigo.ids()
+            for i in range(0, len(ids), 256):
+                for id_, doc in antigo.obter(ids[i:i + 256]):
+                    doc.metadata.setdefault("id", id_)
+                    yield doc
+
+        def escrever(documentos: List[Document], vetores: List[List[float]]):
+            novo.adicionar(documentos, vetores, [doc.metadata["id"] for doc in documentos])
+
+        # O lock bloqueia as alterações, não as buscas (que não o usam no índice particionado)
+        with self._lock_indice:
+            try:
+                novo.iniciar()
+                with self.embedding_em_lote(workers):
+                    resultado = self.pipeline.indexar(chunks(), deduplicar=False, escrever=escrever)
+                if resultado["falha"] is not None:
+                    raise RuntimeError(resultado["falha"])
+            except Exception as e:
+                self.logger.error(f"Erro ao reconstruir índice: {str(e)}")
+                novo.encerrar()
+                return False
+            self.particionado = novo
+            self.versao_indice += 1
+        antigo.encerrar()
+        self.logger.info(f"Índice particionado reconstruído com {resultado['vetores']} vetores")
+        return True
+
+    def escrever_lote(self, documentos: List[Document], vetores: List[List[float]]):
+        """Grava no índice um lote de chunks com embeddings já calculados"""
+        textos = [doc.page_content for doc in documentos]
+        metadados = [doc.metadata for doc in documentos]
+        ids = [doc.metadata["id"] for doc in documentos] if all("id" in doc.metadata for doc in documentos) else None
+
+        with self._lock_indice:
+            if self.particionado is not None:
+                if not self.particionado.iniciado:
+                    self.particionado.iniciar()
+                self.particionado.adicionar(documentos, vetores, ids)
+            elif self.banco_vetorial is None:
+                from langchain_community.vectorstores import FAISS
+                self.banco_vetorial = FAISS.from_embeddings(
+                    text_embeddings=list(zip(textos, vetores)),
+                    embedding=self.embeddings,
+                    metadatas=metadados,
+                    ids=ids
+                )
+                self.logger.info(f"Novo índice criado com {len(documentos)} documentos")
+            else:
+                self.banco_vetorial.add_embeddings(
+                    text_embeddings=list(zip(textos, vetores)),
+                    metadatas=metadados,
+                    ids=ids
+                )
+                self.logger.debug(f"Índice atualizado com {len(documentos)} novos documentos")
+            self.versao_indice += 1
+
+    def _sincronizar_duplicatas(self):
+        """Atualiza 'fontes' dos chunks já indexados que receberam novas duplicatas"""
+        with self._lock_indice:
+            if self._particionado_ativo():
+                alterados = {id_: self.deduplicador.metadados(id_) for id_ in set(self.deduplicador.alterados)}
+                if alterados:
+                    self.particionado.atualizar_metadados(alterados)
+                return
+            if self.banco_vetorial is None:
+                return
+            for id_ in self.deduplicador.alterados:
+                doc = self.banco_vetorial.docstore.search(id_)
+                if isinstance(doc, Document):
+                    doc.metadata.update(self.deduplicador.metadados(id_))
+
+    def buscar_semelhantes(self, consulta: str, k: int = 3, filtro: Dict = None,
+                           colecao: Optional[str] = None) -> List[Document]:
+        """Busca documentos similares com filtros opcionais
+
+        Args:
+            colecao: Coleção (curso/módulo) a consultar; None usa o índice principal
+        """
+        if colecao is None and self.banco_vetorial is None and not self._particionado_ativo():
             self.logger.warning("Índice não inicializado")
             return []
             
         try:
-            return self.banco_vetorial.similarity_search(
-                query=consulta,
-                k=k,
-                filter=filtro
-            )
+            # O embedding da consulta é calculado fora do lock do índice
+            vetor = self.embeddings.embed_query(consulta)
         except Exception as e:
             self.logger.error(f"Erro na busca: {str(e)}")
             return []
+        return self.buscar_por_vetor(vetor, k=k, filtro=filtro, colecao=colecao)
+
+    def buscar_por_vetor(self, vetor: List[float], k: int = 3, filtro: Dict = None,
+                         colecao: Optional[str] = None) -> List[Document]:
+        """Busca com o embedding da consulta já calculado
+
+        Os documentos devolvidos são cópias com a similaridade de cosseno
+        à consulta em metadata['similaridade'].
+        """
+        if colecao is not None:
+            try:
+                return self.colecoes.buscar_por_vetor(colecao, vetor, k=k, filtro=filtro)
+            except Exception as e:
+                self.logger.error(f"Erro na busca da coleção {colecao}: {str(e)}")
+                return []
+        try:
+            if self._particionado_ativo():
+                # Sem o lock: os processos atendem buscas simultâneas, e cada um
+                # executa os pedidos na ordem de chegada
+                return self.particionado.buscar_por_vetor(vetor, k=k, filtro=filtro)
+            if self.banco_vetorial is None:
+                return []
+            with self._lock_indice:
+                resultados = self.banco_vetorial.similarity_search_with_score_by_vector(
+                    vetor,
+                    k=k,
+                    filter=filtro
+                )
+            # Vetores normalizados: distância L2² = 2 - 2·cosseno
+            return [
+                Document(page_content=doc.page_content,
+                         metadata={**doc.metadata, "similaridade": round(1 - float(distancia) / 2, 4)})
+                for doc, distancia in resultados
+            ]
+        except Exception as e:
+            self.logger.error(f"Erro na busca: {str(e)}")
+            return []
+
+    def _particionado_ativo(self) -> bool:
+        return self.particionado is not None and self.particionado.iniciado
+
+    def hashes_conteudo(self) -> frozenset:
+        """Hashes do conteúdo dos chunks indexados (recalculados só quando o índice muda)"""
+        with self._lock_indice:
+            versao, hashes = self._hashes_conteudo
+            if versao != self.versao_indice:
+                if self._particionado_ativo():
+                    hashes = frozenset(self.particionado.hashes())
+                else:
+                    documentos = self.banco_vetorial.docstore._dict.values() if self.banco_vetorial else ()
+                    hashes = frozenset(hash_conteudo(doc.page_content) for doc in documentos)
+                self._hashes_conteudo = (self.versao_indice, hashes)
+            return hashes
+
+    def documentos(self, hashes: Optional[Iterable[str]] = None, bloco: int = 256) -> Iterator[Document]:
+        """Chunks do índice principal, opcionalmente só os com esses hashes de conteúdo
+
+        No índice particionado os processos filtram pelos hashes e os chunks
+        chegam em cópias, `bloco` por vez, sem trazer o corpus de uma vez.
+        """
+        hashes = set(hashes) if hashes is not None else None
+        with self._lock_indice:
+            if self._particionado_ativo():
+                ids = self.particionado.ids(hashes)
+                documentos = None
+            else:
+                documentos = list(self.banco_vetorial.docstore._dict.values()) if self.banco_vetorial else []
+        if documentos is not None:
+            yield from (doc for doc in documentos if hashes is None or hash_conteudo(doc.page_content) in hashes)
+            return
+        for i in range(0, len(ids), bloco):
+            with self._lock_indice:
+                if not self._particionado_ativo():
+                    return
+                pares = self.particionado.obter(ids[i:i + bloco])
+            yield from (doc for _, doc in pares)
+
+    def caminhos_indexados(self) -> set:
+        """Arquivos com chunks no índice principal"""
+        with self._lock_indice:
+            if self._particionado_ativo():
+                return set(self.particionado.atribuicao)
+            if self.banco_vetorial is None:
+                return set()
+            return {doc.metadata.get("caminho") for doc in self.banco_vetorial.docstore._dict.values()} - {None}
+
+    def assinatura_indice(self) -> str:
+        """Versão do índice pelo conteúdo: igual entre execuções enquanto os materiais não mudam"""
+        return hashlib.sha1("".join(sorted(self.hashes_conteudo())).encode()).hexdigest()[:16]
+
+    def buscar_imagens(self, consulta: str, k: int = 2) -> List[Document]:
+        """Busca imagens pelo texto da consulta no índice CLIP"""
+        if self.indice_imagens is None:
+            return []
+        try:
+            return self.indice_imagens.buscar(consulta, k=k)
+        except Exception as e:
+            self.logger.error(f"Erro na busca de imagens: {str(e)}")
+            return []
 
     def salvar_indice(self, caminho: str) -> bool:
         """Salva o índice em disco"""
         try:
-            if self.banco_vetorial:
-                self.banco_vetorial.save_local(caminho)
+            if self.banco_vetorial or self._particionado_ativo():
+                with self._lock_indice:
+                    if self._particionado_ativo():
+                        self.particionado.salvar(caminho)
+                    else:
+                        self.banco_vetorial.save_local(caminho)
+                if self.indice_imagens is not None:
+                    self.indice_imagens.salvar(os.path.join(caminho, "imagens"))
                 self.logger.info(f"Índice salvo em {caminho}")
                 return True
             return False
@@ -243,15 +703,42 @@ class Indexador:
             return False
 
     def carregar_indice(self, caminho: str) -> bool:
-        """Carrega um índice existente"""
+        """Carrega um índice existente (único ou particionado)"""
         try:
+            if os.path.isfile(os.path.join(caminho, ARQUIVO_PARTICOES)):
+                return self._carregar_particionado(caminho)
+
+            from langchain_community.vectorstores import FAISS
+
             self.banco_vetorial = FAISS.load_local(
                 folder_path=caminho,
                 embeddings=self.embeddings,
                 allow_dangerous_deserialization=True
             )
+            self.versao_indice += 1
             self.logger.info(f"Índice carregado de {caminho}")
+            if self.indice_imagens is not None:
+                self.indice_imagens.carregar(os.path.join(caminho, "imagens"))
+            if self.deduplicador is not None:
+                for id_, doc in self.banco_vetorial.docstore._dict.items():
+                    self.deduplicador.registrar_existente(id_, doc)
             return True
         except Exception as e:
             self.logger.error(f"Erro ao carregar índice: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+    def _carregar_particionado(self, caminho: str) -> bool:
+        """Inicia os processos das partições salvas (o número de partições vem do arquivo salvo)"""
+        with self._lock_indice:
+            if self.particionado is None:
+                self.particionado = IndiceParticionado(workers=self.config["workers_particoes"])
+            self.particionado.iniciar(caminho)
+            self.versao_indice += 1
+        self.logger.info(f"Índice particionado carregado de {caminho} ({self.particionado.contar()} chunks)")
+        if self.deduplicador is not None:
+            # As assinaturas são calculadas nos processos; o texto dos chunks não sai deles
+            for id_, assinatura, metadados in self.particionado.assinaturas(self.deduplicador.parametros()):
+                self.deduplicador.registrar_assinatura(id_, assinatura, metadados)
+        if self.indice_imagens is not None:
+            self.indice_imagens.carregar(os.path.join(caminho, "imagens"))
+        return True
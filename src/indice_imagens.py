@@ -0,0 +1,170 @@
+import os
+import logging
+import threading
+from typing import Iterable, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+class _EmbeddingsTextoClip(Embeddings):
+    """Codificador de texto do CLIP multilíngue, no formato esperado pelo FAISS do LangChain"""
+
+    def __init__(self, indice: "IndiceImagens"):
+        self.indice = indice
+
+    def embed_documents(self, textos: List[str]) -> List[List[float]]:
+        return self.indice.codificar_textos(textos)
+
+    def embed_query(self, texto: str) -> List[float]:
+        return self.indice.codificar_textos([texto])[0]
+
+
+class IndiceImagens:
+    """Índice vetorial de imagens com embeddings CLIP.
+
+    Cada imagem passa uma única vez pelo codificador visual do CLIP (em
+    lotes) e a busca usa o codificador de texto multilíngue treinado no
+    mesmo espaço vetorial, então uma pergunta em português encontra
+    diagramas e figuras sem depender da legenda gerada pelo BLIP.
+    Os modelos só são carregados quando há imagens para indexar ou buscar.
+    """
+
+    def __init__(self, modelo_imagem: str = "clip-ViT-B-32",
+                 modelo_texto: str = "sentence-transformers/clip-ViT-B-32-multilingual-v1",
+                 device: str = "cpu", tamanho_lote: int = 16):
+        """
+        Args:
+            modelo_imagem: Modelo CLIP (SentenceTransformer) para as imagens
+            modelo_texto: Codificador de texto alinhado ao espaço do modelo de imagens
+            device: Dispositivo para os dois modelos
+            tamanho_lote: Imagens por passada do codificador
+        """
+        self.logger = logging.getLogger(__name__)
+        self.nome_modelo_imagem = modelo_imagem
+        self.nome_modelo_texto = modelo_texto
+        self.device = device
+        self.tamanho_lote = tamanho_lote
+        self.banco_vetorial = None
+        self._modelo_imagem = None
+        self._modelo_texto = None
+        self._caminhos = set()
+        self._lock = threading.RLock()
+
+    def _carregar(self, nome: str):
+        from sentence_transformers import SentenceTransformer
+        modelo = SentenceTransformer(nome, device=self.device)
+        self.logger.info(f"Modelo CLIP {nome} carregado")
+        return modelo
+
+    def codificar_textos(self, textos: List[str]) -> List[List[float]]:
+        with self._lock:
+            if self._modelo_texto is None:
+                self._modelo_texto = self._carregar(self.nome_modelo_texto)
+        vetores = self._modelo_texto.encode(textos, normalize_embeddings=True, convert_to_numpy=True,
+                                            show_progress_bar=False)
+        return vetores.tolist()
+
+    def codificar_imagens(self, caminhos: List[str]) -> List[Optional[List[float]]]:
+        """Embeddings de um lote de imagens; None para as que não puderam ser abertas"""
+        from PIL import Image
+
+        with self._lock:
+            if self._modelo_imagem is None:
+                self._modelo_imagem = self._carregar(self.nome_modelo_imagem)
+
+        imagens, validas = [], []
+        for i, caminho in enumerate(caminhos):
+            try:
+                with Image.open(caminho) as img:
+                    imagens.append(img.convert("RGB"))
+                validas.append(i)
+            except Exception as e:
+                self.logger.error(f"Erro ao abrir imagem {caminho}: {str(e)}")
+
+        vetores: List[Optional[List[float]]] = [None] * len(caminhos)
+        if imagens:
+            codificados = self._modelo_imagem.encode(imagens, batch_size=len(imagens), normalize_embeddings=True,
+                                                     convert_to_numpy=True, show_progress_bar=False)
+            for i, vetor in zip(validas, codificados):
+                vetores[i] = vetor.tolist()
+        return vetores
+
+    def indexar(self, caminhos: Iterable[str]) -> int:
+        """Indexa as imagens ainda não presentes no índice; retorna quantas foram adicionadas"""
+        novas = [c for c in dict.fromkeys(caminhos) if c not in self._caminhos]
+        adicionadas = 0
+        for i in range(0, len(novas), self.tamanho_lote):
+            lote = novas[i:i + self.tamanho_lote]
+            itens = [(c, v) for c, v in zip(lote, self.codificar_imagens(lote)) if v is not None]
+            if itens:
+                self._escrever(itens)
+                adicionadas += len(itens)
+        if adicionadas:
+            self.logger.info(f"{adicionadas} imagens adicionadas ao índice CLIP")
+        return adicionadas
+
+    def _escrever(self, itens: List):
+        textos = [f"Imagem: {os.path.basename(c)}" for c, _ in itens]
+        metadados = [{"tipo": "imagem", "fonte": os.path.basename(c), "caminho": c} for c, _ in itens]
+        pares = list(zip(textos, [v for _, v in itens]))
+        with self._lock:
+            if self.banco_vetorial is None:
+                from langchain_community.vectorstores import FAISS
+                self.banco_vetorial = FAISS.from_embeddings(
+                    text_embeddings=pares, embedding=_EmbeddingsTextoClip(self), metadatas=metadados
+                )
+            else:
+                self.banco_vetorial.add_embeddings(text_embeddings=pares, metadatas=metadados)
+            self._caminhos.update(c for c, _ in itens)
+
+    def remover(self, caminhos: Iterable[str]) -> int:
+        """Remove as imagens dos caminhos informados; retorna quantas foram removidas"""
+        caminhos = set(caminhos)
+        with self._lock:
+            if self.banco_vetorial is None or not caminhos & self._caminhos:
+                return 0
+            ids = [id_ for id_, doc in self.banco_vetorial.docstore._dict.items()
+                   if doc.metadata.get("caminho") in caminhos]
+            if ids:
+                self.banco_vetorial.delete(ids)
+            self._caminhos -= caminhos
+        return len(ids)
+
+    def buscar(self, consulta: str, k: int = 2) -> List[Document]:
+        """Imagens mais próximas do texto da consulta"""
+        if self.banco_vetorial is None:
+            return []
+        vetor = self.codificar_textos([consulta])[0]
+        with self._lock:
+            resultados = self.banco_vetorial.similarity_search_with_score_by_vector(vetor, k=k)
+        documentos = []
+        for doc, distancia in resultados:
+            # Vetores normalizados: distância L2² = 2 - 2·cosseno
+            documentos.append(Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "similaridade": round(1 - float(distancia) / 2, 4)}
+            ))
+        return documentos
+
+    def salvar(self, caminho: str) -> bool:
+        with self._lock:
+            if self.banco_vetorial is None:
+                return False
+            self.banco_vetorial.save_local(caminho)
+        return True
+
+    def carregar(self, caminho: str) -> bool:
+        if not os.path.isdir(caminho):
+            return False
+        from langchain_community.vectorstores import FAISS
+
+        with self._lock:
+            self.banco_vetorial = FAISS.load_local(
+                folder_path=caminho,
+                embeddings=_EmbeddingsTextoClip(self),
+                allow_dangerous_deserialization=True
+            )
+            self._caminhos = {doc.metadata["caminho"] for doc in self.banco_vetorial.docstore._dict.values()}
+        self.logger.info(f"Índice de imagens carregado de {caminho} ({len(self._caminhos)} imagens)")
+        return True
@@ -0,0 +1,295 @@
+import heapq
+import itertools
+import json
+import logging
+import multiprocessing as mp
+import os
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+ARQUIVO_PARTICOES = "particoes.json"
+
+
+def _pasta_particao(caminho: str, particao: int) -> str:
+    return os.path.join(caminho, f"particao_{particao:03d}")
+
+
+def _trabalhar(particoes: List[int], caminho: Optional[str], pedidos, respostas):
+    """Processo responsável por algumas partições: carrega, busca, altera e salva"""
+    from langchain_community.vectorstores import FAISS
+    from .deduplicador import DeduplicadorMinHash, metadados_representante
+    from .respostas_pregeradas import hash_conteudo
+
+    indices = {}
+    for particao in particoes:
+        pasta = _pasta_particao(caminho, particao) if caminho else None
+        if pasta and os.path.isfile(os.path.join(pasta, "index.faiss")):
+            indices[particao] = FAISS.load_local(folder_path=pasta, embeddings=None,
+                                                 allow_dangerous_deserialization=True)
+
+    while True:
+        pedido = pedidos.get()
+        if pedido is None:
+            return
+        id_, operacao, args = pedido
+        try:
+            if operacao == "buscar":
+                vetor, k, filtro = args
+                resultado = [
+                    (float(distancia), particao, doc)
+                    for particao, indice in indices.items()
+                    for doc, distancia in indice.similarity_search_with_score_by_vector(vetor, k=k, filter=filtro)
+                ]
+            elif operacao == "adicionar":
+                particao, pares, metadados, ids = args
+                if particao in indices:
+                    indices[particao].add_embeddings(text_embeddings=pares, metadatas=metadados, ids=ids)
+                else:
+                    indices[particao] = FAISS.from_embeddings(text_embeddings=pares, embedding=None,
+                                                              metadatas=metadados, ids=ids)
+                resultado = len(pares)
+            elif operacao == "remover":
+                caminhos = args
+                resultado = 0
+                for indice in indices.values():
+                    ids = [i for i, doc in indice.docstore._dict.items() if doc.metadata.get("caminho") in caminhos]
+                    if ids:
+                        indice.delete(ids)
+                        resultado += len(ids)
+            elif operacao == "salvar":
+                for particao, indice in indices.items():
+                    indice.save_local(_pasta_particao(args, particao))
+                resultado = len(indices)
+            elif operacao == "atualizar_metadados":
+                resultado = 0
+                for indice in indices.values():
+                    for id_chunk, metadados in args.items():
+                        doc = indice.docstore._dict.get(id_chunk)
+                        if doc is not None:
+                            doc.metadata.update(metadados)
+                            resultado += 1
+            elif operacao == "hashes":
+                resultado = {hash_conteudo(doc.page_content)
+                             for indice in indices.values() for doc in indice.docstore._dict.values()}
+            elif operacao == "ids":
+                hashes = args
+                resultado = [id_chunk for indice in indices.values()
+                             for id_chunk, doc in indice.docstore._dict.items()
+                             if hashes is None or hash_conteudo(doc.page_content) in hashes]
+            elif operacao == "obter":
+                resultado = [(id_chunk, indice.docstore._dict[id_chunk])
+                             for indice in indices.values() for id_chunk in args if id_chunk in indice.docstore._dict]
+            elif operacao == "assinaturas":
+                # Só a assinatura MinHash e as fontes de cada chunk saem do processo, não o texto
+                deduplicador = DeduplicadorMinHash(**args)
+                resultado = [(id_chunk, deduplicador.assinatura(doc.page_content),
+                              metadados_representante(doc.metadata))
+                             for indice in indices.values() for id_chunk, doc in indice.docstore._dict.items()]
+            elif operacao == "contar":
+                resultado = sum(indice.index.ntotal for indice in indices.values())
+            else:
+                raise ValueError(f"Operação desconhecida: {operacao}")
+            respostas.put((id_, resultado, None))
+        except Exception as e:
+            respostas.put((id_, None, f"{type(e).__name__}: {e}"))
+
+
+class _Coleta:
+    """Respostas de um pedido enviado a vários processos"""
+
+    def __init__(self, esperadas: int):
+        self.esperadas = esperadas
+        self.resultados = []
+        self.erros = []
+        self.pronta = threading.Event()
+
+    def receber(self, resultado, erro):
+        if erro is not None:
+            self.erros.append(erro)
+        else:
+            self.resultados.append(resultado)
+        if len(self.resultados) + len(self.erros) >= self.esperadas:
+            self.pronta.set()
+
+
+class IndiceParticionado:
+    """Índice vetorial dividido em N partições, buscadas em paralelo por processos.
+
+    Os chunks de um mesmo arquivo ficam sempre na mesma partição (escolhida
+    pelo hash do caminho), então reindexar ou remover um arquivo altera
+    uma só partição. Cada processo de trabalho mantém suas partições em
+    memória; uma busca é enviada a todos, cada um devolve o top-k local
+    com as distâncias, e o top-k global é a junção ordenada por distância
+    (os vetores são normalizados, então as distâncias são comparáveis
+    entre partições). A atribuição de arquivos a partições é gravada em
+    `particoes.json` junto com as partições ao salvar.
+    """
+
+    def __init__(self, num_particoes: int = 4, workers: int = 0, timeout: float = 60.0):
+        """
+        Args:
+            num_particoes: Número de partições de um índice novo
+            workers: Processos de busca (0: um por partição)
+            timeout: Prazo de cada pedido aos processos, em segundos
+        """
+        self.logger = logging.getLogger(__name__)
+        self.num_particoes = max(1, num_particoes)
+        self.workers = workers
+        self.timeout = timeout
+        self.atribuicao: Dict[str, int] = {}
+        self._processos = []
+        self._filas = []
+        self._respostas = None
+        self._pendentes: Dict[int, _Coleta] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._receptor = None
+
+    @property
+    def iniciado(self) -> bool:
+        return bool(self._processos)
+
+    def iniciar(self, caminho: Optional[str] = None):
+        """Inicia os processos, carregando as partições salvas em `caminho` (se houver)"""
+        self.encerrar()
+        if caminho and os.path.isfile(os.path.join(caminho, ARQUIVO_PARTICOES)):
+            with open(os.path.join(caminho, ARQUIVO_PARTICOES), encoding="utf-8") as f:
+                dados = json.load(f)
+            self.num_particoes = dados["num_particoes"]
+            self.atribuicao = dados["arquivos"]
+
+        workers = min(self.workers or self.num_particoes, self.num_particoes)
+        contexto = mp.get_context("spawn")
+        self._respostas = contexto.Queue()
+        for w in range(workers):
+            particoes = list(range(w, self.num_particoes, workers))
+            fila = contexto.Queue()
+            processo = contexto.Process(target=_trabalhar, args=(particoes, caminho, fila, self._respostas),
+                                        name=f"particoes-{w}", daemon=True)
+            processo.start()
+            self._filas.append(fila)
+            self._processos.append(processo)
+        self._receptor = threading.Thread(target=self._receber, name="particoes-respostas", daemon=True)
+        self._receptor.start()
+        self.logger.info(f"Índice particionado: {self.num_particoes} partições em {workers} processos")
+
+    def encerrar(self):
+        if not self._processos:
+            return
+        for fila in self._filas:
+            fila.put(None)
+        for processo in self._processos:
+            processo.join(timeout=10)
+        self._respostas.put(None)
+        self._receptor.join()
+        self._processos, self._filas = [], []
+
+    def particao(self, caminho: str) -> int:
+        """Partição do arquivo: a registrada, ou a do hash do caminho para arquivos novos"""
+        if caminho not in self.atribuicao:
+            self.atribuicao[caminho] = zlib.crc32(caminho.encode("utf-8")) % self.num_particoes
+        return self.atribuicao[caminho]
+
+    def adicionar(self, documentos: List[Document], vetores: List[List[float]], ids: Optional[List[str]] = None):
+        grupos: Dict[int, list] = {}
+        for i, (doc, vetor) in enumerate(zip(documentos, vetores)):
+            grupos.setdefault(self.particao(doc.metadata.get("caminho", "")), []).append(i)
+        coletas = []
+        for particao, indices in grupos.items():
+            args = (
+                particao,
+                [(documentos[i].page_content, vetores[i]) for i in indices],
+                [documentos[i].metadata for i in indices],
+                [ids[i] for i in indices] if ids else None
+            )
+            coletas.append(self._enviar("adicionar", args, [particao % len(self._filas)]))
+        for coleta in coletas:
+            self._aguardar(coleta)
+
+    def buscar_por_vetor(self, vetor: List[float], k: int = 3, filtro: Dict = None) -> List[Document]:
+        """Top-k global: cada processo busca nas suas partições e os resultados são intercalados"""
+        resultados = self._aguardar(self._enviar("buscar", (vetor, k, filtro)))
+        melhores = heapq.nsmallest(k, itertools.chain.from_iterable(resultados), key=lambda r: r[0])
+        # Os documentos já chegam copiados do processo; a similaridade entra nos metadados
+        for distancia, _, doc in melhores:
+            doc.metadata["similaridade"] = round(1 - distancia / 2, 4)
+        return [doc for _, _, doc in melhores]
+
+    def remover(self, caminhos: Iterable[str]) -> int:
+        caminhos = set(caminhos)
+        removidos = sum(self._aguardar(self._enviar("remover", caminhos)))
+        for caminho in caminhos:
+            self.atribuicao.pop(caminho, None)
+        return removidos
+
+    def atualizar_metadados(self, metadados: Dict[str, Dict]) -> int:
+        """Atualiza os metadados dos chunks pelo id ({id: metadados}); retorna quantos foram encontrados"""
+        return sum(self._aguardar(self._enviar("atualizar_metadados", metadados)))
+
+    def hashes(self) -> Set[str]:
+        """Hashes do conteúdo de todos os chunks (calculados nos processos)"""
+        return set().union(*self._aguardar(self._enviar("hashes", None)))
+
+    def ids(self, hashes: Optional[Set[str]] = None) -> List[str]:
+        """Ids dos chunks, opcionalmente só dos que têm esses hashes de conteúdo"""
+        return list(itertools.chain.from_iterable(self._aguardar(self._enviar("ids", hashes))))
+
+    def obter(self, ids: Iterable[str]) -> List[Tuple[str, Document]]:
+        """Cópias dos chunks com esses ids, como (id, documento)"""
+        return list(itertools.chain.from_iterable(self._aguardar(self._enviar("obter", list(ids)))))
+
+    def assinaturas(self, parametros: Dict) -> List[Tuple[str, np.ndarray, Dict]]:
+        """Assinatura MinHash e metadados de fontes de cada chunk, como (id, assinatura, metadados)
+
+        Args:
+            parametros: DeduplicadorMinHash.parametros() do deduplicador que vai recebê-las
+        """
+        return list(itertools.chain.from_iterable(self._aguardar(self._enviar("assinaturas", parametros))))
+
+    def contar(self) -> int:
+        return sum(self._aguardar(self._enviar("contar", None)))
+
+    def salvar(self, caminho: str):
+        os.makedirs(caminho, exist_ok=True)
+        self._aguardar(self._enviar("salvar", caminho))
+        temporario = os.path.join(caminho, ARQUIVO_PARTICOES + ".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"num_particoes": self.num_particoes, "arquivos": self.atribuicao}, f)
+        os.replace(temporario, os.path.join(caminho, ARQUIVO_PARTICOES))
+
+    def _enviar(self, operacao: str, args, destinos: Optional[List[int]] = None) -> _Coleta:
+        if not self._processos:
+            raise RuntimeError("Índice particionado não iniciado")
+        destinos = range(len(self._filas)) if destinos is None else destinos
+        coleta = _Coleta(len(destinos))
+        with self._lock:
+            coleta.id = next(self._ids)
+            self._pendentes[coleta.id] = coleta
+        for destino in destinos:
+            self._filas[destino].put((coleta.id, operacao, args))
+        return coleta
+
+    def _aguardar(self, coleta: _Coleta) -> list:
+        pronta = coleta.pronta.wait(self.timeout)
+        with self._lock:
+            self._pendentes.pop(coleta.id, None)
+        if not pronta:
+            raise TimeoutError("Processos do índice particionado não responderam")
+        if coleta.erros:
+            raise RuntimeError("; ".join(coleta.erros))
+        return coleta.resultados
+
+    def _receber(self):
+        while True:
+            resposta = self._respostas.get()
+            if resposta is None:
+                return
+            id_, resultado, erro = resposta
+            with self._lock:
+                coleta = self._pendentes.get(id_)
+            if coleta is not None:
+                coleta.receber(resultado, erro)
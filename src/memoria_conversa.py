@@ -0,0 +1,186 @@
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+PROMPT_RESUMO = """Resuma a conversa entre um aluno e um tutor em no máximo {max_palavras} palavras,
+preservando os temas tratados, as dúvidas do aluno e o que já foi explicado.
+
+Resumo anterior:
+{resumo}
+
+Novos trechos:
+{trechos}
+
+Resumo atualizado:"""
+
+# Perguntas curtas costumam depender da anterior ("e o segundo?", "dê um exemplo")
+_PALAVRAS_PERGUNTA_CURTA = 6
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa grosseira de tokens do LLM (~4 caracteres por token)"""
+    return len(texto) // 4 + 1
+
+
+class MemoriaConversa:
+    """Memória de conversa de tamanho fixo para o tutor.
+
+    Mantém os últimos turnos de cada conversa na íntegra, dentro de um
+    orçamento de tokens; os turnos mais antigos são incorporados a um
+    resumo contínuo. O resumo é gerado em segundo plano, depois que a
+    resposta já foi entregue, então o prompt de cada pergunta tem tamanho
+    limitado independentemente da duração da conversa.
+    """
+
+    def __init__(self, llm, max_turnos: int = 4, max_tokens: int = 600,
+                 max_palavras_resumo: int = 120, max_conversas: int = 1000):
+        """
+        Args:
+            llm: Modelo de chat usado para gerar os resumos
+            max_turnos: Turnos mantidos na íntegra
+            max_tokens: Orçamento de tokens do histórico no prompt (resumo + turnos)
+            max_palavras_resumo: Tamanho pedido ao modelo para o resumo
+            max_conversas: Conversas mantidas em memória (LRU)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.llm = llm
+        self.max_turnos = max(1, max_turnos)
+        self.max_tokens = max_tokens
+        self.max_palavras_resumo = max_palavras_resumo
+        self.max_conversas = max_conversas
+        self._conversas: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memoria-resumo")
+
+    def _conversa(self, conversa_id: str) -> Dict:
+        conversa = self._conversas.get(conversa_id)
+        if conversa is None:
+            conversa = {"turnos": deque(), "pendentes": [], "resumo": "", "resumindo": False}
+            self._conversas[conversa_id] = conversa
+            if len(self._conversas) > self.max_conversas:
+                self._conversas.popitem(last=False)
+        else:
+            self._conversas.move_to_end(conversa_id)
+        return conversa
+
+    def historico(self, conversa_id: str) -> str:
+        """Resumo e turnos recentes formatados para o prompt, dentro do orçamento"""
+        with self._lock:
+            conversa = self._conversas.get(conversa_id)
+            if conversa is None:
+                return ""
+            resumo = conversa["resumo"]
+            turnos = list(conversa["turnos"])
+
+        orcamento = self.max_tokens - (estimar_tokens(resumo) if resumo else 0)
+        trechos: List[str] = []
+        # Do mais recente para o mais antigo, enquanto couber no orçamento
+        for pergunta, resposta in reversed(turnos):
+            trecho = self._formatar_turno(pergunta, resposta)
+            custo = estimar_tokens(trecho)
+            if custo > orcamento:
+                if not trechos and orcamento > 0:
+                    # O turno mais recente entra truncado em vez de sumir
+                    trechos.append(trecho[:orcamento * 4] + "...")
+                break
+            trechos.append(trecho)
+            orcamento -= custo
+
+        partes = []
+        if resumo:
+            partes.append(f"Resumo da conversa anterior: {resumo}")
+        partes.extend(reversed(trechos))
+        return "\n".join(partes)
+
+    def consulta(self, conversa_id: str, pergunta: str) -> str:
+        """Texto para a busca: perguntas curtas levam junto a pergunta anterior"""
+        if len(pergunta.split()) > _PALAVRAS_PERGUNTA_CURTA:
+            return pergunta
+        with self._lock:
+            conversa = self._conversas.get(conversa_id)
+            if not conversa or not conversa["turnos"]:
+                return pergunta
+            anterior = conversa["turnos"][-1][0]
+        return f"{anterior} {pergunta}"
+
+    def registrar(self, conversa_id: str, pergunta: str, resposta: str):
+        """Guarda um turno; os que saem da janela são resumidos em segundo plano"""
+        with self._lock:
+            conversa = self._conversa(conversa_id)
+            conversa["turnos"].append((pergunta, resposta))
+            while len(conversa["turnos"]) > self.max_turnos:
+                conversa["pendentes"].append(conversa["turnos"].popleft())
+            if conversa["resumindo"]:
+                return
+            # Se o resumo vem falhando, não acumula turnos antigos indefinidamente
+            del conversa["pendentes"][:-self.max_turnos * 4]
+            if not conversa["pendentes"]:
+                return
+            conversa["resumindo"] = True
+        self._executor.submit(self._resumir, conversa_id, conversa)
+
+    def substituir(self, conversa_id: str, pergunta: str, anterior: str, resposta: str) -> bool:
+        """Troca a resposta de um turno já registrado (ex.: resposta provisória pela completa)
+
+        Returns:
+            False se o turno já tiver sido incorporado ao resumo
+        """
+        with self._lock:
+            conversa = self._conversas.get(conversa_id)
+            if conversa is None:
+                return False
+            for turnos in (conversa["turnos"], conversa["pendentes"]):
+                for i in range(len(turnos) - 1, -1, -1):
+                    if turnos[i] == (pergunta, anterior):
+                        turnos[i] = (pergunta, resposta)
+                        return True
+        return False
+
+    def limpar(self, conversa_id: str):
+        with self._lock:
+            self._conversas.pop(conversa_id, None)
+
+    def aguardar(self):
+        """Espera os resumos em andamento (útil ao encerrar)"""
+        self._executor.submit(lambda: None).result()
+
+    def encerrar(self):
+        self._executor.shutdown(wait=True)
+
+    def _resumir(self, conversa_id: str, conversa: Dict):
+        try:
+            while True:
+                with self._lock:
+                    pendentes = list(conversa["pendentes"])
+                    resumo = conversa["resumo"]
+                    if not pendentes:
+                        conversa["resumindo"] = False
+                        return
+                novo = self._gerar_resumo(resumo, pendentes)
+                with self._lock:
+                    conversa["resumo"] = novo
+                    del conversa["pendentes"][:len(pendentes)]
+                self.logger.debug(f"Resumo da conversa {conversa_id} atualizado ({len(pendentes)} turnos)")
+        except Exception as e:
+            # Sem resumo novo, os turnos antigos ficam pendentes para a próxima tentativa
+            self.logger.error(f"Erro ao resumir conversa {conversa_id}: {str(e)}")
+            with self._lock:
+                conversa["resumindo"] = False
+
+    def _gerar_resumo(self, resumo: str, turnos: List[Tuple[str, str]]) -> str:
+        prompt = PROMPT_RESUMO.format(
+            max_palavras=self.max_palavras_resumo,
+            resumo=resumo or "(nenhum)",
+            trechos="\n".join(self._formatar_turno(p, r) for p, r in turnos)
+        )
+        texto = self.llm.invoke(prompt).content.strip()
+        # O modelo nem sempre respeita o limite; o resumo não pode crescer sem fim
+        palavras = texto.split()
+        limite = self.max_palavras_resumo * 2
+        return " ".join(palavras[:limite]) + ("..." if len(palavras) > limite else "")
+
+    @staticmethod
+    def _formatar_turno(pergunta: str, resposta: str) -> str:
+        return f"Aluno: {pergunta}\nTutor: {resposta}"
@@ -0,0 +1,274 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Constantes do inotify (linux/inotify.h)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_MASCARA = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF
+_EVENTO = struct.Struct("iIII")
+
+ALTERADO = "alterado"
+REMOVIDO = "removido"
+# Pasta apagada ou movida para fora: todos os arquivos indexados abaixo dela saem do índice
+PASTA_REMOVIDA = "pasta_removida"
+
+
+class _Inotify:
+    """Eventos de arquivos via inotify (Linux), acessado com ctypes"""
+
+    def __init__(self):
+        nome = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(nome, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self._pastas: Dict[int, str] = {}
+
+    def observar(self, pasta: str) -> List[str]:
+        """Observa a pasta e subpastas; retorna os arquivos já existentes nas subpastas novas"""
+        arquivos = []
+        for raiz, _, nomes in os.walk(pasta):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(raiz), _MASCARA)
+            if wd < 0:
+                logging.getLogger(__name__).warning(f"Não foi possível observar {raiz}")
+                continue
+            self._pastas[wd] = raiz
+            arquivos.extend(os.path.join(raiz, nome) for nome in nomes)
+        return arquivos
+
+    def eventos(self, timeout: float) -> Iterable[Tuple[str, str]]:
+        """(caminho, ALTERADO|REMOVIDO|PASTA_REMOVIDA) lidos até o timeout; ('', '') indica eventos perdidos"""
+        prontos, _, _ = select.select([self._fd], [], [], timeout)
+        if not prontos:
+            return []
+        try:
+            dados = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        resultado = []
+        deslocamento = 0
+        while deslocamento + _EVENTO.size <= len(dados):
+            wd, mascara, _, tamanho = _EVENTO.unpack_from(dados, deslocamento)
+            deslocamento += _EVENTO.size
+            nome = dados[deslocamento:deslocamento + tamanho].rstrip(b"\0")
+            deslocamento += tamanho
+
+            if mascara & _IN_Q_OVERFLOW:
+                resultado.append(("", ""))
+                continue
+            if mascara & (_IN_IGNORED | _IN_DELETE_SELF):
+                self._pastas.pop(wd, None)
+                continue
+            pasta = self._pastas.get(wd)
+            if pasta is None or not nome:
+                continue
+            caminho = os.path.join(pasta, os.fsdecode(nome))
+
+            if mascara & _IN_ISDIR:
+                if mascara & (_IN_CREATE | _IN_MOVED_TO):
+                    # Pasta criada ou movida para dentro: passa a ser observada,
+                    # e os arquivos que ela já contém entram como alterados
+                    resultado.extend((arquivo, ALTERADO) for arquivo in self.observar(caminho))
+                elif mascara & (_IN_DELETE | _IN_MOVED_FROM):
+                    # Movida para fora, a pasta continuaria gerando eventos com o nome antigo
+                    self._esquecer(caminho)
+                    resultado.append((caminho, PASTA_REMOVIDA))
+                continue
+            if mascara & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                resultado.append((caminho, ALTERADO))
+            elif mascara & (_IN_DELETE | _IN_MOVED_FROM):
+                resultado.append((caminho, REMOVIDO))
+        return resultado
+
+    def _esquecer(self, pasta: str):
+        """Deixa de observar a pasta e as subpastas"""
+        for wd, raiz in list(self._pastas.items()):
+            if raiz == pasta or raiz.startswith(pasta + os.sep):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._pastas[wd]
+
+    def fechar(self):
+        os.close(self._fd)
+
+
+class _Polling:
+    """Detecção por varredura periódica (mtime e tamanho), para sistemas sem inotify"""
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self._pastas: List[str] = []
+        self._estado: Dict[str, Tuple[int, int]] = {}
+
+    def observar(self, pasta: str) -> List[str]:
+        self._pastas.append(pasta)
+        self._estado.update(self._varrer([pasta]))
+        return []
+
+    def eventos(self, timeout: float) -> Iterable[Tuple[str, str]]:
+        time.sleep(min(timeout, self.intervalo))
+        atual = self._varrer(self._pastas)
+        resultado = [(c, ALTERADO) for c, estado in atual.items() if self._estado.get(c) != estado]
+        resultado += [(c, REMOVIDO) for c in self._estado.keys() - atual.keys()]
+        self._estado = atual
+        return resultado
+
+    @staticmethod
+    def _varrer(pastas: List[str]) -> Dict[str, Tuple[int, int]]:
+        estado = {}
+        for pasta in pastas:
+            for raiz, _, nomes in os.walk(pasta):
+                for nome in nomes:
+                    caminho = os.path.join(raiz, nome)
+                    try:
+                        info = os.stat(caminho)
+                    except OSError:
+                        continue
+                    estado[caminho] = (info.st_mtime_ns, info.st_size)
+        return estado
+
+    def fechar(self):
+        pass
+
+
+class ObservadorPasta:
+    """Observa pastas de materiais e reindexa os arquivos alterados em segundo plano.
+
+    Usa inotify no Linux e varredura periódica nos demais sistemas. Os
+    eventos de cada arquivo são agrupados (debounce): um arquivo só é
+    enviado ao indexador depois de ficar `espera` segundos sem mudanças,
+    o que evita processar uma cópia ainda em andamento várias vezes.
+    Os arquivos prontos são reindexados juntos por
+    Indexador.atualizar_arquivos, que troca os chunks no índice de uma
+    vez enquanto o tutor continua respondendo.
+    """
+
+    def __init__(self, indexador, pastas, espera: float = 2.0, intervalo_polling: float = 2.0,
+                 usar_inotify: Optional[bool] = None):
+        """
+        Args:
+            indexador: Indexador a atualizar
+            pastas: Pasta ou lista de pastas observadas (recursivamente)
+            espera: Segundos sem eventos antes de reindexar um arquivo
+            intervalo_polling: Intervalo da varredura quando não há inotify
+            usar_inotify: Força (ou desativa) o inotify; padrão: usa no Linux
+        """
+        self.logger = logging.getLogger(__name__)
+        self.indexador = indexador
+        self.pastas = [pastas] if isinstance(pastas, str) else list(pastas)
+        self.espera = espera
+        self.intervalo_polling = intervalo_polling
+        self.usar_inotify = sys.platform.startswith("linux") if usar_inotify is None else usar_inotify
+        self._pendentes: Dict[str, Tuple[str, float]] = {}
+        self._parar = threading.Event()
+        self._thread = None
+        self._backend = None
+
+    def iniciar(self):
+        if self._thread is not None:
+            return self
+        self._backend = self._criar_backend()
+        for pasta in self.pastas:
+            os.makedirs(pasta, exist_ok=True)
+            self._backend.observar(pasta)
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="observador-dados", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Observando {', '.join(self.pastas)} ({type(self._backend).__name__.strip('_')})")
+        return self
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._backend is not None:
+            self._backend.fechar()
+            self._backend = None
+
+    def _criar_backend(self):
+        if self.usar_inotify:
+            try:
+                return _Inotify()
+            except (OSError, AttributeError) as e:
+                self.logger.warning(f"inotify indisponível ({str(e)}), usando varredura periódica")
+        return _Polling(self.intervalo_polling)
+
+    def _executar(self):
+        while not self._parar.is_set():
+            try:
+                for caminho, acao in self._backend.eventos(timeout=min(self.espera, 0.5)):
+                    if not caminho:
+                        self.logger.warning("Fila do inotify estourou; reindexando todas as pastas")
+                        for arquivo in self.indexador.pipeline.descobrir(self.pastas):
+                            self._registrar(arquivo, ALTERADO)
+                        continue
+                    if acao == PASTA_REMOVIDA:
+                        self._remover_pasta(caminho)
+                        continue
+                    self._registrar(caminho, acao)
+                self._despachar()
+            except Exception as e:
+                self.logger.error(f"Erro no observador de arquivos: {str(e)}")
+                self._parar.wait(self.espera)
+
+    def _registrar(self, caminho: str, acao: str):
+        nome = os.path.basename(caminho)
+        # Arquivos temporários de editores e downloads parciais
+        if nome.startswith((".", "~")) or nome.endswith(("~", ".tmp", ".part", ".crdownload")):
+            return
+        if not self.indexador.registro.suporta(caminho):
+            return
+        self._pendentes[caminho] = (acao, time.monotonic())
+
+    def _remover_pasta(self, pasta: str):
+        """Registra como removidos os arquivos indexados (ou pendentes) abaixo da pasta"""
+        prefixo = pasta + os.sep
+        caminhos = {c for c in self.indexador.caminhos_indexados() if c.startswith(prefixo)}
+        caminhos.update(c for c in self._pendentes if c.startswith(prefixo))
+        if caminhos:
+            self.logger.info(f"Pasta {pasta} removida: {len(caminhos)} arquivo(s) saem do índice")
+        for caminho in caminhos:
+            self._registrar(caminho, REMOVIDO)
+
+    def _despachar(self):
+        """Envia ao indexador os arquivos sem eventos há pelo menos `espera` segundos
+
+        Os arquivos só saem da fila depois que a atualização dá certo; se
+        ela falhar, são tentados de novo após `espera` segundos.
+        """
+        limite = time.monotonic() - self.espera
+        prontos = [c for c, (_, instante) in self._pendentes.items() if instante <= limite]
+        if not prontos:
+            return
+        self.logger.info(f"{len(prontos)} arquivo(s) alterado(s) em {', '.join(self.pastas)}")
+        try:
+            resultado = self.indexador.atualizar_arquivos(prontos)
+        except Exception:
+            self._adiar(prontos)
+            raise
+        if resultado.get("falha") is not None:
+            self._adiar(prontos)
+            return
+        for caminho in prontos:
+            del self._pendentes[caminho]
+
+    def _adiar(self, caminhos: List[str]):
+        agora = time.monotonic()
+        for caminho in caminhos:
+            self._pendentes[caminho] = (self._pendentes[caminho][0], agora)
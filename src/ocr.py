@@ -0,0 +1,229 @@
+import hashlib
+import importlib.util
+import logging
+import multiprocessing as mp
+import os
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+def _renderizar_pagina(caminho: str, indice: int, dpi: int):
+    """Renderiza uma página de PDF como imagem PIL"""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        pdfium = None
+
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(caminho)
+        try:
+            return pdf[indice].render(scale=dpi / 72).to_pil()
+        finally:
+            pdf.close()
+
+    # Sem pypdfium2: usa a maior imagem embutida na página, que em um
+    # documento digitalizado é a própria página escaneada
+    from pypdf import PdfReader
+    imagens = list(PdfReader(caminho).pages[indice].images)
+    if not imagens:
+        return None
+    return max(imagens, key=lambda imagem: len(imagem.data)).image
+
+
+def _ocr_pagina_pdf(caminho: str, indice: int, dpi: int, idioma: str) -> str:
+    import pytesseract
+
+    imagem = _renderizar_pagina(caminho, indice, dpi)
+    if imagem is None:
+        return ""
+    return pytesseract.image_to_string(imagem, lang=idioma)
+
+
+def _ocr_imagem(caminho: str, idioma: str, min_confianca: int, min_palavras: int) -> str:
+    """Texto de uma imagem, ou '' se ela não tiver texto suficiente (fotos, diagramas)"""
+    from PIL import Image
+
+    with Image.open(caminho) as imagem:
+        return _texto_confiavel(imagem.convert("RGB"), idioma, min_confianca, min_palavras)
+
+
+def _ocr_quadro(quadro, idioma: str, min_confianca: int, min_palavras: int) -> str:
+    """Texto de um quadro de vídeo (array RGB)"""
+    from PIL import Image
+
+    return _texto_confiavel(Image.fromarray(quadro), idioma, min_confianca, min_palavras)
+
+
+def _texto_confiavel(imagem, idioma: str, min_confianca: int, min_palavras: int) -> str:
+    import pytesseract
+
+    dados = pytesseract.image_to_data(imagem, lang=idioma, output_type=pytesseract.Output.DICT)
+    linhas = {}
+    for palavra, confianca, bloco, linha in zip(dados["text"], dados["conf"], dados["block_num"], dados["line_num"]):
+        if palavra.strip() and float(confianca) >= min_confianca:
+            linhas.setdefault((bloco, linha), []).append(palavra.strip())
+    if sum(len(palavras) for palavras in linhas.values()) < min_palavras:
+        return ""
+    return "\n".join(" ".join(palavras) for palavras in linhas.values())
+
+
+class MotorOCR:
+    """OCR sob demanda para páginas de PDF sem camada de texto e imagens com texto.
+
+    Só as páginas cujo texto extraído é vazio (ou quase) passam pelo OCR,
+    então PDFs gerados digitalmente não pagam nada. As páginas são
+    renderizadas e reconhecidas em um pool de processos, várias ao mesmo
+    tempo, e o resultado fica em cache pelo hash do arquivo e número da
+    página (mais DPI e idioma), de modo que reindexar um livro escaneado
+    não repete o OCR.
+    """
+
+    def __init__(self, idioma: str = "por", dpi: int = 300, workers: int = 0,
+                 caminho_cache: str = "ocr_cache.db", min_caracteres: int = 20,
+                 min_confianca: int = 60, min_palavras: int = 5):
+        """
+        Args:
+            idioma: Idioma(s) do Tesseract (ex.: 'por', 'por+eng')
+            dpi: Resolução de renderização das páginas
+            workers: Processos de OCR (0: número de núcleos)
+            caminho_cache: Arquivo SQLite do cache de OCR
+            min_caracteres: Páginas com menos texto extraído que isso passam pelo OCR
+            min_confianca: Confiança mínima (0-100) das palavras reconhecidas em imagens
+            min_palavras: Palavras confiáveis necessárias para uma imagem ter texto
+        """
+        self.logger = logging.getLogger(__name__)
+        self.idioma = idioma
+        self.dpi = dpi
+        self.workers = workers or os.cpu_count() or 1
+        self.min_caracteres = min_caracteres
+        self.min_confianca = min_confianca
+        self.min_palavras = min_palavras
+        self.disponivel = importlib.util.find_spec("pytesseract") is not None
+        if not self.disponivel:
+            self.logger.warning("pytesseract não instalado: OCR desativado")
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._hashes = {}
+        self._cache = sqlite3.connect(caminho_cache, check_same_thread=False)
+        self._cache.execute("PRAGMA journal_mode=WAL")
+        self._cache.execute("CREATE TABLE IF NOT EXISTS ocr (chave TEXT PRIMARY KEY, texto TEXT NOT NULL)")
+
+    def precisa_ocr(self, texto: str) -> bool:
+        return self.disponivel and len(texto.strip()) < self.min_caracteres
+
+    def completar_paginas(self, caminho: str, textos: Iterable[str]) -> Iterator[Tuple[str, bool]]:
+        """Recebe o texto extraído de cada página e devolve (texto, veio_do_ocr) na mesma ordem
+
+        O OCR das páginas sem texto é enviado ao pool à medida que elas
+        aparecem; até 2×workers páginas ficam em andamento enquanto as
+        anteriores são devolvidas.
+        """
+        janela = self.workers * 2
+        pendentes = deque()
+        for indice, texto in enumerate(textos):
+            futuro = None
+            if self.precisa_ocr(texto):
+                chave = f"pdf:{self.hash_arquivo(caminho)}:{indice}:{self.dpi}:{self.idioma}"
+                futuro = self._enviar(chave, _ocr_pagina_pdf, caminho, indice, self.dpi, self.idioma)
+            pendentes.append((texto, futuro, indice))
+            while pendentes and (pendentes[0][1] is None or pendentes[0][1].done() or len(pendentes) > janela):
+                yield self._resolver(caminho, *pendentes.popleft())
+        while pendentes:
+            yield self._resolver(caminho, *pendentes.popleft())
+
+    def ocr_imagem(self, caminho: str) -> str:
+        """Texto reconhecido em uma imagem ('' se ela não tiver texto)"""
+        if not self.disponivel:
+            return ""
+        chave = f"img:{self.hash_arquivo(caminho)}:{self.idioma}:{self.min_confianca}:{self.min_palavras}"
+        try:
+            return self._enviar(chave, _ocr_imagem, caminho, self.idioma,
+                                self.min_confianca, self.min_palavras).result()
+        except Exception as e:
+            self.logger.error(f"Falha no OCR de {caminho}: {str(e)}")
+            return ""
+
+    def ocr_quadros(self, caminho: str, quadros: List[Tuple[float, object]]) -> List[str]:
+        """Texto de vários quadros de um vídeo, reconhecidos em paralelo
+
+        Args:
+            caminho: Vídeo de origem (o cache usa seu hash e o tempo do quadro)
+            quadros: (segundos, imagem RGB) de cada quadro
+        """
+        if not self.disponivel:
+            return [""] * len(quadros)
+        video = self.hash_arquivo(caminho)
+        futuros = [
+            self._enviar(f"quadro:{video}:{tempo:.2f}:{self.idioma}:{self.min_confianca}:{self.min_palavras}",
+                         _ocr_quadro, quadro, self.idioma, self.min_confianca, self.min_palavras)
+            for tempo, quadro in quadros
+        ]
+        textos = []
+        for (tempo, _), futuro in zip(quadros, futuros):
+            try:
+                textos.append(futuro.result())
+            except Exception as e:
+                self.logger.error(f"Falha no OCR do quadro {tempo:.1f}s de {caminho}: {str(e)}")
+                textos.append("")
+        return textos
+
+    def hash_arquivo(self, caminho: str) -> str:
+        """SHA-256 do conteúdo, calculado uma vez por versão do arquivo"""
+        estado = os.stat(caminho)
+        identificacao = (caminho, estado.st_mtime_ns, estado.st_size)
+        with self._lock:
+            if identificacao in self._hashes:
+                return self._hashes[identificacao]
+        resumo = hashlib.sha256()
+        with open(caminho, "rb") as f:
+            for bloco in iter(lambda: f.read(1 << 20), b""):
+                resumo.update(bloco)
+        with self._lock:
+            self._hashes[identificacao] = resumo.hexdigest()
+        return self._hashes[identificacao]
+
+    def encerrar(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+            self.logger.info("Pool de OCR encerrado")
+
+    def _enviar(self, chave: str, funcao, *args) -> Future:
+        """Consulta o cache; se não houver resultado, agenda o OCR no pool"""
+        with self._lock:
+            linha = self._cache.execute("SELECT texto FROM ocr WHERE chave = ?", (chave,)).fetchone()
+            if linha:
+                futuro = Future()
+                futuro.set_result(linha[0])
+                return futuro
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+                self.logger.info(f"Pool de OCR iniciado com {self.workers} processos")
+            futuro = self._pool.submit(funcao, *args)
+
+        def guardar(concluido: Future):
+            if concluido.exception() is None:
+                with self._lock:
+                    self._cache.execute("INSERT OR REPLACE INTO ocr (chave, texto) VALUES (?, ?)",
+                                        (chave, concluido.result()))
+                    self._cache.commit()
+
+        futuro.add_done_callback(guardar)
+        return futuro
+
+    def _resolver(self, caminho: str, texto: str, futuro: Optional[Future], indice: int) -> Tuple[str, bool]:
+        if futuro is None:
+            return texto, False
+        try:
+            reconhecido = futuro.result()
+        except Exception as e:
+            self.logger.error(f"Falha no OCR da página {indice + 1} de {caminho}: {str(e)}")
+            return texto, False
+        if len(reconhecido.strip()) > len(texto.strip()):
+            return reconhecido, True
+        return texto, False
@@ -1,32 +1,40 @@
-from langchain_community.document_loaders import PyPDFLoader
+from pypdf import PdfReader
 import os
 import logging
-from langchain.schema import Document
+from typing import Iterator
+from langchain_core.documents import Document
 
 
 class PDFProcessor:
-    def __init__(self, indexador):
+    def __init__(self, indexador=None, ocr=None):
+        """
+        Args:
+            indexador: Indexador associado (opcional)
+            ocr: MotorOCR para páginas sem camada de texto (digitalizadas)
+        """
         self.indexador = indexador
+        self.ocr = ocr
         self.logger = logging.getLogger(__name__)
 
-    def processar(self, pasta="dados/pdfs"):
+    def extrair(self, caminho: str) -> Iterator[Document]:
+        """Extrai o texto página a página, com OCR nas páginas que não têm texto"""
+        arquivo = os.path.basename(caminho)
+        reader = PdfReader(caminho)
+        total = len(reader.pages)
+        textos = (page.extract_text() or "" for page in reader.pages)
+        if self.ocr is not None:
+            paginas = self.ocr.completar_paginas(caminho, textos)
+        else:
+            paginas = ((texto, False) for texto in textos)
 
-        documentos = []
-        try:
-            for arquivo in os.listdir(pasta):
-                if arquivo.endswith(".pdf"):
-                    try:
-                        loader = PyPDFLoader(os.path.join(pasta, arquivo))
-                        docs = loader.load()
-                        for doc in docs:
-                            doc.metadata.update({
-                                "tipo": "pdf",
-                                "fonte": arquivo
-                            })
-                        documentos.extend(docs)
-                        self.logger.info(f"Processado PDF: {arquivo}")
-                    except Exception as e:
-                        self.logger.error(f"Erro no PDF {arquivo}: {e}")
-        except Exception as e:
-            self.logger.error(f"Erro ao acessar PDFs: {e}")
-        return documentos
\ No newline at end of file
+        for numero, (texto, ocr) in enumerate(paginas, start=1):
+            metadata = {
+                "tipo": "pdf",
+                "fonte": arquivo,
+                "caminho": caminho,
+                "pagina": numero,
+                "paginas": total
+            }
+            if ocr:
+                metadata["ocr"] = True
+            yield Document(page_content=texto, metadata=metadata)
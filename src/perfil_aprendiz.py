@@ -0,0 +1,185 @@
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+FORMATOS = ("texto", "video", "audio")
+NIVEIS = ("iniciante", "intermediário", "avançado")
+
+# Normaliza as grafias aceitas na interface e no console
+_ALIASES_FORMATO = {"vídeo": "video", "áudio": "audio"}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS perfis (
+    aprendiz_id TEXT PRIMARY KEY,
+    interacoes INTEGER NOT NULL DEFAULT 0,
+    formato_texto INTEGER NOT NULL DEFAULT 0,
+    formato_video INTEGER NOT NULL DEFAULT 0,
+    formato_audio INTEGER NOT NULL DEFAULT 0,
+    avaliacoes INTEGER NOT NULL DEFAULT 0,
+    dominio REAL,
+    atualizado_em REAL
+);
+CREATE TABLE IF NOT EXISTS dominio_topicos (
+    aprendiz_id TEXT NOT NULL,
+    topico TEXT NOT NULL,
+    interacoes INTEGER NOT NULL DEFAULT 0,
+    avaliacoes INTEGER NOT NULL DEFAULT 0,
+    dominio REAL,
+    PRIMARY KEY (aprendiz_id, topico)
+);
+"""
+
+
+def normalizar_formato(formato: Optional[str]) -> Optional[str]:
+    if not formato:
+        return None
+    formato = formato.lower()
+    formato = _ALIASES_FORMATO.get(formato, formato)
+    return formato if formato in FORMATOS else None
+
+
+class PerfilAprendizStore:
+    """Perfis de aprendizes persistidos em SQLite e mantidos em cache LRU.
+
+    Cada interação atualiza contadores (formato solicitado, tópicos vistos)
+    e médias móveis de domínio com uma escrita de linha única, sem reler
+    o histórico. O nível é inferido do domínio médio das avaliações.
+    """
+
+    def __init__(self, caminho: str = "perfis.db", tamanho_cache: int = 10000, peso_recente: float = 0.3):
+        """
+        Args:
+            caminho: Arquivo SQLite (':memory:' para testes)
+            tamanho_cache: Perfis mantidos em memória
+            peso_recente: Peso da avaliação mais recente na média móvel de domínio
+        """
+        self.logger = logging.getLogger(__name__)
+        self.tamanho_cache = tamanho_cache
+        self.peso_recente = peso_recente
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.row_factory = sqlite3.Row
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.executescript(_ESQUEMA)
+        self.logger.info(f"Perfis de aprendizes em {caminho}")
+
+    def obter(self, aprendiz_id: str) -> Dict:
+        """Retorna o perfil (do cache, do banco ou um perfil novo)"""
+        with self._lock:
+            perfil = self._cache.get(aprendiz_id)
+            if perfil is not None:
+                self._cache.move_to_end(aprendiz_id)
+                return perfil
+
+            linha = self._conexao.execute(
+                "SELECT * FROM perfis WHERE aprendiz_id = ?", (aprendiz_id,)
+            ).fetchone()
+            perfil = dict(linha) if linha else {
+                "aprendiz_id": aprendiz_id, "interacoes": 0, "formato_texto": 0,
+                "formato_video": 0, "formato_audio": 0, "avaliacoes": 0,
+                "dominio": None, "atualizado_em": None
+            }
+            perfil["topicos"] = {}
+            self._cache[aprendiz_id] = perfil
+            if len(self._cache) > self.tamanho_cache:
+                self._cache.popitem(last=False)
+            return perfil
+
+    def formato_preferido(self, aprendiz_id: str) -> Optional[str]:
+        """Formato mais solicitado, ou None se o aprendiz nunca escolheu um"""
+        perfil = self.obter(aprendiz_id)
+        contagem, formato = max((perfil[f"formato_{f}"], f) for f in FORMATOS)
+        return formato if contagem else None
+
+    def nivel_inferido(self, aprendiz_id: str) -> Optional[str]:
+        """Nível a partir do domínio médio, ou None sem avaliações"""
+        dominio = self.obter(aprendiz_id)["dominio"]
+        if dominio is None:
+            return None
+        if dominio < 0.4:
+            return "iniciante"
+        if dominio < 0.75:
+            return "intermediário"
+        return "avançado"
+
+    def registrar_interacao(self, aprendiz_id: str, formato: Optional[str] = None,
+                            topicos: Iterable[str] = (), pontuacao: Optional[float] = None):
+        """Atualiza contadores e domínio de uma interação
+
+        Args:
+            aprendiz_id: Identificador do aprendiz
+            formato: Formato solicitado explicitamente pelo aprendiz
+            topicos: Tópicos (fontes) envolvidos na interação
+            pontuacao: Resultado de uma avaliação, entre 0 e 1
+        """
+        formato = normalizar_formato(formato)
+        with self._lock:
+            perfil = self.obter(aprendiz_id)
+            perfil["interacoes"] += 1
+            if formato:
+                perfil[f"formato_{formato}"] += 1
+            if pontuacao is not None:
+                perfil["avaliacoes"] += 1
+                perfil["dominio"] = self._media(perfil["dominio"], pontuacao)
+            perfil["atualizado_em"] = time.time()
+
+            self._conexao.execute(
+                """INSERT INTO perfis (aprendiz_id, interacoes, formato_texto, formato_video,
+                       formato_audio, avaliacoes, dominio, atualizado_em)
+                   VALUES (:aprendiz_id, :interacoes, :formato_texto, :formato_video,
+                       :formato_audio, :avaliacoes, :dominio, :atualizado_em)
+                   ON CONFLICT(aprendiz_id) DO UPDATE SET
+                       interacoes = excluded.interacoes,
+                       formato_texto = excluded.formato_texto,
+                       formato_video = excluded.formato_video,
+                       formato_audio = excluded.formato_audio,
+                       avaliacoes = excluded.avaliacoes,
+                       dominio = excluded.dominio,
+                       atualizado_em = excluded.atualizado_em""",
+                {k: v for k, v in perfil.items() if k != "topicos"}
+            )
+
+            for topico in dict.fromkeys(topicos):
+                dados = self._topico(perfil, topico)
+                dados["interacoes"] += 1
+                if pontuacao is not None:
+                    dados["avaliacoes"] += 1
+                    dados["dominio"] = self._media(dados["dominio"], pontuacao)
+                self._conexao.execute(
+                    """INSERT INTO dominio_topicos (aprendiz_id, topico, interacoes, avaliacoes, dominio)
+                       VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT(aprendiz_id, topico) DO UPDATE SET
+                           interacoes = excluded.interacoes,
+                           avaliacoes = excluded.avaliacoes,
+                           dominio = excluded.dominio""",
+                    (aprendiz_id, topico, dados["interacoes"], dados["avaliacoes"], dados["dominio"])
+                )
+            self._conexao.commit()
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+    def _topico(self, perfil: Dict, topico: str) -> Dict:
+        """Domínio de um tópico, carregado sob demanda (chamar sob o lock)"""
+        dados = perfil["topicos"].get(topico)
+        if dados is None:
+            linha = self._conexao.execute(
+                "SELECT interacoes, avaliacoes, dominio FROM dominio_topicos WHERE aprendiz_id = ? AND topico = ?",
+                (perfil["aprendiz_id"], topico)
+            ).fetchone()
+            dados = dict(linha) if linha else {"interacoes": 0, "avaliacoes": 0, "dominio": None}
+            perfil["topicos"][topico] = dados
+        return dados
+
+    def _media(self, atual: Optional[float], nova: float) -> float:
+        nova = min(max(nova, 0.0), 1.0)
+        if atual is None:
+            return nova
+        return (1 - self.peso_recente) * atual + self.peso_recente * nova
@@ -0,0 +1,97 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+# Dependências que não devem ser carregadas só por importar o módulo principal
+PESADOS = ("torch", "whisper", "transformers", "moviepy", "PIL", "magic", "pydub",
+           "sentence_transformers", "langchain_community", "cv2", "faiss")
+
+
+def perfil_importacao(modulo: str, raiz: Optional[str] = None) -> Dict:
+    """Importa o módulo em um processo novo com `python -X importtime`
+
+    Returns:
+        {'total_ms', 'modulos': [{'nome', 'proprio_ms', 'acumulado_ms', 'nivel'}], 'erro'}
+    """
+    raiz = raiz or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=raiz, capture_output=True, text=True
+    )
+    modulos = []
+    erro = []
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:"):
+            erro.append(linha)
+            continue
+        partes = linha[len("import time:"):].split("|")
+        if len(partes) != 3 or not partes[0].strip().isdigit():
+            continue  # cabeçalho
+        nome = partes[2].rstrip()
+        modulos.append({
+            "nome": nome.strip(),
+            "proprio_ms": int(partes[0]) / 1000,
+            "acumulado_ms": int(partes[1]) / 1000,
+            "nivel": (len(nome) - len(nome.lstrip())) // 2
+        })
+    return {
+        "total_ms": sum(m["proprio_ms"] for m in modulos),
+        "modulos": modulos,
+        "erro": "\n".join(erro) if processo.returncode != 0 else None
+    }
+
+
+def pesados_importados(perfil: Dict, pesados=PESADOS) -> List[str]:
+    """Dependências pesadas (pacotes de topo) presentes no perfil"""
+    carregados = {m["nome"].split(".")[0] for m in perfil["modulos"]}
+    return [p for p in pesados if p in carregados]
+
+
+def relatorio(modulo: str, perfil: Dict, top: int = 20) -> str:
+    linhas = [f"Importação de {modulo}: {perfil['total_ms']:.0f} ms, {len(perfil['modulos'])} módulos"]
+    if perfil["erro"]:
+        linhas.append(f"Falhou:\n{perfil['erro']}")
+
+    # Pacotes de topo importados diretamente pelo código do projeto
+    pacotes = {}
+    for m in perfil["modulos"]:
+        pacote = m["nome"].split(".")[0]
+        pacotes[pacote] = pacotes.get(pacote, 0.0) + m["proprio_ms"]
+    linhas.append("\nPor pacote (ms):")
+    for pacote, ms in sorted(pacotes.items(), key=lambda x: -x[1])[:top]:
+        linhas.append(f"  {ms:9.1f}  {pacote}")
+
+    linhas.append("\nMaiores tempos acumulados (ms):")
+    for m in sorted(perfil["modulos"], key=lambda m: -m["acumulado_ms"])[:top]:
+        linhas.append(f"  {m['acumulado_ms']:9.1f}  {'  ' * m['nivel']}{m['nome']}")
+
+    pesados = pesados_importados(perfil)
+    linhas.append(f"\nDependências pesadas carregadas: {', '.join(pesados) if pesados else 'nenhuma'}")
+    return "\n".join(linhas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relatório do tempo de importação dos módulos do tutor")
+    parser.add_argument("modulos", nargs="*", default=["main", "interface"])
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--limite-ms", type=float, help="Falha se alguma importação passar desse tempo")
+    parser.add_argument("--sem-pesados", action="store_true",
+                        help=f"Falha se algum destes for importado: {', '.join(PESADOS)}")
+    args = parser.parse_args()
+
+    falhou = False
+    for nome in args.modulos:
+        perfil = perfil_importacao(nome)
+        print(relatorio(nome, perfil, args.top))
+        print()
+        if perfil["erro"]:
+            falhou = True
+        if args.limite_ms is not None and perfil["total_ms"] > args.limite_ms:
+            print(f"❌ {nome}: {perfil['total_ms']:.0f} ms excede o limite de {args.limite_ms:.0f} ms")
+            falhou = True
+        if args.sem_pesados and pesados_importados(perfil):
+            print(f"❌ {nome} importa {', '.join(pesados_importados(perfil))} no carregamento")
+            falhou = True
+    sys.exit(1 if falhou else 0)
@@ -0,0 +1,284 @@
+import argparse
+import functools
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+# Arquivo de controle relido durante a execução: ligar/desligar não exige reiniciar
+ARQUIVO_CONTROLE = os.environ.get("TUTOR_PERFIL_CONTROLE", "perfilador.json")
+
+CONFIG_PADRAO = {
+    "ativo": False,
+    "fracao": 0.05,
+    "intervalo_ms": 10,
+    "limiar_lento_s": 30.0,
+    "memoria": True
+}
+
+
+class _Medicao:
+    """Uma chamada monitorada (pergunta respondida, indexação)"""
+
+    def __init__(self, nome: str, amostrada: bool, todas_threads: bool):
+        self.nome = nome
+        self.thread_id = threading.get_ident()
+        self.amostrada = amostrada
+        self.todas_threads = todas_threads
+        self.inicio = time.monotonic()
+        self.lenta = False
+        self.pilhas = Counter()
+        # Retrato do tracemalloc no maior uso de memória observado enquanto a chamada era lenta
+        self.retrato = None
+        self.pico = 0
+
+
+class Perfilador:
+    """Profiler por amostragem, ligado sob demanda, para chamadas longas.
+
+    Com o perfilador ativo (arquivo de controle), uma fração das chamadas
+    é amostrada do início ao fim: uma thread lê a pilha da chamada
+    (`sys._current_frames`) a cada `intervalo_ms`, sem instrumentar o
+    código. As demais custam só o registro de início e fim; se uma delas
+    passar de `limiar_lento_s`, passa a ser amostrada a partir dali e,
+    com `memoria`, o tracemalloc é ligado até ela terminar, guardando o
+    retrato das alocações no pico de memória (conferido a cada amostra). As
+    pilhas são gravadas no formato "collapsed" (uma pilha por linha com a
+    contagem), aceito por flamegraph.pl, speedscope e similares, em
+    `perfis/` ao lado do sistema.log.
+    """
+
+    def __init__(self, arquivo_controle: str = ARQUIVO_CONTROLE, pasta: Optional[str] = None):
+        """
+        Args:
+            arquivo_controle: JSON com as chaves de CONFIG_PADRAO
+            pasta: Onde gravar os perfis (padrão: perfis/ ao lado do arquivo de log)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.arquivo_controle = arquivo_controle
+        self.pasta = pasta
+        self._config = dict(CONFIG_PADRAO)
+        self._lido_em = 0.0
+        self._estado_controle = None
+        self._medicoes: Dict[int, _Medicao] = {}
+        self._lock = threading.Lock()
+        self._sinal = threading.Event()
+        self._amostrador = None
+        self._tracemalloc_nosso = False
+
+    def configuracao(self) -> Dict:
+        """Configuração atual (o arquivo de controle é relido no máximo a cada 2 s)"""
+        agora = time.monotonic()
+        if agora - self._lido_em < 2:
+            return self._config
+        self._lido_em = agora
+        try:
+            info = os.stat(self.arquivo_controle)
+            estado = (info.st_mtime_ns, info.st_size)
+        except OSError:
+            self._config, self._estado_controle = dict(CONFIG_PADRAO), None
+            return self._config
+        if estado != self._estado_controle:
+            try:
+                with open(self.arquivo_controle, encoding="utf-8") as f:
+                    self._config = {**CONFIG_PADRAO, **json.load(f)}
+                self._estado_controle = estado
+                self.logger.info(f"Perfilador {'ativo' if self._config['ativo'] else 'inativo'}: {self._config}")
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Arquivo de controle do perfilador inválido: {str(e)}")
+        return self._config
+
+    @contextmanager
+    def medir(self, nome: str, todas_threads: bool = False):
+        """Monitora o bloco; `todas_threads` inclui as threads auxiliares (ex.: etapas do pipeline)"""
+        config = self.configuracao()
+        if not config["ativo"]:
+            yield
+            return
+        medicao = _Medicao(nome, random.random() < config["fracao"], todas_threads)
+        with self._lock:
+            self._medicoes[id(medicao)] = medicao
+            if self._amostrador is None:
+                self._amostrador = threading.Thread(target=self._amostrar, name="perfilador", daemon=True)
+                self._amostrador.start()
+        self._sinal.set()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._medicoes.pop(id(medicao), None)
+            duracao = time.monotonic() - medicao.inicio
+            if medicao.amostrada or medicao.lenta:
+                try:
+                    self._gravar(medicao, duracao)
+                except Exception as e:
+                    self.logger.error(f"Erro ao gravar perfil de {nome}: {str(e)}")
+
+    def _amostrar(self):
+        while True:
+            with self._lock:
+                medicoes = list(self._medicoes.values())
+            if not medicoes:
+                self._sinal.wait()
+                self._sinal.clear()
+                continue
+
+            config = self._config
+            agora = time.monotonic()
+            for medicao in medicoes:
+                if not medicao.lenta and agora - medicao.inicio >= config["limiar_lento_s"]:
+                    medicao.lenta = True
+                    self.logger.warning(f"{medicao.nome} passou de {config['limiar_lento_s']:g}s: "
+                                        f"capturando perfil")
+                    if config["memoria"] and not tracemalloc.is_tracing():
+                        tracemalloc.start(25)
+                        self._tracemalloc_nosso = True
+
+            coletar = [m for m in medicoes if m.amostrada or m.lenta]
+            if coletar:
+                quadros = sys._current_frames()
+                nomes = {t.ident: t.name for t in threading.enumerate()}
+                proprio = threading.get_ident()
+                for medicao in coletar:
+                    if medicao.todas_threads:
+                        threads = [i for i in quadros if i != proprio]
+                    else:
+                        threads = [medicao.thread_id]
+                    for ident in threads:
+                        if ident in quadros:
+                            medicao.pilhas[_pilha(quadros[ident], nomes.get(ident, str(ident)))] += 1
+                del quadros
+                self._retratar_memoria([m for m in coletar if m.lenta])
+            if coletar:
+                espera = config["intervalo_ms"] / 1000
+            else:
+                # Acorda a tempo de ligar o tracemalloc assim que uma chamada passar do limiar
+                espera = min([0.5] + [m.inicio + config["limiar_lento_s"] - agora for m in medicoes])
+            time.sleep(max(espera, 0.001))
+
+    @staticmethod
+    def _retratar_memoria(medicoes):
+        """Novo retrato quando a memória passa do pico anterior (10% ou 256 KiB a mais)
+
+        Ler o total alocado é barato e acontece a cada amostra; o retrato,
+        mais caro, só quando o uso cresce, antes que a chamada libere a memória.
+        """
+        if not medicoes or not tracemalloc.is_tracing():
+            return
+        atual = tracemalloc.get_traced_memory()[0]
+        retrato = None
+        for medicao in medicoes:
+            if atual > medicao.pico + max(medicao.pico // 10, 256 * 1024):
+                retrato = retrato or tracemalloc.take_snapshot()
+                medicao.retrato, medicao.pico = retrato, atual
+
+    def _gravar(self, medicao: _Medicao, duracao: float):
+        pasta = self.pasta or os.path.join(_pasta_log(), "perfis")
+        os.makedirs(pasta, exist_ok=True)
+        nome = re.sub(r"[^\w.-]", "_", medicao.nome)
+        base = os.path.join(pasta, f"{datetime.now():%Y%m%d-%H%M%S}_{nome}_{duracao * 1000:.0f}ms")
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for pilha, contagem in medicao.pilhas.most_common():
+                f.write(f"{pilha} {contagem}\n")
+        arquivos = [base + ".folded"]
+
+        if medicao.retrato is not None:
+            retrato = medicao.retrato.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__)
+            ])
+            with open(base + ".memoria.txt", "w", encoding="utf-8") as f:
+                f.write(f"Pico de {medicao.pico / 1024 / 1024:.1f} MiB alocados desde que {medicao.nome} "
+                        f"passou do limiar; maiores origens nesse momento:\n\n")
+                for estatistica in retrato.statistics("traceback")[:30]:
+                    f.write(f"{estatistica.size / 1024:.1f} KiB em {estatistica.count} blocos\n")
+                    f.write("\n".join(f"    {linha}" for linha in estatistica.traceback.format()) + "\n\n")
+            arquivos.append(base + ".memoria.txt")
+        if medicao.lenta:
+            with self._lock:
+                outras_lentas = any(m.lenta for m in self._medicoes.values())
+            if self._tracemalloc_nosso and not outras_lentas:
+                tracemalloc.stop()
+                self._tracemalloc_nosso = False
+
+        self.logger.info(f"Perfil de {medicao.nome} ({duracao:.1f}s, "
+                         f"{sum(medicao.pilhas.values())} amostras): {', '.join(arquivos)}")
+
+
+def _pilha(quadro, thread: str) -> str:
+    """Pilha no formato collapsed: thread;externa;...;interna"""
+    funcoes = []
+    while quadro is not None:
+        codigo = quadro.f_code
+        funcoes.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+        quadro = quadro.f_back
+    funcoes.append(thread)
+    return ";".join(reversed(funcoes))
+
+
+def _pasta_log() -> str:
+    """Pasta do arquivo de log da aplicação (sistema.log), ou a pasta atual"""
+    arquivos = [h.baseFilename for h in logging.getLogger().handlers if isinstance(h, logging.FileHandler)]
+    arquivos.sort(key=lambda a: os.path.basename(a) != "sistema.log")
+    return os.path.dirname(arquivos[0]) if arquivos else os.getcwd()
+
+
+_perfilador = None
+_lock_perfilador = threading.Lock()
+
+
+def perfilador() -> Perfilador:
+    """Perfilador do processo, criado no primeiro uso"""
+    global _perfilador
+    with _lock_perfilador:
+        if _perfilador is None:
+            _perfilador = Perfilador()
+        return _perfilador
+
+
+def perfilado(nome: str, todas_threads: bool = False):
+    """Decorador que monitora cada chamada do método com o perfilador do processo"""
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def envolver(*args, **kwargs):
+            with perfilador().medir(nome, todas_threads):
+                return funcao(*args, **kwargs)
+        return envolver
+    return decorar
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Liga ou desliga o perfilador de um tutor em execução")
+    parser.add_argument("comando", choices=["ativar", "desativar", "estado"])
+    parser.add_argument("--controle", default=ARQUIVO_CONTROLE)
+    parser.add_argument("--fracao", type=float, help="Fração das chamadas amostradas do início ao fim")
+    parser.add_argument("--intervalo-ms", type=float, help="Intervalo entre amostras")
+    parser.add_argument("--limiar-lento-s", type=float, help="Duração a partir da qual a chamada é capturada")
+    parser.add_argument("--sem-memoria", action="store_true", help="Não liga o tracemalloc nas chamadas lentas")
+    args = parser.parse_args()
+
+    config = dict(CONFIG_PADRAO)
+    if os.path.isfile(args.controle):
+        with open(args.controle, encoding="utf-8") as f:
+            config.update(json.load(f))
+    if args.comando != "estado":
+        config["ativo"] = args.comando == "ativar"
+        for chave in ("fracao", "intervalo_ms", "limiar_lento_s"):
+            if getattr(args, chave) is not None:
+                config[chave] = getattr(args, chave)
+        if args.sem_memoria:
+            config["memoria"] = False
+        temporario = args.controle + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+        os.replace(temporario, args.controle)
+    print(json.dumps(config, indent=2))
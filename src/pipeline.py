@@ -0,0 +1,322 @@
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from langchain_core.documents import Document
+
+# Marca o fim do fluxo em uma fila
+_FIM = object()
+
+
+class RegistroProcessadores:
+    """Associa extensões de arquivo aos processadores de mídia.
+
+    Os processadores são criados na primeira vez em que um arquivo do tipo
+    aparece, para não carregar modelos (Whisper, BLIP) que não serão usados.
+    Processadores não concorrentes (os que mantêm um modelo) são usados por
+    uma thread de cada vez.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._por_extensao: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, extensoes: Iterable[str], fabrica: Callable[[], object],
+                  tipo: str, concorrente: bool = False):
+        """
+        Args:
+            extensoes: Extensões tratadas (ex.: ['.pdf'])
+            fabrica: Função sem argumentos que cria o processador
+            tipo: Nome do tipo de mídia, usado nos logs
+            concorrente: Se o mesmo processador pode atender várias threads
+        """
+        entrada = {
+            "tipo": tipo,
+            "fabrica": fabrica,
+            "instancia": None,
+            "lock": None if concorrente else threading.Lock()
+        }
+        for extensao in extensoes:
+            self._por_extensao[extensao.lower()] = entrada
+
+    def suporta(self, caminho: str) -> bool:
+        return os.path.splitext(caminho)[1].lower() in self._por_extensao
+
+    def tipo(self, caminho: str) -> Optional[str]:
+        entrada = self._por_extensao.get(os.path.splitext(caminho)[1].lower())
+        return entrada["tipo"] if entrada else None
+
+    def extrair(self, caminho: str) -> Iterator[Document]:
+        """Extrai as unidades (páginas, blocos, transcrições) de um arquivo"""
+        entrada = self._por_extensao.get(os.path.splitext(caminho)[1].lower())
+        if entrada is None:
+            return
+        with self._lock:
+            if entrada["instancia"] is None:
+                entrada["instancia"] = entrada["fabrica"]()
+                self.logger.info(f"Processador de {entrada['tipo']} inicializado")
+        processador = entrada["instancia"]
+
+        if entrada["lock"] is None:
+            yield from processador.extrair(caminho)
+        else:
+            with entrada["lock"]:
+                yield from processador.extrair(caminho)
+
+
+class PipelineIngestao:
+    """Pipeline de ingestão em etapas: descoberta → extração → divisão → embeddings → escrita.
+
+    As etapas rodam em threads ligadas por filas limitadas: a extração de
+    um arquivo, o cálculo de embeddings do lote anterior e a escrita no
+    índice acontecem ao mesmo tempo, e uma etapa lenta bloqueia as
+    anteriores (backpressure) em vez de acumular documentos em memória.
+    Extração e divisão de um mesmo arquivo são geradores encadeados na
+    mesma thread, então um arquivo nunca é materializado por inteiro.
+    """
+
+    def __init__(self, indexador, registro: RegistroProcessadores,
+                 workers_extracao: int = 2, tamanho_fila: int = 256, tamanho_lote: int = 64):
+        """
+        Args:
+            indexador: Indexador que fornece divisor, embeddings e escrita no índice
+            registro: Processadores por extensão de arquivo
+            workers_extracao: Threads de extração/divisão
+            tamanho_fila: Capacidade das filas entre as etapas (em itens)
+            tamanho_lote: Chunks por chamada ao modelo de embeddings
+        """
+        self.logger = logging.getLogger(__name__)
+        self.indexador = indexador
+        self.registro = registro
+        self.workers_extracao = max(1, workers_extracao)
+        self.tamanho_fila = tamanho_fila
+        self.tamanho_lote = tamanho_lote
+
+    # Etapas
+
+    def descobrir(self, fontes: Union[str, Iterable[str]]) -> Iterator[str]:
+        """Lista os arquivos suportados nas pastas/arquivos informados"""
+        if isinstance(fontes, str):
+            fontes = [fontes]
+        for fonte in fontes:
+            if os.path.isdir(fonte):
+                for raiz, pastas, arquivos in os.walk(fonte):
+                    pastas.sort()
+                    for arquivo in sorted(arquivos):
+                        caminho = os.path.join(raiz, arquivo)
+                        if self.registro.suporta(caminho):
+                            yield caminho
+            elif os.path.isfile(fonte) and self.registro.suporta(fonte):
+                yield fonte
+            else:
+                self.logger.warning(f"Fonte ignorada: {fonte}")
+
+    def extrair(self, caminho: str) -> Iterator[Document]:
+        return self.registro.extrair(caminho)
+
+    def dividir(self, unidades: Iterable[Document]) -> Iterator[Document]:
+        return self.indexador.dividir_documentos(unidades)
+
+    def gerar_embeddings(self, lote: List[Document]) -> List[List[float]]:
+        return self.indexador.gerar_embeddings([doc.page_content for doc in lote])
+
+    def escrever(self, lote: List[Document], vetores: List[List[float]]):
+        self.indexador.escrever_lote(lote, vetores)
+
+    def documentos(self, fontes: Union[str, Iterable[str]]) -> Iterator[Document]:
+        """Chunks das fontes, sem embeddings (execução sequencial sob demanda)"""
+        for caminho in self.descobrir(fontes):
+            try:
+                yield from self.dividir(self.extrair(caminho))
+            except Exception as e:
+                self.logger.error(f"Erro ao processar {caminho}: {str(e)}")
+
+    # Execução
+
+    def processar(self, fontes: Union[str, Iterable[str]], deduplicar: bool = True,
+                  escrever: Optional[Callable[[List[Document], List[List[float]]], None]] = None) -> Dict:
+        """Executa todas as etapas sobre as pastas/arquivos informados
+
+        Args:
+            fontes: Pastas (percorridas recursivamente) e/ou arquivos
+            deduplicar: Colapsa chunks quase duplicados antes dos embeddings
+            escrever: Destino dos lotes (documentos, vetores); padrão: o índice do indexador
+        """
+        parar = threading.Event()
+        estatisticas = self._estatisticas_iniciais()
+        fila_arquivos = queue.Queue(maxsize=self.tamanho_fila)
+        fila_chunks = queue.Queue(maxsize=self.tamanho_fila)
+        lock = threading.Lock()
+
+        def descobrir():
+            try:
+                for caminho in self.descobrir(fontes):
+                    if not self._colocar(fila_arquivos, caminho, parar):
+                        return
+            finally:
+                for _ in range(self.workers_extracao):
+                    self._colocar(fila_arquivos, _FIM, parar)
+
+        def extrair_e_dividir():
+            try:
+                while True:
+                    caminho = self._retirar(fila_arquivos, parar)
+                    if caminho is _FIM:
+                        break
+                    try:
+                        for chunk in self.dividir(self.extrair(caminho)):
+                            if not self._colocar(fila_chunks, chunk, parar):
+                                return
+                        with lock:
+                            estatisticas["arquivos"] += 1
+                        self.logger.info(f"Arquivo processado: {caminho}")
+                    except Exception as e:
+                        with lock:
+                            estatisticas["erros"] += 1
+                            estatisticas["arquivos_com_erro"].append(caminho)
+                        self.logger.error(f"Erro ao processar {caminho}: {str(e)}")
+            finally:
+                self._colocar(fila_chunks, _FIM, parar)
+
+        produtores = [threading.Thread(target=descobrir, name="ingestao-descoberta", daemon=True)]
+        produtores += [
+            threading.Thread(target=extrair_e_dividir, name=f"ingestao-extracao-{i}", daemon=True)
+            for i in range(self.workers_extracao)
+        ]
+        return self._indexar_fila(fila_chunks, self.workers_extracao, produtores, estatisticas, parar,
+                                  deduplicar, escrever)
+
+    def indexar(self, chunks: Iterable[Document], deduplicar: bool = True,
+                escrever: Optional[Callable[[List[Document], List[List[float]]], None]] = None) -> Dict:
+        """Executa apenas as etapas de embeddings e escrita sobre chunks prontos (`escrever` como em `processar`)"""
+        parar = threading.Event()
+        estatisticas = self._estatisticas_iniciais()
+        fila_chunks = queue.Queue(maxsize=self.tamanho_fila)
+
+        def alimentar():
+            try:
+                for chunk in chunks:
+                    if not self._colocar(fila_chunks, chunk, parar):
+                        return
+            finally:
+                self._colocar(fila_chunks, _FIM, parar)
+
+        produtor = threading.Thread(target=alimentar, name="ingestao-chunks", daemon=True)
+        return self._indexar_fila(fila_chunks, 1, [produtor], estatisticas, parar, deduplicar, escrever)
+
+    def _indexar_fila(self, fila_chunks: queue.Queue, num_produtores: int,
+                      produtores: List[threading.Thread], estatisticas: Dict,
+                      parar: threading.Event, deduplicar: bool = True,
+                      escrever: Optional[Callable] = None) -> Dict:
+        inicio = time.perf_counter()
+        escrever = escrever or self.escrever
+        fila_vetores = queue.Queue(maxsize=max(2, self.tamanho_fila // self.tamanho_lote))
+        deduplicador = self.indexador.deduplicador if deduplicar else None
+        duplicatas_antes = deduplicador.estatisticas["duplicatas"] if deduplicador else 0
+        if deduplicador is not None:
+            deduplicador.alterados = []
+        # Chunks registrados no deduplicador que ainda não foram gravados
+        nao_gravados = set()
+        lock = threading.Lock()
+
+        def embeddings():
+            try:
+                lote = []
+                fins = 0
+                while fins < num_produtores:
+                    chunk = self._retirar(fila_chunks, parar)
+                    if chunk is _FIM:
+                        fins += 1
+                        continue
+                    estatisticas["chunks"] += 1
+                    if deduplicador is not None:
+                        if deduplicador.adicionar(chunk) is not None:
+                            continue
+                        with lock:
+                            nao_gravados.add(chunk.metadata["id"])
+                    lote.append(chunk)
+                    if len(lote) >= self.tamanho_lote:
+                        if not self._colocar(fila_vetores, (lote, self.gerar_embeddings(lote)), parar):
+                            return
+                        lote = []
+                if lote:
+                    self._colocar(fila_vetores, (lote, self.gerar_embeddings(lote)), parar)
+            except Exception as e:
+                self._falhar(estatisticas, "embeddings", e, parar)
+            finally:
+                self._colocar(fila_vetores, _FIM, parar)
+
+        def escrita():
+            try:
+                while True:
+                    item = self._retirar(fila_vetores, parar)
+                    if item is _FIM:
+                        break
+                    lote, vetores = item
+                    escrever(lote, vetores)
+                    estatisticas["vetores"] += len(lote)
+                    with lock:
+                        nao_gravados.difference_update(doc.metadata.get("id") for doc in lote)
+            except Exception as e:
+                self._falhar(estatisticas, "escrita", e, parar)
+
+        consumidores = [
+            threading.Thread(target=embeddings, name="ingestao-embeddings", daemon=True),
+            threading.Thread(target=escrita, name="ingestao-escrita", daemon=True)
+        ]
+        for thread in produtores + consumidores:
+            thread.start()
+        for thread in produtores + consumidores:
+            thread.join()
+
+        if deduplicador is not None:
+            if nao_gravados:
+                # Lotes perdidos na falha: os chunks voltam a ser inéditos na próxima ingestão
+                deduplicador.remover(nao_gravados)
+            estatisticas["duplicatas"] = deduplicador.estatisticas["duplicatas"] - duplicatas_antes
+            self.indexador._sincronizar_duplicatas()
+        estatisticas["segundos"] = time.perf_counter() - inicio
+        self.logger.info(
+            f"Ingestão concluída: {estatisticas['arquivos']} arquivos, {estatisticas['chunks']} chunks, "
+            f"{estatisticas['duplicatas']} duplicatas, {estatisticas['vetores']} vetores "
+            f"em {estatisticas['segundos']:.1f}s ({estatisticas['erros']} erros)"
+        )
+        return estatisticas
+
+    # Auxiliares
+
+    @staticmethod
+    def _estatisticas_iniciais() -> Dict:
+        return {"arquivos": 0, "erros": 0, "arquivos_com_erro": [], "chunks": 0, "duplicatas": 0,
+                "vetores": 0, "segundos": 0.0, "falha": None}
+
+    def _falhar(self, estatisticas: Dict, etapa: str, erro: Exception, parar: threading.Event):
+        """Interrompe todas as etapas após um erro irrecuperável"""
+        self.logger.error(f"Falha na etapa de {etapa}: {str(erro)}")
+        estatisticas["falha"] = f"{etapa}: {erro}"
+        parar.set()
+
+    @staticmethod
+    def _colocar(fila: queue.Queue, item, parar: threading.Event) -> bool:
+        """Coloca um item, aguardando espaço; retorna False se o pipeline foi interrompido"""
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _retirar(fila: queue.Queue, parar: threading.Event):
+        """Retira um item; devolve o marcador de fim se o pipeline foi interrompido"""
+        while not parar.is_set():
+            try:
+                return fila.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _FIM
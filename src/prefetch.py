@@ -0,0 +1,130 @@
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Optional
+
+_PALAVRA = re.compile(r"\w+")
+
+
+def _palavras(texto: str) -> frozenset:
+    return frozenset(_PALAVRA.findall(texto.lower()))
+
+
+class PrefetchBusca:
+    """Busca especulativa enquanto o aprendiz digita a pergunta.
+
+    Cada alteração do texto reinicia uma espera curta (debounce); quando
+    o aprendiz para de digitar, o texto parcial é buscado no índice em
+    segundo plano. Ao enviar, se a pergunta final for igual ou muito
+    parecida (Jaccard das palavras) com a buscada, e o índice não tiver
+    mudado nesse meio tempo, o resultado (documentos e, se a função de
+    busca devolver, o embedding da consulta) é reaproveitado e a busca
+    sai do caminho crítico. Resultados de textos antigos são simplesmente
+    substituídos pelo mais recente.
+    """
+
+    def __init__(self, buscar: Callable[[str], Any], versao: Callable[[], int] = lambda: 0,
+                 espera: float = 0.3, limiar: float = 0.8, min_palavras: int = 3,
+                 espera_maxima: float = 1.0):
+        """
+        Args:
+            buscar: Função que recebe o texto e devolve o resultado da busca
+            versao: Função que devolve a versão atual do índice
+            espera: Segundos sem digitação antes de buscar
+            limiar: Similaridade mínima (Jaccard) para reaproveitar o resultado
+            min_palavras: Textos mais curtos não são buscados
+            espera_maxima: Quanto `obter` aguarda uma busca em andamento compatível
+        """
+        self.logger = logging.getLogger(__name__)
+        self.buscar = buscar
+        self.versao = versao
+        self.espera = espera
+        self.limiar = limiar
+        self.min_palavras = min_palavras
+        self.espera_maxima = espera_maxima
+        self.estatisticas = {"buscas": 0, "aproveitadas": 0, "descartadas": 0}
+
+        self._condicao = threading.Condition()
+        self._digitado: Optional[str] = None
+        self._instante = 0.0
+        self._buscando: Optional[frozenset] = None
+        self._resultado = None  # (palavras, versão do índice, resultado da busca)
+        self._parar = False
+        self._thread = threading.Thread(target=self._executar, name="prefetch-busca", daemon=True)
+        self._thread.start()
+
+    def digitado(self, texto: str):
+        """Registra o texto atual da caixa de pergunta (chamar a cada tecla)"""
+        texto = texto.strip()
+        with self._condicao:
+            self._digitado = texto if len(_palavras(texto)) >= self.min_palavras else None
+            self._instante = time.monotonic()
+            self._condicao.notify_all()
+
+    def obter(self, pergunta: str) -> Optional[Any]:
+        """Resultado já buscado para uma pergunta parecida, ou None"""
+        palavras = _palavras(pergunta)
+        limite = time.monotonic() + self.espera_maxima
+        with self._condicao:
+            self._digitado = None
+            # Uma busca compatível em andamento termina mais cedo do que uma nova
+            while self._buscando is not None and self._similar(self._buscando, palavras):
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._condicao.wait(restante)
+            resultado, self._resultado = self._resultado, None
+
+        if resultado is None:
+            return None
+        palavras_buscadas, versao, busca = resultado
+        if versao != self.versao() or not self._similar(palavras_buscadas, palavras):
+            self.estatisticas["descartadas"] += 1
+            return None
+        self.estatisticas["aproveitadas"] += 1
+        return busca
+
+    def parar(self):
+        with self._condicao:
+            self._parar = True
+            self._condicao.notify_all()
+        self._thread.join()
+
+    def _similar(self, a: frozenset, b: frozenset) -> bool:
+        if not a or not b:
+            return False
+        return len(a & b) / len(a | b) >= self.limiar
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                while True:
+                    if self._parar:
+                        return
+                    if self._digitado is not None:
+                        restante = self._instante + self.espera - time.monotonic()
+                        if restante <= 0:
+                            break
+                        self._condicao.wait(restante)
+                    else:
+                        self._condicao.wait()
+                texto, self._digitado = self._digitado, None
+                palavras = _palavras(texto)
+                if self._resultado is not None and self._resultado[0] == palavras:
+                    continue
+                self._buscando = palavras
+
+            try:
+                versao = self.versao()
+                busca = self.buscar(texto)
+                self.estatisticas["buscas"] += 1
+                resultado = (palavras, versao, busca)
+            except Exception as e:
+                self.logger.debug(f"Busca antecipada falhou: {str(e)}")
+                resultado = None
+            with self._condicao:
+                self._buscando = None
+                if resultado is not None:
+                    self._resultado = resultado
+                self._condicao.notify_all()
@@ -0,0 +1,59 @@
+import logging
+from typing import Iterator, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def quadros_chave(caminho: str, intervalo: float = 0.5, limiar: float = 0.12, largura: int = 96,
+                  max_quadros: int = 200) -> Iterator[Tuple[float, np.ndarray]]:
+    """Quadros em que a cena muda, como (segundos, imagem RGB em resolução original)
+
+    Um quadro a cada `intervalo` segundos é reduzido a `largura` pixels em
+    tons de cinza e comparado com o último quadro-chave: a diferença é a
+    fração de pixels que mudaram de forma perceptível. Quando ela passa de
+    `limiar`, o quadro-chave só é emitido quando a imagem parar de mudar
+    (dois quadros amostrados seguidos quase iguais), para não capturar
+    transições, rolagens de tela ou código sendo digitado pela metade. Os
+    quadros intermediários são avançados com `grab`, sem conversão de cor
+    nem redimensionamento.
+    """
+    import cv2
+
+    captura = cv2.VideoCapture(caminho)
+    if not captura.isOpened():
+        raise IOError(f"Não foi possível abrir o vídeo: {caminho}")
+    try:
+        fps = captura.get(cv2.CAP_PROP_FPS) or 25.0
+        passo = max(1, round(fps * intervalo))
+        referencia = anterior = None
+        emitidos = 0
+        indice = -1
+        while captura.grab():
+            indice += 1
+            if indice % passo:
+                continue
+            ok, quadro = captura.retrieve()
+            if not ok:
+                continue
+            altura = max(1, round(quadro.shape[0] * largura / quadro.shape[1]))
+            reduzido = cv2.cvtColor(cv2.resize(quadro, (largura, altura), interpolation=cv2.INTER_AREA),
+                                    cv2.COLOR_BGR2GRAY)
+            estavel = anterior is not None and _diferenca(reduzido, anterior) < limiar / 4
+            mudou = referencia is None or _diferenca(reduzido, referencia) >= limiar
+            anterior = reduzido
+            if mudou and (referencia is None or estavel):
+                referencia = reduzido
+                yield indice / fps, cv2.cvtColor(quadro, cv2.COLOR_BGR2RGB)
+                emitidos += 1
+                if emitidos >= max_quadros:
+                    logger.warning(f"Limite de {max_quadros} quadros-chave atingido em {caminho}")
+                    return
+    finally:
+        captura.release()
+
+
+def _diferenca(a: np.ndarray, b: np.ndarray) -> float:
+    """Fração dos pixels com variação de brilho acima de ~10%"""
+    return float(np.mean(np.abs(a.astype(np.int16) - b.astype(np.int16)) > 25))
@@ -0,0 +1,60 @@
+import re
+import unicodedata
+from typing import List, Tuple
+
+from langchain_core.documents import Document
+
+# Palavras sem conteúdo, ignoradas ao comparar a pergunta com as frases
+PALAVRAS_VAZIAS = {
+    "que", "qual", "quais", "como", "por", "para", "com", "sem", "uma", "uns", "umas", "dos", "das",
+    "nos", "nas", "num", "numa", "pelo", "pela", "pelos", "pelas", "ele", "ela", "eles", "elas",
+    "isso", "isto", "esse", "essa", "este", "esta", "aquele", "aquela", "seu", "sua", "seus", "suas",
+    "meu", "minha", "ser", "sao", "foi", "era", "tem", "ter", "mais", "menos", "muito", "mas", "nao",
+    "sim", "quando", "onde", "entre", "sobre", "ate", "tambem", "voce", "explique", "explica", "defina",
+    "significa", "diferenca", "quero", "saber", "pode", "podes", "poderia"
+}
+
+_FRASE = re.compile(r"(?<=[.!?;])\s+|\n+")
+_PALAVRA = re.compile(r"\w+")
+
+
+def _radicais(texto: str) -> List[str]:
+    """Palavras sem acento, em minúsculas e cortadas em 5 letras (plural e flexões caem juntos)"""
+    texto = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode()
+    return [p[:5] for p in _PALAVRA.findall(texto) if len(p) > 2 and p not in PALAVRAS_VAZIAS]
+
+
+def frases_relevantes(pergunta: str, docs: List[Document], max_frases: int = 3,
+                      max_caracteres: int = 300) -> List[Tuple[str, Document]]:
+    """Frases dos trechos recuperados que mais respondem à pergunta, com o trecho de origem
+
+    A pontuação é a fração dos termos da pergunta presentes na frase, com
+    um pequeno peso para a posição do trecho na busca. Sem nenhuma frase
+    com termos em comum, devolve o início dos melhores trechos.
+    """
+    termos = set(_radicais(pergunta))
+    candidatas = []
+    vistas = set()
+    for posicao, doc in enumerate(docs):
+        if doc.metadata.get("tipo") == "imagem":
+            continue
+        for frase in _FRASE.split(doc.page_content):
+            frase = " ".join(frase.split())
+            radicais = set(_radicais(frase))
+            if len(radicais) < 3 or frase in vistas:
+                continue
+            vistas.add(frase)
+            comuns = len(termos & radicais) / len(termos) if termos else 0.0
+            candidatas.append((comuns - 0.05 * posicao, comuns > 0, frase, doc))
+
+    if not any(relevante for _, relevante, _, _ in candidatas):
+        # Sem termos em comum: a busca vetorial ainda é o melhor indício
+        primeiras = {}
+        for _, _, frase, doc in candidatas:
+            primeiras.setdefault(id(doc), (frase, doc))
+        escolhidas = list(primeiras.values())[:max_frases]
+    else:
+        escolhidas = [(frase, doc) for _, relevante, frase, doc in
+                      sorted(candidatas, key=lambda c: -c[0]) if relevante][:max_frases]
+    return [(frase if len(frase) <= max_caracteres else frase[:max_caracteres].rsplit(" ", 1)[0] + "…", doc)
+            for frase, doc in escolhidas]
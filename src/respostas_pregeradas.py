@@ -0,0 +1,345 @@
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .agendador_llm import Cancelada, PRIORIDADE_LOTE
+from .perfil_aprendiz import NIVEIS
+
+PROMPT_PERGUNTAS = """Leia o trecho de material didático abaixo e escreva {quantidade} perguntas
+que um aluno faria sobre ele. Uma pergunta por linha, sem numeração e sem respostas.
+
+Trecho:
+{trecho}
+
+Perguntas:"""
+
+_NUMERACAO = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+def hash_conteudo(texto: str) -> str:
+    """Identificação de um chunk pelo conteúdo (estável entre reindexações)"""
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def _normalizar(vetor) -> np.ndarray:
+    vetor = np.asarray(vetor, dtype=np.float32)
+    norma = np.linalg.norm(vetor)
+    return vetor / norma if norma else vetor
+
+
+class RespostasPregeradas:
+    """Respostas do tutor geradas com antecedência, consultadas antes do LLM.
+
+    Cada resposta guarda a pergunta (texto e embedding), o nível e o
+    formato para os quais foi gerada, os documentos usados como contexto e
+    o hash do conteúdo desses chunks. Na consulta, a pergunta do aprendiz é
+    comparada por similaridade de cosseno com as perguntas guardadas do
+    mesmo nível e formato; a resposta só é usada se todos os chunks de
+    origem ainda estiverem no índice, então reindexar um material invalida
+    apenas as respostas que dependiam dele.
+    """
+
+    def __init__(self, caminho: str = "respostas_pregeradas.db", limiar: float = 0.92):
+        """
+        Args:
+            caminho: Arquivo SQLite das respostas
+            limiar: Similaridade de cosseno mínima entre a pergunta e a pergunta guardada
+        """
+        self.logger = logging.getLogger(__name__)
+        self.limiar = limiar
+        self._lock = threading.Lock()
+        # (nível, formato) -> (perguntas, matriz de embeddings normalizados)
+        self._matrizes: Dict[Tuple[str, str], Tuple[List[str], np.ndarray]] = {}
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS respostas (
+                pergunta TEXT NOT NULL,
+                nivel TEXT NOT NULL,
+                formato TEXT NOT NULL,
+                vetor BLOB NOT NULL,
+                resposta TEXT NOT NULL,
+                documentos TEXT NOT NULL,
+                chunks TEXT NOT NULL,
+                versao TEXT NOT NULL,
+                criada_em REAL NOT NULL,
+                PRIMARY KEY (pergunta, nivel, formato)
+            );
+            CREATE TABLE IF NOT EXISTS chunks_processados (
+                hash TEXT PRIMARY KEY,
+                versao TEXT NOT NULL
+            );
+        """)
+        self._conexao.commit()
+
+    def buscar(self, vetor, nivel: str, formato: str, chunks_validos: Set[str]) -> Optional[Dict]:
+        """Resposta guardada para uma pergunta parecida, ou None
+
+        Args:
+            vetor: Embedding da pergunta
+            chunks_validos: Hashes do conteúdo dos chunks presentes no índice atual
+
+        Returns:
+            {'pergunta', 'resposta', 'documentos', 'similaridade'}
+        """
+        perguntas, matriz = self._matriz(nivel, formato)
+        if not perguntas:
+            return None
+        similaridades = matriz @ _normalizar(vetor)
+        melhor = int(np.argmax(similaridades))
+        if similaridades[melhor] < self.limiar:
+            return None
+
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT resposta, documentos, chunks FROM respostas WHERE pergunta = ? AND nivel = ? AND formato = ?",
+                (perguntas[melhor], nivel, formato)
+            ).fetchone()
+        if linha is None:
+            return None
+        resposta, documentos, chunks = linha
+        if not set(json.loads(chunks)) <= chunks_validos:
+            # O material mudou desde a geração
+            self.remover(perguntas[melhor], nivel, formato)
+            return None
+        return {
+            "pergunta": perguntas[melhor],
+            "resposta": resposta,
+            "documentos": [Document(page_content=d["texto"], metadata=d["metadata"]) for d in json.loads(documentos)],
+            "similaridade": float(similaridades[melhor])
+        }
+
+    def adicionar(self, pergunta: str, vetor, nivel: str, formato: str, resposta: str,
+                  documentos: List[Document], versao: str):
+        documentos_json = json.dumps(
+            [{"texto": d.page_content, "metadata": d.metadata} for d in documentos],
+            ensure_ascii=False, default=str
+        )
+        chunks = json.dumps([hash_conteudo(d.page_content) for d in documentos])
+        with self._lock:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (pergunta, nivel, formato, _normalizar(vetor).tobytes(), resposta,
+                 documentos_json, chunks, versao, time.time())
+            )
+            self._conexao.commit()
+            self._matrizes.pop((nivel, formato), None)
+
+    def existe(self, pergunta: str, nivel: str, formato: str) -> bool:
+        with self._lock:
+            return self._conexao.execute(
+                "SELECT 1 FROM respostas WHERE pergunta = ? AND nivel = ? AND formato = ?",
+                (pergunta, nivel, formato)
+            ).fetchone() is not None
+
+    def remover(self, pergunta: str, nivel: str, formato: str):
+        with self._lock:
+            self._conexao.execute(
+                "DELETE FROM respostas WHERE pergunta = ? AND nivel = ? AND formato = ?",
+                (pergunta, nivel, formato)
+            )
+            self._conexao.commit()
+            self._matrizes.pop((nivel, formato), None)
+
+    def chunk_processado(self, hash_chunk: str) -> bool:
+        with self._lock:
+            return self._conexao.execute(
+                "SELECT 1 FROM chunks_processados WHERE hash = ?", (hash_chunk,)
+            ).fetchone() is not None
+
+    def marcar_chunk(self, hash_chunk: str, versao: str):
+        with self._lock:
+            self._conexao.execute("INSERT OR REPLACE INTO chunks_processados VALUES (?, ?)", (hash_chunk, versao))
+            self._conexao.commit()
+
+    def limpar_obsoletas(self, chunks_validos: Set[str]) -> int:
+        """Remove as respostas cujos chunks de origem saíram do índice; retorna quantas"""
+        with self._lock:
+            linhas = self._conexao.execute("SELECT pergunta, nivel, formato, chunks FROM respostas").fetchall()
+            obsoletas = [l[:3] for l in linhas if not set(json.loads(l[3])) <= chunks_validos]
+            self._conexao.executemany(
+                "DELETE FROM respostas WHERE pergunta = ? AND nivel = ? AND formato = ?", obsoletas
+            )
+            processados = self._conexao.execute("SELECT hash FROM chunks_processados").fetchall()
+            self._conexao.executemany(
+                "DELETE FROM chunks_processados WHERE hash = ?",
+                [l for l in processados if l[0] not in chunks_validos]
+            )
+            self._conexao.commit()
+            self._matrizes.clear()
+        if obsoletas:
+            self.logger.info(f"{len(obsoletas)} respostas pré-geradas invalidadas")
+        return len(obsoletas)
+
+    def total(self) -> int:
+        with self._lock:
+            return self._conexao.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+
+    def _matriz(self, nivel: str, formato: str) -> Tuple[List[str], np.ndarray]:
+        with self._lock:
+            chave = (nivel, formato)
+            if chave not in self._matrizes:
+                linhas = self._conexao.execute(
+                    "SELECT pergunta, vetor FROM respostas WHERE nivel = ? AND formato = ?", chave
+                ).fetchall()
+                perguntas = [l[0] for l in linhas]
+                matriz = (np.vstack([np.frombuffer(l[1], dtype=np.float32) for l in linhas])
+                          if linhas else np.empty((0, 0), dtype=np.float32))
+                self._matrizes[chave] = (perguntas, matriz)
+            return self._matrizes[chave]
+
+
+class PreGerador:
+    """Tarefa em lote que preenche RespostasPregeradas a partir do índice.
+
+    Para cada chunk de texto ainda não processado, o LLM sugere perguntas
+    prováveis; cada pergunta passa pela mesma busca do tutor e recebe uma
+    resposta por nível. Todas as chamadas entram no agendador com
+    PRIORIDADE_LOTE, atrás das perguntas dos aprendizes, e a tarefa pode
+    ser limitada a uma janela de horário de pouco uso. Chunks concluídos
+    ficam registrados, então a execução pode ser interrompida e retomada.
+    """
+
+    def __init__(self, tutor, respostas: RespostasPregeradas, perguntas_por_chunk: int = 3,
+                 niveis: Iterable[str] = NIVEIS, formatos: Iterable[str] = ("texto",),
+                 janela: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            tutor: TutorAdaptativo (com indexador e agendador)
+            respostas: Armazenamento das respostas
+            perguntas_por_chunk: Perguntas sugeridas para cada chunk
+            niveis: Níveis para os quais as respostas são geradas
+            formatos: Formatos para os quais as respostas são geradas
+            janela: Horas (início, fim) em que a tarefa pode rodar, ex.: (22, 6)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.tutor = tutor
+        self.indexador = tutor.indexador
+        self.respostas = respostas
+        self.perguntas_por_chunk = perguntas_por_chunk
+        self.niveis = tuple(niveis)
+        self.formatos = tuple(formatos)
+        self.janela = janela
+        self._parar = threading.Event()
+
+    def executar(self, max_chunks: Optional[int] = None) -> Dict:
+        """Processa os chunks pendentes; retorna contadores da execução"""
+        hashes = self.indexador.hashes_conteudo()
+        if not hashes:
+            self.logger.warning("Índice vazio: nada a pré-gerar")
+            return {}
+        versao = self.indexador.assinatura_indice()
+        self.respostas.limpar_obsoletas(hashes)
+        # Só o texto dos chunks pendentes é lido do índice
+        pendentes = {h for h in hashes if not self.respostas.chunk_processado(h)}
+
+        resultado = {"chunks": 0, "perguntas": 0, "respostas": 0}
+        for chunk in self.indexador.documentos(pendentes):
+            if self._parar.is_set() or (max_chunks is not None and resultado["chunks"] >= max_chunks):
+                break
+            if chunk.metadata.get("tipo") == "imagem":
+                continue
+            hash_chunk = hash_conteudo(chunk.page_content)
+            if self.respostas.chunk_processado(hash_chunk):
+                continue
+            if not self._aguardar_janela():
+                break
+            try:
+                perguntas = self.sugerir_perguntas(chunk.page_content)
+                for pergunta in perguntas:
+                    resultado["respostas"] += self._responder(pergunta, versao)
+                resultado["perguntas"] += len(perguntas)
+                resultado["chunks"] += 1
+                self.respostas.marcar_chunk(hash_chunk, versao)
+            except Cancelada:
+                break
+            except Exception as e:
+                self.logger.error(f"Erro ao pré-gerar respostas de {chunk.metadata.get('fonte')}: {str(e)}")
+
+        self.logger.info(
+            f"Pré-geração: {resultado['chunks']} chunks, {resultado['perguntas']} perguntas, "
+            f"{resultado['respostas']} respostas ({self.respostas.total()} guardadas)"
+        )
+        return resultado
+
+    def parar(self):
+        """Interrompe a tarefa após a geração em andamento"""
+        self._parar.set()
+        self.tutor.agendador.cancelar("pregeracao", PRIORIDADE_LOTE)
+
+    def sugerir_perguntas(self, trecho: str) -> List[str]:
+        prompt = PROMPT_PERGUNTAS.format(quantidade=self.perguntas_por_chunk, trecho=trecho)
+        texto = self.tutor.agendador.executar(prompt, aprendiz_id="pregeracao", prioridade=PRIORIDADE_LOTE).content
+        perguntas = []
+        for linha in texto.splitlines():
+            linha = _NUMERACAO.sub("", linha).strip()
+            if len(linha) > 10 and linha not in perguntas:
+                perguntas.append(linha)
+        return perguntas[:self.perguntas_por_chunk]
+
+    def _responder(self, pergunta: str, versao: str) -> int:
+        """Gera as respostas da pergunta para cada nível e formato; retorna quantas foram geradas"""
+        vetor = self.indexador.embeddings.embed_query(pergunta)
+        docs = self.indexador.buscar_por_vetor(vetor, k=3)
+        contexto = self.tutor._formatar_contexto(docs)
+        if not contexto:
+            return 0
+        geradas = 0
+        for formato in self.formatos:
+            for nivel in self.niveis:
+                if self.respostas.existe(pergunta, nivel, formato):
+                    continue
+                resposta = self.tutor.gerar_resposta(
+                    pergunta, formato, nivel, contexto,
+                    conversa_id="pregeracao", prioridade=PRIORIDADE_LOTE
+                )
+                self.respostas.adicionar(pergunta, vetor, nivel, formato, resposta, docs, versao)
+                geradas += 1
+        return geradas
+
+    def _aguardar_janela(self) -> bool:
+        """Espera o início da janela de horário; False se a tarefa for parada antes"""
+        while self.janela is not None and not self._dentro_da_janela(datetime.now().hour):
+            if self._parar.wait(60):
+                return False
+        return not self._parar.is_set()
+
+    def _dentro_da_janela(self, hora: int) -> bool:
+        inicio, fim = self.janela
+        if inicio <= fim:
+            return inicio <= hora < fim
+        return hora >= inicio or hora < fim
+
+
+if __name__ == "__main__":
+    from .indexador import Indexador
+    from .tutor_adaptativo import TutorAdaptativo
+
+    parser = argparse.ArgumentParser(description="Pré-gera respostas do tutor para os materiais indexados")
+    parser.add_argument("--dados", default="dados", help="Pasta de materiais")
+    parser.add_argument("--indice", help="Índice salvo com Indexador.salvar_indice (evita reindexar)")
+    parser.add_argument("--banco", default="respostas_pregeradas.db")
+    parser.add_argument("--modelo", default="llama2")
+    parser.add_argument("--perguntas-por-chunk", type=int, default=3)
+    parser.add_argument("--max-chunks", type=int)
+    parser.add_argument("--janela", help="Horário permitido, ex.: 22-6")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(message)s")
+    indexador = Indexador()
+    if not (args.indice and indexador.carregar_indice(args.indice)):
+        indexador.processar_e_indexar(args.dados)
+    respostas = RespostasPregeradas(args.banco)
+    tutor = TutorAdaptativo(indexador, model=args.modelo, respostas_pregeradas=respostas)
+    janela = tuple(int(h) for h in args.janela.split("-")) if args.janela else None
+    PreGerador(tutor, respostas, perguntas_por_chunk=args.perguntas_por_chunk, janela=janela).executar(args.max_chunks)
@@ -0,0 +1,136 @@
+from langchain_ollama import ChatOllama
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from .agendador_llm import PRIORIDADE_INTERATIVA, opcoes_http
+
+# Um modelo pequeno para perguntas simples e o modelo principal para as demais;
+# num_predict limita o tamanho da resposta de cada um (em tokens)
+MODELOS_PADRAO = {
+    "pequeno": {"model": "llama3.2:1b", "num_predict": 384},
+    "grande": {"model": "llama2", "num_predict": 1024}
+}
+
+# Pedidos de definição/identificação, que um modelo pequeno resolve bem
+_DEFINICAO = re.compile(
+    r"^\s*(o que (é|são|significa)|qual (é|o significado)|quem (é|foi)|defin[ae]|quando|onde)\b",
+    re.IGNORECASE
+)
+# Pedidos que exigem raciocínio, comparação ou síntese
+_RACIOCINIO = re.compile(
+    r"\b(por ?qu[eê]|como funciona|compar\w*|diferen[çc]\w*|rela[çc][ãa]o|analis\w*|avali\w*|"
+    r"justifi\w*|demonstr\w*|explique|vantage\w*|desvantage\w*|passo a passo|exemplos?|"
+    r"impacto|consequ[êe]ncia\w*|calcul\w*|resolv\w*)\b",
+    re.IGNORECASE
+)
+_CODIGO = re.compile(r"```|\b(def|class|function|return|import|SELECT)\b|[{};]\s*$", re.MULTILINE)
+
+AJUSTE_NIVEL = {"iniciante": -0.15, "intermediário": 0.0, "avançado": 0.2}
+
+
+class RoteadorModelos:
+    """Escolhe o modelo de cada pergunta entre um pequeno e um grande.
+
+    A pontuação combina a complexidade estimada da pergunta (tamanho,
+    pedidos de raciocínio ou comparação, código, várias perguntas em uma),
+    o nível do aprendiz e a confiança da recuperação (similaridade do
+    melhor trecho: contexto fraco pede o modelo maior para não inventar).
+    Com a fila do agendador cheia o limiar sobe, e mais perguntas vão
+    para o modelo pequeno, que gera várias vezes mais rápido. Os dois
+    modelos precisam caber carregados juntos no Ollama
+    (OLLAMA_MAX_LOADED_MODELS >= 2).
+    """
+
+    def __init__(self, modelos: Optional[Dict[str, Dict]] = None, limiar: float = 0.45,
+                 confianca_alta: float = 0.75, confianca_baixa: float = 0.45,
+                 fila_alta: int = 4, base_url: str = "http://localhost:11434"):
+        """
+        Args:
+            modelos: {'pequeno': {...}, 'grande': {...}} com 'model' e 'num_predict' (ver MODELOS_PADRAO)
+            limiar: Pontuação a partir da qual a pergunta vai para o modelo grande
+            confianca_alta: Similaridade acima da qual o contexto basta para o modelo pequeno
+            confianca_baixa: Similaridade abaixo da qual a pergunta vai para o modelo grande
+            fila_alta: Tarefas interativas na fila por vaga a partir das quais o limiar sobe
+            base_url: Endereço do Ollama
+        """
+        self.logger = logging.getLogger(__name__)
+        self.modelos = {nome: {**MODELOS_PADRAO.get(nome, {}), **config}
+                        for nome, config in (modelos or MODELOS_PADRAO).items()}
+        self.limiar = limiar
+        self.confianca_alta = confianca_alta
+        self.confianca_baixa = confianca_baixa
+        self.fila_alta = fila_alta
+        self.base_url = base_url
+        self.escolhas = Counter()
+        self._llms: Dict[str, ChatOllama] = {}
+        self._lock = threading.Lock()
+
+    def llm(self, nome: str) -> ChatOllama:
+        """Cliente do modelo (criado na primeira escolha)"""
+        with self._lock:
+            if nome not in self._llms:
+                config = self.modelos[nome]
+                self._llms[nome] = ChatOllama(
+                    model=config["model"],
+                    num_predict=config.get("num_predict"),
+                    temperature=config.get("temperature", 0.7),
+                    base_url=self.base_url,
+                    keep_alive="30m",
+                    client_kwargs=opcoes_http()
+                )
+            return self._llms[nome]
+
+    def complexidade(self, pergunta: str) -> float:
+        """Estimativa entre 0 (definição curta) e 1 (raciocínio longo)"""
+        palavras = len(pergunta.split())
+        pontuacao = min(palavras / 40, 0.4)
+        pontuacao += 0.15 * min(len(_RACIOCINIO.findall(pergunta)), 2)
+        if _CODIGO.search(pergunta):
+            pontuacao += 0.25
+        if pergunta.count("?") > 1:
+            pontuacao += 0.15
+        if _DEFINICAO.match(pergunta) and palavras <= 12:
+            pontuacao -= 0.2
+        return max(0.0, min(1.0, pontuacao))
+
+    def escolher(self, pergunta: str, nivel: str = "intermediário", docs: Optional[List] = None,
+                 estado_fila: Optional[Dict] = None) -> str:
+        """Nome do modelo para a pergunta ('pequeno' ou 'grande')
+
+        Args:
+            docs: Trechos recuperados (com metadata['similaridade'], se houver)
+            estado_fila: AgendadorLLM.estado(), para considerar a carga atual
+        """
+        if len(self.modelos) == 1:
+            return next(iter(self.modelos))
+
+        pontuacao = self.complexidade(pergunta) + AJUSTE_NIVEL.get(nivel, 0.0)
+        confianca = self._confianca(docs)
+        if confianca is not None:
+            if confianca < self.confianca_baixa:
+                pontuacao += 0.25
+            elif confianca >= self.confianca_alta:
+                pontuacao -= 0.1
+
+        limiar = self.limiar
+        if estado_fila:
+            por_vaga = estado_fila["fila"].get(PRIORIDADE_INTERATIVA, 0) / max(1, estado_fila["vagas"])
+            if por_vaga >= self.fila_alta:
+                limiar += min(0.3, 0.1 * (por_vaga - self.fila_alta + 1))
+
+        nome = "grande" if pontuacao >= limiar else "pequeno"
+        self.escolhas[nome] += 1
+        self.logger.info(
+            f"Modelo {self.modelos[nome]['model']} escolhido (pontuação {pontuacao:.2f}, limiar {limiar:.2f}, "
+            f"confiança {'-' if confianca is None else f'{confianca:.2f}'})"
+        )
+        return nome
+
+    @staticmethod
+    def _confianca(docs: Optional[List]) -> Optional[float]:
+        similaridades = [doc.metadata["similaridade"] for doc in docs or ()
+                         if "similaridade" in doc.metadata and doc.metadata.get("tipo") != "imagem"]
+        return max(similaridades) if similaridades else None
@@ -1,31 +1,21 @@
-from langchain_community.document_loaders import TextLoader
 import os
 import logging
-from langchain.schema import Document
+from itertools import islice
+from typing import Iterator
+from langchain_core.documents import Document
 
 class TextProcessor:
-    def __init__(self, indexador):
+    def __init__(self, indexador=None, linhas_por_bloco: int = 200):
         self.indexador = indexador
+        self.linhas_por_bloco = linhas_por_bloco
         self.logger = logging.getLogger(__name__)
 
-    def processar(self, pasta="dados/textos"):
-   
-        documentos = []
-        try:
-            for arquivo in os.listdir(pasta):
-                if arquivo.endswith(".txt"):
-                    try:
-                        loader = TextLoader(os.path.join(pasta, arquivo), encoding='utf-8')
-                        docs = loader.load()
-                        for doc in docs:
-                            doc.metadata.update({
-                                "tipo": "texto",
-                                "fonte": arquivo
-                            })
-                        documentos.extend(docs)
-                        self.logger.info(f"Processado texto: {arquivo}")
-                    except Exception as e:
-                        self.logger.error(f"Erro no texto {arquivo}: {e}")
-        except Exception as e:
-            self.logger.error(f"Erro ao acessar textos: {e}")
-        return documentos
\ No newline at end of file
+    def extrair(self, caminho: str) -> Iterator[Document]:
+        """Lê o arquivo em blocos de linhas, sem carregá-lo inteiro em memória"""
+        arquivo = os.path.basename(caminho)
+        with open(caminho, 'r', encoding='utf-8') as f:
+            for bloco in iter(lambda: list(islice(f, self.linhas_por_bloco)), []):
+                yield Document(
+                    page_content="".join(bloco),
+                    metadata={"tipo": "texto", "fonte": arquivo, "caminho": caminho}
+                )
@@ -1,15 +1,95 @@
 from langchain_ollama import ChatOllama
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
 import logging
-from typing import List, Dict
+import threading
+from typing import Callable, List, Dict, Optional, Tuple
+from .agendador_llm import (AgendadorLLM, Cancelada, TempoEsgotado, PRIORIDADE_INTERATIVA, PRIORIDADE_LOTE,
+                            opcoes_http)
+from .memoria_conversa import MemoriaConversa
+from .perfil_aprendiz import PerfilAprendizStore
+from .perfilador import perfilado
+from .respostas_pregeradas import RespostasPregeradas
+from .resposta_extrativa import frases_relevantes
+from .roteador_modelos import RoteadorModelos
+
+# Parte fixa do prompt. Vem antes de tudo o que muda entre perguntas para
+# que o Ollama reaproveite o cache KV desse prefixo em vez de reavaliá-lo.
+PREFIXO_SISTEMA = """Você é um tutor educacional adaptativo da +A Educação.
+
+Regras:
+1. Seja claro e educacional
+2. Adapte a complexidade ao nível do aluno
+3. Utilize apenas os materiais disponíveis
+4. Formate a resposta conforme solicitado
+
+Nível do aluno: {nivel}
+{diretriz_nivel}"""
+
+DIRETRIZES_NIVEL = {
+    "iniciante": "Use linguagem simples, evite jargões e explique cada termo técnico com um exemplo do dia a dia.",
+    "intermediário": "Assuma os fundamentos conhecidos e foque em como os conceitos se relacionam, com exemplos práticos.",
+    "avançado": "Seja conciso e técnico; aborde detalhes, exceções e boas práticas."
+}
+
+# Formatos em que imagens do índice CLIP são mostradas junto com a resposta
+FORMATOS_VISUAIS = ("imagem", "visual")
+
+# Parte variável, da mais estável (conversa) para a menos estável (pergunta)
+MENSAGEM_PERGUNTA = """Conversa até aqui:
+{historico}
+
+Contexto dos materiais:
+{contexto}
+
+Formato solicitado: {formato}
+Pergunta: {pergunta}"""
+
+
+# Abertura das respostas montadas só com os trechos recuperados
+AVISO_SOBRECARGA = ("⚡ O tutor está com muita procura agora. Enquanto isso, veja os trechos dos materiais "
+                    "que respondem à sua pergunta:")
+AVISO_FALHA = ("⚠️ Não consegui gerar a explicação agora. Estes são os trechos dos materiais "
+               "que respondem à sua pergunta:")
+
+
+def estatisticas_geracao(mensagem) -> Dict:
+    """Contagens de tokens informadas pelo Ollama na resposta
+
+    prompt_eval_count conta só os tokens do prompt que precisaram ser
+    avaliados; os reaproveitados do cache não entram (e o campo some
+    quando o prompt inteiro estava em cache).
+    """
+    metadados = getattr(mensagem, "response_metadata", None) or {}
+    return {
+        "tokens_prompt_avaliados": metadados.get("prompt_eval_count", 0),
+        "tokens_gerados": metadados.get("eval_count", 0),
+        "segundos_prompt": metadados.get("prompt_eval_duration", 0) / 1e9,
+        "segundos_geracao": metadados.get("eval_duration", 0) / 1e9
+    }
 
 class TutorAdaptativo:
-    def __init__(self, indexador, model: str = "llama2"):
+    def __init__(self, indexador, model: str = "llama2", perfis: Optional[PerfilAprendizStore] = None,
+                 memoria: Optional[MemoriaConversa] = None, agendador: Optional[AgendadorLLM] = None,
+                 respostas_pregeradas: Optional[RespostasPregeradas] = None,
+                 roteador: Optional[RoteadorModelos] = None, slo_espera: Optional[float] = None,
+                 similaridade_imagens: float = 0.25):
         self.logger = logging.getLogger(__name__)
         self.indexador = indexador
         self.model = model
+        self.perfis = perfis
+        self.respostas_pregeradas = respostas_pregeradas
+        # Sem roteador, todas as perguntas usam `model`
+        self.roteador = roteador
+        # Espera máxima na fila do LLM (s) antes de responder só com os trechos; None desativa
+        self.slo_espera = slo_espera
+        # Similaridade texto-imagem (CLIP) mínima para uma imagem acompanhar a resposta
+        self.similaridade_imagens = similaridade_imagens
+        self._melhorias: Dict[str, object] = {}
+        self._lock_melhorias = threading.Lock()
         self._inicializar_llm()
+        # Todas as chamadas ao modelo, inclusive os resumos da memória, passam pelo agendador
+        self.agendador = agendador or AgendadorLLM(self.llm)
+        self.memoria = memoria or MemoriaConversa(self.agendador.cliente("resumos", PRIORIDADE_LOTE))
         self._configurar_prompts()
 
     def _inicializar_llm(self):
@@ -17,7 +97,11 @@ class TutorAdaptativo:
             self.llm = ChatOllama(
                 model=self.model,
                 temperature=0.7,
-                base_url="http://localhost:11434"
+                base_url="http://localhost:11434",
+                # Mantém o modelo (e o cache do prefixo) carregado entre perguntas
+                keep_alive="30m",
+                # Permite ao agendador derrubar a geração cancelada
+                client_kwargs=opcoes_http()
             )
             self.logger.info(f"Modelo {self.model} carregado com sucesso")
         except Exception as e:
@@ -25,67 +109,278 @@ class TutorAdaptativo:
             raise
 
     def _configurar_prompts(self):
-        """Configura templates para diferentes formatos de resposta"""
-        self.prompt_base = PromptTemplate(
-            input_variables=["contexto", "formato", "pergunta", "nivel"],
-            template="""
-            Você é um tutor educacional adaptativo da +A Educação.
-            
-            Contexto dos materiais:
-            {contexto}
-            
-            Requisitos:
-            - Nível do aluno: {nivel}
-            - Formato solicitado: {formato}
-            - Pergunta: {pergunta}
-            
-            Regras:
-            1. Seja claro e educacional
-            2. Adapte a complexidade ao nível do aluno
-            3. Utilize apenas os materiais disponíveis
-            4. Formate a resposta conforme solicitado
-            """
-        )
-        
-        # Chain principal
-        self.chain = LLMChain(
-            llm=self.llm,
-            prompt=self.prompt_base,
-            verbose=True
-        )
+        """Configura o prompt: prefixo fixo de sistema seguido da pergunta"""
+        self.prompt_base = ChatPromptTemplate.from_messages([
+            ("system", PREFIXO_SISTEMA),
+            ("human", MENSAGEM_PERGUNTA)
+        ])
+        self.ultimas_estatisticas: Dict = {}
+
+    @perfilado("tutor.responder")
+    def responder(self, pergunta: str, formato: Optional[str] = None, nivel: Optional[str] = None,
+                  aprendiz_id: Optional[str] = None, prioridade: int = PRIORIDADE_INTERATIVA,
+                  docs: Optional[List] = None, colecao: Optional[str] = None,
+                  ao_atualizar: Optional[Callable[[str], None]] = None,
+                  vetor: Optional[List[float]] = None) -> str:
+        """Gera resposta adaptativa baseada nos materiais
 
-    def responder(self, pergunta: str, formato: str = "texto", nivel: str = "iniciante") -> str:
-        """Gera resposta adaptativa baseada nos materiais"""
+        Formato e nível não informados vêm do perfil do aprendiz (quando
+        houver), ou assumem 'texto' e 'iniciante'. Os turnos anteriores da
+        conversa do aprendiz entram no prompt pela memória de conversa.
+        `docs` e `vetor` (embedding da consulta) permitem reaproveitar uma
+        busca feita antes (ex.: durante a digitação, com `buscar_documentos`).
+        Perguntas que não dependem da conversa são procuradas antes nas
+        respostas pré-geradas.
+        `colecao` restringe a busca ao índice de um curso/módulo.
+
+        Se a espera prevista na fila do LLM passar de `slo_espera` (ou a
+        geração falhar), a resposta é montada na hora com as frases mais
+        relevantes dos trechos recuperados. Com `ao_atualizar`, a geração
+        continua em segundo plano e a resposta completa é entregue a essa
+        função (em outra thread) quando ficar pronta.
+
+        Raises:
+            Cancelada: Se a geração for cancelada por `cancelar`
+        """
+        formato_solicitado = formato
+        formato, nivel = self._adaptar_ao_perfil(aprendiz_id, formato, nivel)
+        conversa_id = aprendiz_id or "anonimo"
+        # Uma melhoria ainda pendente da pergunta anterior deixa de interessar
+        self._cancelar_melhoria(conversa_id)
+        contexto = ""
         try:
             # Busca contexto relevante
-            docs = self.indexador.buscar_semelhantes(pergunta, k=3)
+            consulta = self.memoria.consulta(conversa_id, pergunta)
+            if self.respostas_pregeradas is not None and colecao is None and consulta == pergunta:
+                if vetor is None:
+                    vetor = self.indexador.embeddings.embed_query(consulta)
+                pregerada = self._buscar_pregerada(vetor, formato, nivel)
+                if pregerada is not None:
+                    docs = pregerada["documentos"]
+                    if formato in FORMATOS_VISUAIS:
+                        docs = self._incluir_imagens(consulta, docs)
+                    self._registrar_interacao(aprendiz_id, formato_solicitado, docs)
+                    self.memoria.registrar(conversa_id, pergunta, pregerada["resposta"])
+                    return self._formatar_resposta(pregerada["resposta"], formato, docs)
+            if docs is None:
+                if vetor is not None:
+                    docs = self.indexador.buscar_por_vetor(vetor, k=3, colecao=colecao)
+                else:
+                    docs = self.indexador.buscar_semelhantes(consulta, k=3, colecao=colecao)
             contexto = self._formatar_contexto(docs)
             
             if not contexto:
+                self._registrar_interacao(aprendiz_id, formato_solicitado, docs)
                 return self._resposta_off_topic(formato)
+
+            # As imagens só acompanham a resposta: o modelo não tem o que ler nelas
+            if formato in FORMATOS_VISUAIS:
+                docs = self._incluir_imagens(consulta, docs)
+            self._registrar_interacao(aprendiz_id, formato_solicitado, docs)
+
+            if self.slo_espera is not None and prioridade == PRIORIDADE_INTERATIVA:
+                espera = self.agendador.espera_prevista(prioridade)
+                if espera > self.slo_espera:
+                    self.logger.warning(f"Espera prevista de {espera:.0f}s no LLM: resposta extrativa")
+                    return self._responder_extrativo(pergunta, formato, nivel, contexto, docs,
+                                                     conversa_id, ao_atualizar)
             
             # Gera resposta formatada
-            resposta = self.chain.run({
-                "contexto": contexto,
-                "formato": formato,
-                "pergunta": pergunta,
-                "nivel": nivel
-            })
+            resposta = self.gerar_resposta(
+                pergunta, formato, nivel, contexto,
+                historico=self.memoria.historico(conversa_id),
+                conversa_id=conversa_id,
+                prioridade=prioridade,
+                docs=docs
+            )
+            # O resumo dos turnos antigos é atualizado depois, em segundo plano
+            self.memoria.registrar(conversa_id, pergunta, resposta)
             
             return self._formatar_resposta(resposta, formato, docs)
             
+        except Cancelada:
+            raise
+        except TempoEsgotado:
+            self.logger.warning(f"Tempo esgotado ao responder {conversa_id}")
+            falha = "⏱️ A resposta demorou mais que o esperado. Tente novamente em instantes."
         except Exception as e:
             self.logger.error(f"Erro ao responder: {str(e)}")
-            return "Ocorreu um erro ao processar sua pergunta."
+            falha = "Ocorreu um erro ao processar sua pergunta."
+
+        # Com os trechos já recuperados, eles ainda são uma resposta útil
+        if contexto:
+            try:
+                return self._responder_extrativo(pergunta, formato, nivel, contexto, docs, conversa_id,
+                                                 aviso=AVISO_FALHA)
+            except Exception as e:
+                self.logger.error(f"Erro na resposta extrativa: {str(e)}")
+        return falha
+
+    def _responder_extrativo(self, pergunta: str, formato: str, nivel: str, contexto: str, docs: List,
+                             conversa_id: str, ao_atualizar: Optional[Callable[[str], None]] = None,
+                             aviso: str = AVISO_SOBRECARGA) -> str:
+        """Resposta imediata com as melhores frases dos trechos; opcionalmente gera a completa depois"""
+        linhas = [aviso, ""]
+        for frase, doc in frases_relevantes(pergunta, docs):
+            linhas.append(f"> **{frase}**")
+            linhas.append(f"> — _{self._origem(doc)}_")
+            linhas.append("")
+        if ao_atualizar is not None:
+            linhas.append("A explicação completa aparecerá aqui assim que estiver pronta.")
+        resposta = "\n".join(linhas).strip()
+        historico = self.memoria.historico(conversa_id)
+        self.memoria.registrar(conversa_id, pergunta, resposta)
+
+        if ao_atualizar is not None:
+            try:
+                # Na fila de lote: a melhoria não pode disputar vaga com as perguntas
+                # que estão esperando, senão a sobrecarga se sustenta sozinha
+                tarefa, modelo = self._enviar_geracao(pergunta, formato, nivel, contexto, historico,
+                                                      conversa_id, PRIORIDADE_LOTE, docs)
+            except Exception as e:
+                self.logger.error(f"Erro ao agendar a resposta completa: {str(e)}")
+                return self._formatar_resposta(resposta, formato, docs)
+            with self._lock_melhorias:
+                self._melhorias[conversa_id] = tarefa
+            threading.Thread(
+                target=self._aguardar_melhoria,
+                args=(tarefa, modelo, pergunta, resposta, formato, docs, conversa_id, ao_atualizar),
+                name=f"melhoria-{conversa_id}", daemon=True
+            ).start()
+        return self._formatar_resposta(resposta, formato, docs)
+
+    def _aguardar_melhoria(self, tarefa, modelo: str, pergunta: str, provisoria: str, formato: str,
+                           docs: List, conversa_id: str, ao_atualizar: Callable[[str], None]):
+        try:
+            resposta = self._concluir_geracao(tarefa, modelo)
+        except (Cancelada, TempoEsgotado):
+            return
+        except Exception as e:
+            self.logger.error(f"Erro na resposta completa de {conversa_id}: {str(e)}")
+            return
+        finally:
+            with self._lock_melhorias:
+                if self._melhorias.get(conversa_id) is tarefa:
+                    del self._melhorias[conversa_id]
+        # Os próximos prompts da conversa levam a resposta completa, não a provisória
+        self.memoria.substituir(conversa_id, pergunta, provisoria, resposta)
+        try:
+            ao_atualizar(self._formatar_resposta(resposta, formato, docs))
+        except Exception as e:
+            self.logger.error(f"Erro ao entregar a resposta completa de {conversa_id}: {str(e)}")
+
+    def _cancelar_melhoria(self, conversa_id: str):
+        with self._lock_melhorias:
+            tarefa = self._melhorias.pop(conversa_id, None)
+        if tarefa is not None:
+            tarefa.cancelar()
+
+    def gerar_resposta(self, pergunta: str, formato: str, nivel: str, contexto: str, historico: str = "",
+                       conversa_id: str = "anonimo", prioridade: int = PRIORIDADE_INTERATIVA,
+                       docs: Optional[List] = None) -> str:
+        """Chamada ao modelo com o contexto já montado; devolve o texto sem formatação
+
+        Com roteador, o modelo das gerações interativas é escolhido pela
+        pergunta, pelo nível, pela similaridade dos `docs` recuperados e
+        pela fila do agendador; as de lote (sem espera de ninguém) ficam
+        com `model`.
+        """
+        tarefa, modelo = self._enviar_geracao(pergunta, formato, nivel, contexto, historico,
+                                              conversa_id, prioridade, docs)
+        return self._concluir_geracao(tarefa, modelo)
+
+    def _enviar_geracao(self, pergunta: str, formato: str, nivel: str, contexto: str, historico: str,
+                        conversa_id: str, prioridade: int, docs: Optional[List]):
+        """Monta o prompt, escolhe o modelo e coloca a geração na fila; devolve (tarefa, modelo)"""
+        mensagens = self.prompt_base.format_messages(
+            nivel=nivel,
+            diretriz_nivel=DIRETRIZES_NIVEL.get(nivel, ""),
+            historico=historico or "(início da conversa)",
+            contexto=contexto,
+            formato=formato,
+            pergunta=pergunta
+        )
+        llm, modelo = None, self.model
+        if self.roteador is not None and prioridade == PRIORIDADE_INTERATIVA:
+            nome = self.roteador.escolher(pergunta, nivel, docs, self.agendador.estado())
+            llm, modelo = self.roteador.llm(nome), self.roteador.modelos[nome]["model"]
+        return self.agendador.enviar(mensagens, aprendiz_id=conversa_id, prioridade=prioridade, llm=llm), modelo
+
+    def _concluir_geracao(self, tarefa, modelo: str) -> str:
+        mensagem = tarefa.resultado()
+        self.ultimas_estatisticas = {**estatisticas_geracao(mensagem), "modelo": modelo}
+        self.logger.info(
+            f"{modelo} - Prompt: {self.ultimas_estatisticas['tokens_prompt_avaliados']} tokens avaliados "
+            f"({self.ultimas_estatisticas['segundos_prompt']:.1f}s), "
+            f"{self.ultimas_estatisticas['tokens_gerados']} tokens gerados "
+            f"({self.ultimas_estatisticas['segundos_geracao']:.1f}s)"
+        )
+        return mensagem.content
+
+    def _buscar_pregerada(self, vetor: List[float], formato: str, nivel: str) -> Optional[Dict]:
+        try:
+            pregerada = self.respostas_pregeradas.buscar(vetor, nivel, formato, self.indexador.hashes_conteudo())
+        except Exception as e:
+            self.logger.error(f"Erro ao consultar respostas pré-geradas: {str(e)}")
+            return None
+        if pregerada is not None:
+            self.logger.info(f"Resposta pré-gerada usada (similaridade {pregerada['similaridade']:.2f})")
+        return pregerada
+
+    def buscar_documentos(self, pergunta: str, aprendiz_id: Optional[str] = None,
+                          colecao: Optional[str] = None) -> Tuple[List[float], List]:
+        """A mesma busca feita por `responder`, para ser executada antecipadamente
+
+        Returns:
+            (embedding da consulta, documentos), para `responder` como `vetor` e `docs`
+        """
+        consulta = self.memoria.consulta(aprendiz_id or "anonimo", pergunta)
+        vetor = self.indexador.embeddings.embed_query(consulta)
+        return vetor, self.indexador.buscar_por_vetor(vetor, k=3, colecao=colecao)
+
+    def cancelar(self, aprendiz_id: Optional[str] = None) -> int:
+        """Cancela as gerações interativas em andamento do aprendiz"""
+        return self.agendador.cancelar(aprendiz_id or "anonimo", PRIORIDADE_INTERATIVA)
+
+    def _adaptar_ao_perfil(self, aprendiz_id: Optional[str], formato: Optional[str],
+                           nivel: Optional[str]):
+        """Completa formato e nível ausentes com o perfil do aprendiz"""
+        if self.perfis is not None and aprendiz_id:
+            try:
+                formato = formato or self.perfis.formato_preferido(aprendiz_id)
+                nivel = nivel or self.perfis.nivel_inferido(aprendiz_id)
+            except Exception as e:
+                self.logger.error(f"Erro ao consultar perfil de {aprendiz_id}: {str(e)}")
+        return formato or "texto", nivel or "iniciante"
+
+    def _registrar_interacao(self, aprendiz_id: Optional[str], formato: Optional[str], docs: List):
+        if self.perfis is None or not aprendiz_id:
+            return
+        try:
+            topicos = [doc.metadata.get("fonte") for doc in docs if doc.metadata.get("fonte")]
+            self.perfis.registrar_interacao(aprendiz_id, formato=formato, topicos=topicos)
+        except Exception as e:
+            self.logger.error(f"Erro ao atualizar perfil de {aprendiz_id}: {str(e)}")
+
+    def _incluir_imagens(self, consulta: str, docs: List) -> List:
+        """Acrescenta as imagens próximas da consulta (acima de `similaridade_imagens`) ainda fora dos resultados"""
+        if not hasattr(self.indexador, "buscar_imagens"):
+            return docs
+        caminhos = {doc.metadata.get("caminho") for doc in docs}
+        return docs + [img for img in self.indexador.buscar_imagens(consulta, k=2)
+                       if img.metadata.get("caminho") not in caminhos
+                       and img.metadata.get("similaridade", 0.0) >= self.similaridade_imagens]
 
     def _formatar_contexto(self, docs: List) -> str:
-        """Formata os documentos para contexto"""
+        """Formata os documentos para contexto (as imagens do índice CLIP não têm texto e ficam de fora)"""
+        docs = [doc for doc in docs or () if doc.metadata.get("tipo") != "imagem"]
         if not docs:
             return ""
             
         return "\n\n".join(
             f"Material: {doc.metadata.get('fonte', 'Desconhecido')}\n"
             f"Tipo: {doc.metadata.get('tipo', 'texto')}\n"
+            + (f"Trecho: {self._intervalo(doc)}\n" if "inicio" in doc.metadata else "") +
             f"Conteúdo: {doc.page_content[:1000]}..."
             for doc in docs
         )
@@ -97,8 +392,8 @@ class TutorAdaptativo:
                 "🎥 **Recursos em Vídeo**\n\n" +
                 "\n".join(
                     f"- {doc.metadata.get('fonte', 'Vídeo')} "
-                    f"({doc.metadata.get('duracao', 'N/A')}s)\n"
-                    f"  🔗 [Assistir]({doc.metadata.get('url', '#')})"
+                    f"({self._intervalo(doc)})\n"
+                    f"  🔗 [Assistir]({self._link(doc)})"
                     for doc in docs if doc.metadata.get("tipo") == "video"
                 ) + "\n\n" + resposta
             )
@@ -107,14 +402,55 @@ class TutorAdaptativo:
                 "🔊 **Conteúdo em Áudio**\n\n" +
                 "\n".join(
                     f"- {doc.metadata.get('fonte', 'Áudio')} "
-                    f"({doc.metadata.get('duracao', 'N/A')}s)\n"
-                    f"  🎧 [Ouvir]({doc.metadata.get('url', '#')})"
+                    f"({self._intervalo(doc)})\n"
+                    f"  🎧 [Ouvir]({self._link(doc)})"
                     for doc in docs if doc.metadata.get("tipo") == "audio"
                 ) + "\n\n" + resposta
             )
+        elif formato in ["imagem", "visual"]:
+            return (
+                "🖼️ **Imagens Relacionadas**\n\n" +
+                "\n".join(
+                    f"- {doc.metadata.get('fonte', 'Imagem')}\n"
+                    f"  🔗 [Ver]({self._link(doc)})"
+                    for doc in docs if doc.metadata.get("tipo") == "imagem"
+                ) + "\n\n" + resposta
+            )
         else:
             return resposta
 
+    @staticmethod
+    def _formatar_tempo(segundos: float) -> str:
+        segundos = int(segundos)
+        horas, resto = divmod(segundos, 3600)
+        return f"{horas}:{resto // 60:02d}:{resto % 60:02d}" if horas else f"{resto // 60:02d}:{resto % 60:02d}"
+
+    def _intervalo(self, doc) -> str:
+        """Trecho do vídeo/áudio do documento, ou a duração total para documentos sem tempo"""
+        if "inicio" in doc.metadata:
+            return (f"{self._formatar_tempo(doc.metadata['inicio'])}–"
+                    f"{self._formatar_tempo(doc.metadata.get('fim', doc.metadata['inicio']))}")
+        return f"{doc.metadata.get('duracao', 'N/A')}s"
+
+    def _origem(self, doc) -> str:
+        """Material e posição do trecho (tempo no vídeo/áudio ou página)"""
+        fonte = doc.metadata.get("fonte", "Material")
+        if "inicio" in doc.metadata:
+            return f"{fonte}, {self._intervalo(doc)}"
+        if "pagina" in doc.metadata:
+            return f"{fonte}, p. {doc.metadata['pagina']}"
+        return fonte
+
+    @staticmethod
+    def _link(doc) -> str:
+        """Link para o material, já posicionado no trecho (fragmento de mídia #t=)"""
+        url = doc.metadata.get("url") or doc.metadata.get("caminho")
+        if not url:
+            return "#"
+        if "inicio" in doc.metadata:
+            return f"{url}#t={int(doc.metadata['inicio'])}"
+        return url
+
     def _resposta_off_topic(self, formato: str) -> str:
         """Resposta para tópicos fora dos materiais"""
         formatos = {
@@ -122,6 +458,7 @@ class TutorAdaptativo:
             "video": "🎥 Não encontrei vídeos sobre este tema nos materiais disponíveis.",
             "áudio": "🔊 Não encontrei áudios sobre este tema nos materiais disponíveis.",
             "audio": "🔊 Não encontrei áudios sobre este tema nos materiais disponíveis.",
+            "imagem": "🖼️ Não encontrei imagens sobre este tema nos materiais disponíveis.",
             "texto": "📚 Este assunto não está coberto nos materiais atuais."
         }
         return formatos.get(formato.lower(), "Tópico não encontrado nos materiais disponíveis.")
\ No newline at end of file
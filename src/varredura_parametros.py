@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import pickle
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .indexador import DEFAULT_CONFIG, Indexador
+
+# Grade padrão: os valores atuais do DEFAULT_CONFIG e algumas alternativas
+GRADE_PADRAO = {
+    "divisor": ["tokens", "caracteres"],
+    "max_tokens_chunk": [None, 256],
+    "sobreposicao_tokens": [32],
+    "chunk_size": [500, 1000],
+    "chunk_overlap": [200],
+    "model_name": [DEFAULT_CONFIG["model_name"]],
+    "tipo_indice": ["flat", "hnsw"],
+    "k": [3, 5]
+}
+
+
+def carregar_perguntas(caminho: str) -> List[Dict]:
+    """JSONL com {"pergunta": "...", "fontes": ["arquivo.pdf", ...]} (nomes de arquivo esperados)"""
+    perguntas = []
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            if linha.strip():
+                item = json.loads(linha)
+                perguntas.append({"pergunta": item["pergunta"], "fontes": set(item["fontes"])})
+    return perguntas
+
+
+def configuracoes_divisao(grade: Dict) -> List[Dict]:
+    """Combinações de divisão; cada divisor só varia os próprios parâmetros"""
+    combinacoes = []
+    for divisor in grade.get("divisor", [DEFAULT_CONFIG["divisor"]]):
+        if divisor == "tokens":
+            chaves = ("max_tokens_chunk", "sobreposicao_tokens")
+        else:
+            chaves = ("chunk_size", "chunk_overlap")
+        valores = [grade.get(c, [DEFAULT_CONFIG[c]]) for c in chaves]
+        for combinacao in itertools.product(*valores):
+            combinacoes.append({"divisor": divisor, **dict(zip(chaves, combinacao))})
+    return combinacoes
+
+
+def construir_indice(vetores: np.ndarray, tipo: str):
+    """Índice FAISS do tipo pedido: 'flat' (exato), 'hnsw' ou 'ivf' (aproximados)"""
+    import faiss
+
+    dimensao = vetores.shape[1]
+    if tipo == "flat":
+        indice = faiss.IndexFlatL2(dimensao)
+    elif tipo == "hnsw":
+        indice = faiss.IndexHNSWFlat(dimensao, 32)
+    elif tipo == "ivf":
+        listas = max(1, int(np.sqrt(len(vetores))))
+        indice = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimensao), dimensao, listas)
+        indice.train(vetores)
+        indice.nprobe = max(1, listas // 8)
+    else:
+        raise ValueError(f"Tipo de índice desconhecido: {tipo}")
+    indice.add(vetores)
+    return indice
+
+
+class VarreduraParametros:
+    """Compara configurações de recuperação em um conjunto de perguntas rotuladas.
+
+    A extração dos arquivos (a etapa cara: OCR, transcrição) é feita uma
+    vez e guardada em disco pelo hash do arquivo; cada configuração refaz
+    só a divisão, os embeddings e o índice. Para cada combinação de
+    divisão, modelo, tipo de índice e k são medidos recall@k e MRR (pelo
+    arquivo de origem dos chunks), tempo de construção, tamanho do índice
+    e latência das consultas.
+    """
+
+    def __init__(self, perguntas: List[Dict], fontes, pasta_cache: str = "cache_extracao",
+                 config_base: Optional[Dict] = None):
+        """
+        Args:
+            perguntas: Itens {'pergunta', 'fontes'} (ver carregar_perguntas)
+            fontes: Pastas/arquivos do corpus
+            pasta_cache: Onde guardar a extração de cada arquivo
+            config_base: Configuração do Indexador usada como ponto de partida
+        """
+        self.logger = logging.getLogger(__name__)
+        self.perguntas = perguntas
+        self.fontes = fontes
+        self.pasta_cache = pasta_cache
+        self.config_base = {"indice_imagens": False, **(config_base or {})}
+        self._unidades: Optional[List[List]] = None
+
+    def executar(self, grade: Dict = None) -> List[Dict]:
+        grade = {**GRADE_PADRAO, **(grade or {})}
+        resultados = []
+        for modelo in grade["model_name"]:
+            indexador = Indexador({**self.config_base, "model_name": modelo})
+            unidades = self._extrair(indexador)
+            vetores_perguntas, tempo_consulta = self._embeddings_perguntas(indexador)
+            for divisao in configuracoes_divisao(grade):
+                indexador.config.update(divisao)
+                indexador._inicializar_text_splitter()
+
+                inicio = time.perf_counter()
+                chunks = [chunk for arquivo in unidades for chunk in indexador.dividir_documentos(arquivo)]
+                if not chunks:
+                    self.logger.warning(f"Nenhum chunk gerado com {divisao}")
+                    continue
+                vetores = np.asarray(indexador.embeddings.embed_documents([c.page_content for c in chunks]),
+                                     dtype=np.float32)
+                tempo_embeddings = time.perf_counter() - inicio
+                fontes_chunks = [c.metadata.get("fonte") for c in chunks]
+
+                for tipo in grade["tipo_indice"]:
+                    inicio = time.perf_counter()
+                    indice = construir_indice(vetores, tipo)
+                    tempo_indice = time.perf_counter() - inicio
+                    for k in grade["k"]:
+                        metricas = self._avaliar(indice, vetores_perguntas, fontes_chunks, k)
+                        resultados.append({
+                            "model_name": modelo,
+                            **divisao,
+                            "tipo_indice": tipo,
+                            "k": k,
+                            "chunks": len(chunks),
+                            **metricas,
+                            "construcao_s": round(tempo_embeddings + tempo_indice, 2),
+                            "tamanho_mb": round(self._tamanho(indice) / 1024 / 1024, 2),
+                            "embedding_consulta_ms": round(tempo_consulta, 2)
+                        })
+                        self.logger.info(f"{resultados[-1]}")
+        return marcar_pareto(resultados)
+
+    def _extrair(self, indexador: Indexador) -> List[List]:
+        """Unidades extraídas de cada arquivo (memória → cache em disco → processador)"""
+        if self._unidades is not None:
+            return self._unidades
+        os.makedirs(self.pasta_cache, exist_ok=True)
+        self._unidades = []
+        for caminho in indexador.pipeline.descobrir(self.fontes):
+            if indexador.registro.tipo(caminho) == "imagem":
+                continue
+            arquivo_cache = os.path.join(self.pasta_cache, self._hash_arquivo(caminho) + ".pkl")
+            if os.path.isfile(arquivo_cache):
+                with open(arquivo_cache, "rb") as f:
+                    unidades = pickle.load(f)
+            else:
+                try:
+                    unidades = list(indexador.registro.extrair(caminho))
+                except Exception as e:
+                    self.logger.error(f"Erro ao extrair {caminho}: {str(e)}")
+                    continue
+                with open(arquivo_cache + ".tmp", "wb") as f:
+                    pickle.dump(unidades, f)
+                os.replace(arquivo_cache + ".tmp", arquivo_cache)
+            self._unidades.append(unidades)
+        if indexador.ocr is not None:
+            indexador.ocr.encerrar()
+        self.logger.info(f"{len(self._unidades)} arquivos extraídos")
+        return self._unidades
+
+    def _embeddings_perguntas(self, indexador: Indexador) -> Tuple[np.ndarray, float]:
+        """Embeddings das perguntas e o tempo médio (ms) de cada um"""
+        inicio = time.perf_counter()
+        vetores = [indexador.embeddings.embed_query(p["pergunta"]) for p in self.perguntas]
+        tempo = (time.perf_counter() - inicio) * 1000 / max(1, len(self.perguntas))
+        return np.asarray(vetores, dtype=np.float32), tempo
+
+    def _avaliar(self, indice, vetores_perguntas: np.ndarray, fontes_chunks: List[str], k: int) -> Dict:
+        recalls, reciprocos, latencias = [], [], []
+        for pergunta, vetor in zip(self.perguntas, vetores_perguntas):
+            inicio = time.perf_counter()
+            _, posicoes = indice.search(vetor.reshape(1, -1), k)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+            encontradas = [fontes_chunks[p] for p in posicoes[0] if p >= 0]
+            esperadas = pergunta["fontes"]
+            recalls.append(len(esperadas & set(encontradas)) / len(esperadas) if esperadas else 0.0)
+            posicao = next((i for i, fonte in enumerate(encontradas, 1) if fonte in esperadas), None)
+            reciprocos.append(1 / posicao if posicao else 0.0)
+        return {
+            "recall": round(float(np.mean(recalls)), 4),
+            "mrr": round(float(np.mean(reciprocos)), 4),
+            "busca_p50_ms": round(float(np.percentile(latencias, 50)), 3),
+            "busca_p95_ms": round(float(np.percentile(latencias, 95)), 3)
+        }
+
+    @staticmethod
+    def _tamanho(indice) -> int:
+        import faiss
+        return len(faiss.serialize_index(indice))
+
+    @staticmethod
+    def _hash_arquivo(caminho: str) -> str:
+        resumo = hashlib.sha256()
+        with open(caminho, "rb") as f:
+            for bloco in iter(lambda: f.read(1 << 20), b""):
+                resumo.update(bloco)
+        return resumo.hexdigest()
+
+
+def marcar_pareto(resultados: List[Dict]) -> List[Dict]:
+    """Marca as configurações que nenhuma outra supera ao mesmo tempo em recall, MRR e latência"""
+    for r in resultados:
+        r["pareto"] = not any(
+            o is not r
+            and o["recall"] >= r["recall"] and o["mrr"] >= r["mrr"] and o["busca_p50_ms"] <= r["busca_p50_ms"]
+            and (o["recall"], o["mrr"], -o["busca_p50_ms"]) != (r["recall"], r["mrr"], -r["busca_p50_ms"])
+            for o in resultados
+        )
+    return resultados
+
+
+def relatorio(resultados: Iterable[Dict]) -> str:
+    colunas = ["model_name", "divisor", "max_tokens_chunk", "sobreposicao_tokens", "chunk_size", "chunk_overlap",
+               "tipo_indice", "k", "chunks", "recall", "mrr", "construcao_s", "tamanho_mb", "busca_p50_ms",
+               "busca_p95_ms", "pareto"]
+    linhas = ["\t".join(colunas)]
+    for r in sorted(resultados, key=lambda r: (-r["recall"], -r["mrr"], r["busca_p50_ms"])):
+        linhas.append("\t".join("" if r.get(c) is None else str(r[c]) for c in colunas))
+    return "\n".join(linhas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Varredura de parâmetros de recuperação")
+    parser.add_argument("perguntas", help="JSONL com pergunta e fontes esperadas")
+    parser.add_argument("fontes", nargs="+", help="Pastas/arquivos do corpus")
+    parser.add_argument("--grade", help="JSON com listas de valores (sobrepõe GRADE_PADRAO)")
+    parser.add_argument("--cache", default="cache_extracao")
+    parser.add_argument("--saida", help="Arquivo JSON com todos os resultados")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(message)s")
+    grade = None
+    if args.grade:
+        with open(args.grade, encoding="utf-8") as f:
+            grade = json.load(f)
+    resultados = VarreduraParametros(carregar_perguntas(args.perguntas), args.fontes, args.cache).executar(grade)
+    print(relatorio(resultados))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
@@ -1,73 +1,136 @@
-try:
-    from moviepy.video.io.VideoFileClip import VideoFileClip
-except ImportError:
-    from moviepy.editor import VideoFileClip
-
-from langchain.schema import Document
+from langchain_core.documents import Document
 import os
+import importlib.util
+import itertools
 import logging
-from typing import List, Optional, Dict  # Adicionado Dict aqui
-import whisper
+from typing import Iterator, List, Optional, Dict  # Adicionado Dict aqui
+import re
 import subprocess
 import tempfile
+from .audio_processor import documentos_de_segmentos
+
+# Marcação de tempo de uma legenda SRT: 00:01:02,500 --> 00:01:05,000
+_TEMPO_SRT = re.compile(
+    r"(\d+):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{3})"
+)
+
+
+def _video_file_clip():
+    """VideoFileClip do moviepy (importado só quando um vídeo é processado)"""
+    try:
+        from moviepy.video.io.VideoFileClip import VideoFileClip
+    except ImportError:
+        from moviepy.editor import VideoFileClip
+    return VideoFileClip
 
 class VideoProcessor:
     def __init__(self, indexador=None):
         self.indexador = indexador
         self.logger = logging.getLogger(__name__)
         self.model = None  
+        config = indexador.config if indexador is not None else {}
+        self.quadros_chave = config.get("quadros_chave", False)
+        self.intervalo_quadros = config.get("intervalo_quadros", 0.5)
+        self.limiar_cena = config.get("limiar_cena", 0.12)
+        self.max_quadros = config.get("max_quadros_video", 200)
+        self.lote_quadros = config.get("lote_quadros", 8)
+
+    def extrair(self, caminho: str) -> Iterator[Document]:
+        """Extrai legendas ou transcrição de um vídeo, um Document por segmento"""
+        arquivo = os.path.basename(caminho)
+
+        # Verifica se o arquivo existe e é acessível
+        if not os.access(caminho, os.R_OK):
+            raise PermissionError(f"Sem permissão para ler o arquivo: {caminho}")
+
+        with _video_file_clip()(caminho) as clip:
+            # Tenta extrair legendas primeiro
+            legenda = self._extrair_legendas(caminho)
+
+            # Se não houver legendas, transcreve o áudio
+            if legenda:
+                segmentos, conteudo = self._ler_srt(legenda), legenda
+            else:
+                transcricao = self.transcrever_video(caminho)
+                segmentos = transcricao["segmentos"] if transcricao else []
+                conteudo = transcricao["texto"] if transcricao else f"Conteúdo do vídeo {arquivo}"
+
+            metadados = {
+                "tipo": "video",
+                "fonte": arquivo,
+                "caminho": caminho,
+                "duracao": clip.duration,
+                "resolucao": f"{clip.w}x{clip.h}",
+                "tem_legendas": bool(legenda),
+            }
+            yield from documentos_de_segmentos(segmentos, metadados, conteudo)
+            if self.quadros_chave:
+                yield from self._documentos_quadros(caminho, metadados)
+        self.logger.info(f"Vídeo processado: {arquivo}")
+
+    def _documentos_quadros(self, caminho: str, metadados: Dict) -> Iterator[Document]:
+        """Um Document por quadro-chave (mudança de cena), com a descrição e o texto na tela
+
+        Só os quadros-chave passam pelo modelo de descrição e pelo OCR, em
+        lotes. Cada Document cobre do seu quadro até o próximo ('inicio' e
+        'fim'), como os segmentos da transcrição; quadros seguidos com o
+        mesmo texto na tela viram um só. Os Documents são marcados como
+        indivisíveis: cada um vira um chunk próprio (ou vários, entre linhas,
+        se o texto na tela passar do limite de tokens), sem se misturar à
+        transcrição e sem perder as quebras de linha do texto na tela.
+        """
+        if importlib.util.find_spec("cv2") is None:
+            self.logger.warning("opencv-python não instalado: quadros-chave desativados")
+            self.quadros_chave = False
+            return
+        from PIL import Image
+        from .quadros_chave import quadros_chave
+
+        descritor = self.indexador.processador_imagem()
+        ocr = self.indexador.ocr
+        quadros = quadros_chave(caminho, intervalo=self.intervalo_quadros, limiar=self.limiar_cena,
+                                max_quadros=self.max_quadros)
+        pendente = None
+        total = 0
+        try:
+            while True:
+                lote = list(itertools.islice(quadros, self.lote_quadros))
+                if not lote:
+                    break
+                total += len(lote)
+                descricoes = descritor.descrever_lote([Image.fromarray(quadro) for _, quadro in lote])
+                textos = ocr.ocr_quadros(caminho, lote) if ocr is not None else [""] * len(lote)
+                for (tempo, _), descricao, texto in zip(lote, descricoes, textos):
+                    if pendente is not None and texto and texto == pendente["texto"]:
+                        continue
+                    if pendente is not None:
+                        yield from self._documento_quadro(pendente, tempo, metadados)
+                    pendente = {"inicio": tempo, "descricao": descricao, "texto": texto}
+        except Exception as e:
+            self.logger.error(f"Erro ao extrair quadros-chave de {caminho}: {str(e)}")
+        if pendente is not None:
+            yield from self._documento_quadro(pendente, metadados["duracao"], metadados)
+        self.logger.info(f"{total} quadros-chave analisados em {metadados['fonte']}")
+
+    @staticmethod
+    def _documento_quadro(quadro: Dict, fim: float, metadados: Dict) -> Iterator[Document]:
+        partes = []
+        if quadro["descricao"]:
+            partes.append(f"Cena do vídeo: {quadro['descricao']}")
+        if quadro["texto"]:
+            partes.append(f"Texto na tela:\n{quadro['texto']}")
+        if partes:
+            yield Document(
+                page_content="\n\n".join(partes),
+                metadata={**metadados, "inicio": round(quadro["inicio"], 2), "fim": round(fim, 2),
+                          "quadro_chave": True, "ocr": bool(quadro["texto"]), "indivisivel": True}
+            )
 
-    def processar(self, pasta: str = "dados/videos") -> List[Document]:
-        """Processa vídeos e retorna como objetos Document"""
-        documentos = []
-        if not os.path.exists(pasta):
-            self.logger.warning(f"Pasta de vídeos não encontrada: {pasta}")
-            return documentos
-
-        for arquivo in os.listdir(pasta):
-            if arquivo.endswith(('.mp4', '.avi', '.mov')):  # Adicionado mais formatos
-                try:
-                    path = os.path.join(pasta, arquivo)
-                    
-                    # Verifica se o arquivo existe e é acessível
-                    if not os.access(path, os.R_OK):
-                        raise PermissionError(f"Sem permissão para ler o arquivo: {path}")
-                    
-                    with VideoFileClip(path) as clip:
-                        # Tenta extrair legendas primeiro
-                        legenda = self._extrair_legendas(path)
-                        
-                        # Se não houver legendas, transcreve o áudio
-                        if not legenda:
-                            transcricao = self.transcrever_video(path)
-                            conteudo = transcricao["texto"] if transcricao else f"Conteúdo do vídeo {arquivo}"
-                        else:
-                            conteudo = legenda
-
-                        documento = Document(
-                            page_content=conteudo,
-                            metadata={
-                                "tipo": "video",
-                                "fonte": arquivo,
-                                "duracao": clip.duration,
-                                "resolucao": f"{clip.w}x{clip.h}",
-                                "tem_legendas": bool(legenda),
-                               
-                            }
-                        )
-                        documentos.append(documento)
-                        self.logger.info(f"Vídeo processado: {arquivo}")
-
-                except Exception as e:
-                    self.logger.error(f"Erro ao processar {arquivo}: {str(e)}")
-                    continue
-
-        return documentos
-    
     def transcrever_video(self, caminho: str) -> Optional[Dict]:
         """Transcreve o áudio do vídeo para texto"""
         try:
             if self.model is None:
+                import whisper
                 self.model = whisper.load_model("base")
             
             result = self.model.transcribe(caminho)
@@ -80,6 +143,25 @@ class VideoProcessor:
             self.logger.error(f"Falha ao transcrever vídeo {caminho}: {str(e)}")
             return None
 
+    @staticmethod
+    def _ler_srt(legenda: str) -> List[Dict]:
+        """Converte legendas SRT em segmentos no formato do Whisper (start, end, text)"""
+        segmentos = []
+        for bloco in re.split(r"\n\s*\n", legenda.replace("\r\n", "\n")):
+            linhas = bloco.strip().split("\n")
+            for i, linha in enumerate(linhas):
+                tempo = _TEMPO_SRT.search(linha)
+                if tempo:
+                    h1, m1, s1, ms1, h2, m2, s2, ms2 = (int(g) for g in tempo.groups())
+                    segmentos.append({
+                        "start": h1 * 3600 + m1 * 60 + s1 + ms1 / 1000,
+                        "end": h2 * 3600 + m2 * 60 + s2 + ms2 / 1000,
+                        # Remove marcações de estilo (<i>, {\an8})
+                        "text": re.sub(r"<[^>]+>|\{[^}]+\}", "", " ".join(linhas[i + 1:]))
+                    })
+                    break
+        return segmentos
+
     def _extrair_legendas(self, caminho_video: str) -> Optional[str]:
         """Extrai legendas embutidas usando ffmpeg"""
         try: